@@ -0,0 +1,76 @@
+"""Row versions, rating aggregates and search indexes
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18
+
+Run ``python -m app.core.ratings`` after upgrading so the rating aggregates
+reflect reviews written before this revision.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+
+TABLES = ("authors", "books", "users", "reviews")
+RATING_COLUMNS = ("rating_count", "rating_sum", "rating_1", "rating_2", "rating_3", "rating_4", "rating_5")
+
+
+def upgrade() -> None:
+    for table in TABLES:
+        with op.batch_alter_table(table) as batch:
+            batch.add_column(sa.Column("version", sa.Integer(), nullable=False, server_default="1"))
+            batch.add_column(sa.Column("updated_at", sa.DateTime(timezone=True), server_default=sa.func.now()))
+
+    with op.batch_alter_table("books") as batch:
+        for name in RATING_COLUMNS:
+            batch.add_column(sa.Column(name, sa.Integer(), nullable=False, server_default="0"))
+        batch.add_column(sa.Column("rating_average", sa.Float(), nullable=False, server_default="0"))
+
+    op.create_index(
+        "ix_books_top_rated", "books",
+        [sa.text("rating_average DESC"), sa.text("rating_count DESC"), "id"],
+    )
+
+    if op.get_bind().dialect.name == "postgresql":
+        op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        op.create_index(
+            "ix_books_title_tsv", "books",
+            [sa.text("to_tsvector('simple', title)")], postgresql_using="gin",
+        )
+        op.create_index(
+            "ix_books_title_trgm", "books", ["title"],
+            postgresql_using="gin", postgresql_ops={"title": "gin_trgm_ops"},
+        )
+        op.create_index(
+            "ix_books_isbn_prefix", "books", ["isbn"],
+            postgresql_ops={"isbn": "text_pattern_ops"},
+        )
+        op.create_index(
+            "ix_authors_name_trgm", "authors", ["name"],
+            postgresql_using="gin", postgresql_ops={"name": "gin_trgm_ops"},
+        )
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name == "postgresql":
+        op.drop_index("ix_authors_name_trgm", table_name="authors")
+        op.drop_index("ix_books_isbn_prefix", table_name="books")
+        op.drop_index("ix_books_title_trgm", table_name="books")
+        op.drop_index("ix_books_title_tsv", table_name="books")
+    op.drop_index("ix_books_top_rated", table_name="books")
+
+    with op.batch_alter_table("books") as batch:
+        batch.drop_column("rating_average")
+        for name in reversed(RATING_COLUMNS):
+            batch.drop_column(name)
+
+    for table in reversed(TABLES):
+        with op.batch_alter_table(table) as batch:
+            batch.drop_column("updated_at")
+            batch.drop_column("version")
@@ -0,0 +1,52 @@
+"""Foreign-key indexes and one review per user and book
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18
+
+Adds the indexes behind ``/books/author/{id}``, ``/reviews/book/{id}`` and
+``/reviews/user/{id}`` (also used by ON DELETE CASCADE), and a unique index
+on ``reviews (book_id, user_id)``. Duplicate reviews are removed first,
+keeping each user's oldest review of a book; run ``python -m app.core.ratings``
+afterwards if any were removed.
+
+On Postgres the indexes are built with CREATE INDEX CONCURRENTLY so the
+tables stay writable during the upgrade.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+
+INDEXES = (
+    ("ix_books_author_id", "books", ["author_id"], False),
+    ("ix_reviews_user_id", "reviews", ["user_id"], False),
+    ("uq_reviews_book_user", "reviews", ["book_id", "user_id"], True),
+)
+
+
+def upgrade() -> None:
+    op.execute(
+        "DELETE FROM reviews WHERE id NOT IN ("
+        "SELECT MIN(id) FROM reviews GROUP BY book_id, user_id)"
+    )
+
+    if op.get_bind().dialect.name == "postgresql":
+        # CONCURRENTLY cannot run inside a transaction
+        with op.get_context().autocommit_block():
+            for name, table, columns, unique in INDEXES:
+                op.create_index(name, table, columns, unique=unique,
+                                postgresql_concurrently=True, if_not_exists=True)
+    else:
+        for name, table, columns, unique in INDEXES:
+            op.create_index(name, table, columns, unique=unique)
+
+
+def downgrade() -> None:
+    for name, table, _, _ in reversed(INDEXES):
+        op.drop_index(name, table_name=table)
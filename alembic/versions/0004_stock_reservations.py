@@ -0,0 +1,40 @@
+"""Stock reservations
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "stock_reservations",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("status", sa.String(), nullable=False, server_default="held"),
+        sa.Column("expires_at", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+    )
+    op.create_index("ix_stock_reservations_id", "stock_reservations", ["id"])
+    op.create_index("ix_stock_reservations_status_expires", "stock_reservations", ["status", "expires_at"])
+
+    op.create_table(
+        "reservation_items",
+        sa.Column("reservation_id", sa.Integer(),
+                  sa.ForeignKey("stock_reservations.id", ondelete="CASCADE"), primary_key=True),
+        sa.Column("book_id", sa.Integer(), sa.ForeignKey("books.id", ondelete="CASCADE"), primary_key=True),
+        sa.Column("quantity", sa.Integer(), nullable=False),
+    )
+    op.create_index("ix_reservation_items_book_id", "reservation_items", ["book_id"])
+
+
+def downgrade() -> None:
+    op.drop_table("reservation_items")
+    op.drop_table("stock_reservations")
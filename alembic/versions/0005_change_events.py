@@ -0,0 +1,33 @@
+"""Change feed outbox
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0005"
+down_revision = "0004"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "change_events",
+        sa.Column("id", sa.BigInteger().with_variant(sa.Integer(), "sqlite"), primary_key=True, autoincrement=True),
+        sa.Column("seq", sa.BigInteger(), unique=True),
+        sa.Column("resource", sa.String(20), nullable=False),
+        sa.Column("resource_id", sa.Integer(), nullable=False),
+        sa.Column("action", sa.String(10), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+    )
+    op.create_index("ix_change_events_created_at", "change_events", ["created_at"])
+    op.create_index("ix_change_events_pending", "change_events", ["id"],
+                    postgresql_where=sa.text("seq IS NULL"), sqlite_where=sa.text("seq IS NULL"))
+
+
+def downgrade() -> None:
+    op.drop_table("change_events")
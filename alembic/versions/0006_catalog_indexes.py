@@ -0,0 +1,29 @@
+"""Catalog filter and sort indexes
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0006"
+down_revision = "0005"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index("ix_books_price", "books", ["price", "id"])
+    op.create_index("ix_books_published", "books", ["published_date", "id"])
+    op.create_index("ix_books_author_price", "books", ["author_id", "price", "id"])
+    op.create_index("ix_books_in_stock_price", "books", ["price", "id"],
+                    postgresql_where=sa.text("stock > 0"), sqlite_where=sa.text("stock > 0"))
+
+
+def downgrade() -> None:
+    op.drop_index("ix_books_in_stock_price", table_name="books")
+    op.drop_index("ix_books_author_price", table_name="books")
+    op.drop_index("ix_books_published", table_name="books")
+    op.drop_index("ix_books_price", table_name="books")
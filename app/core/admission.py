@@ -0,0 +1,156 @@
+"""Admission control: per route class concurrency limits with load shedding.
+
+Requests are sorted into classes by method and path before routing:
+
+* ``read``   -- single-item GETs and other cheap lookups
+* ``heavy``  -- search, export, top-rated, similar books, unbounded lists and
+  bulk imports
+* ``write``  -- every other non-GET request
+* ``stream`` -- the server-sent change feed, whose connections stay open
+
+Each class gets its own limiter, so a spike of slow searches fills the
+``heavy`` slots and queue and is then shed, while single-item reads keep
+their own capacity. Health checks, ``/metrics`` and the docs are exempt. A
+request over budget (queue full, or no slot within the queue timeout) is
+answered at once with 503 and ``Retry-After`` rather than holding a worker
+and a pooled connection while it waits.
+"""
+import asyncio
+import re
+from collections import deque
+from typing import Dict, Optional
+
+from fastapi import status
+from fastapi.responses import JSONResponse
+
+from app.core import metrics
+from app.core.config import (
+    ADMISSION_CONTROL,
+    ADMISSION_LIMITS,
+    ADMISSION_QUEUE,
+    ADMISSION_QUEUE_TIMEOUT,
+    ADMISSION_RETRY_AFTER,
+)
+
+
+EXEMPT = None
+
+# First match wins; (methods or None for any, path pattern, class)
+ROUTE_CLASSES = [
+    (None, re.compile(r"^/(healthcheck|metrics|cache/stats|openapi\.json|docs|redoc)(/|$)"), EXEMPT),
+    (None, re.compile(r"^/changes/stream$"), "stream"),
+    ({"POST"}, re.compile(r"^/(authors|books)/bulk$"), "heavy"),
+    ({"GET", "HEAD"}, re.compile(r"^/books/(search|export|top-rated|facets|author/\d+)/?$"), "heavy"),
+    # The first call after startup builds the whole recommendation index in the request
+    ({"GET", "HEAD"}, re.compile(r"^/books/\d+/similar/?$"), "heavy"),
+    # Every review of a book or by a user, unpaginated
+    ({"GET", "HEAD"}, re.compile(r"^/reviews/(book|user)/\d+/?$"), "heavy"),
+    # Collection roots: paginated lists, batch lookups and the change feed
+    ({"GET", "HEAD"}, re.compile(r"^/(authors|books|users|reviews|changes)/?$"), "heavy"),
+    ({"GET", "HEAD"}, re.compile(r""), "read"),
+    (None, re.compile(r""), "write"),
+]
+
+
+def classify(method: str, path: str) -> Optional[str]:
+    for methods, pattern, route_class in ROUTE_CLASSES:
+        if (methods is None or method in methods) and pattern.match(path):
+            return route_class
+    return EXEMPT
+
+
+class Limiter:
+    """At most ``limit`` holders; up to ``queue_size`` FIFO waiters, each for ``queue_timeout`` seconds."""
+
+    def __init__(self, name: str, limit: int, queue_size: int = 0, queue_timeout: float = 0):
+        self.name = name
+        self.limit = limit
+        self.queue_size = queue_size
+        self.queue_timeout = queue_timeout
+        self.active = 0
+        self._waiters = deque()
+        self._loop = None
+        metrics.register_limiter(self)
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    async def acquire(self) -> bool:
+        """Take a slot, waiting within the budget; False means the request should be shed."""
+        # Waiters belong to one event loop; start fresh on a new one
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            self._loop, self.active, self._waiters = loop, 0, deque()
+        if self.active < self.limit and not self._waiters:
+            self.active += 1
+            return True
+        if len(self._waiters) >= self.queue_size or self.queue_timeout <= 0:
+            metrics.ADMISSION_REJECTED.inc(self.name, "queue_full")
+            return False
+
+        waiter = loop.create_future()
+        self._waiters.append(waiter)
+        started = loop.time()
+        try:
+            await asyncio.wait((waiter,), timeout=self.queue_timeout)
+        except asyncio.CancelledError:
+            # The client went away while queued; pass on a slot that was already handed over
+            if waiter.done():
+                self.release()
+            else:
+                self._waiters.remove(waiter)
+            raise
+        finally:
+            metrics.ADMISSION_WAIT.observe(loop.time() - started, self.name)
+        if waiter.done():
+            # release() handed its slot straight to this waiter
+            return True
+        self._waiters.remove(waiter)
+        waiter.cancel()
+        metrics.ADMISSION_REJECTED.inc(self.name, "timeout")
+        return False
+
+    def release(self):
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.active = max(self.active - 1, 0)
+
+
+def build_limiters() -> Dict[str, Limiter]:
+    return {
+        name: Limiter(name, int(limit), int(ADMISSION_QUEUE.get(name, 0)), ADMISSION_QUEUE_TIMEOUT.get(name, 0))
+        for name, limit in ADMISSION_LIMITS.items()
+    }
+
+
+class AdmissionMiddleware:
+    """Pure ASGI, so a streamed response keeps its slot until the last chunk is sent."""
+
+    def __init__(self, app, limiters: Optional[Dict[str, Limiter]] = None, enabled: bool = ADMISSION_CONTROL):
+        self.app = app
+        self.limiters = build_limiters() if limiters is None else limiters
+        self.enabled = enabled
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.enabled:
+            return await self.app(scope, receive, send)
+        # Classes without a configured limit are not limited
+        limiter = self.limiters.get(classify(scope["method"], scope["path"]))
+        if limiter is None:
+            return await self.app(scope, receive, send)
+
+        if not await limiter.acquire():
+            response = JSONResponse(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                content={"detail": "Server is busy, retry later"},
+                headers={"Retry-After": str(ADMISSION_RETRY_AFTER)},
+            )
+            return await response(scope, receive, send)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            limiter.release()
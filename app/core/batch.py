@@ -0,0 +1,75 @@
+from typing import Dict, List, Optional, Tuple, Type
+
+from fastapi import HTTPException, Query, Request, status
+from pydantic import BaseModel
+from sqlalchemy import select
+
+from app.core import conditional
+from app.core.config import BATCH_MAX_IDS
+from app.core.serialization import RowShape, json_response
+from app.schemas.page import Batch
+
+
+def parse_ids(value: str, name: str = "ids") -> List[int]:
+    """Parse ``"3,1,2"`` into a de-duplicated list that keeps the given order."""
+    try:
+        parsed = [int(part) for part in value.split(",") if part.strip()]
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"{name} must be comma separated integers")
+    parsed = list(dict.fromkeys(parsed))
+    if not parsed:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"{name} must not be empty")
+    if len(parsed) > BATCH_MAX_IDS:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                            detail=f"At most {BATCH_MAX_IDS} {name} per request")
+    return parsed
+
+
+def batch_ids(
+    ids: Optional[str] = Query(
+        None, description=f"Comma separated ids (at most {BATCH_MAX_IDS}); returns those rows instead of a page"
+    ),
+) -> Optional[List[int]]:
+    return parse_ids(ids) if ids is not None else None
+
+
+async def fetch_by_ids(db, request: Request, model, schema: Type[BaseModel], ids: List[int],
+                       nested: Dict[str, Tuple[object, Type[BaseModel]]] = None):
+    """Fetch ``ids`` with one ``WHERE id IN (...)`` and return them in request order.
+
+    ``nested`` maps a response field to ``(relationship, schema)``; the related
+    row is joined into the same SELECT, so a cart of books and their authors
+    is still a single query. Ids with no row are listed under ``missing``.
+    """
+    shape = RowShape(model, schema)
+    joins = []
+    for name, (relationship, nested_schema) in (nested or {}).items():
+        target = relationship.property.mapper.class_
+        joins.append((name, relationship, RowShape(target, nested_schema, label_prefix=f"{name}_"),
+                      target.version.label(f"{name}_version")))
+
+    stmt = select(*shape.columns, model.version, model.updated_at)
+    for _, relationship, nested_shape, version in joins:
+        stmt = stmt.join(relationship).add_columns(*nested_shape.columns, version)
+    rows = (await db.execute(stmt.where(model.id.in_(ids)))).all()
+
+    by_id = {row.id: row for row in rows}
+    found = [by_id[id] for id in ids if id in by_id]
+    missing = [id for id in ids if id not in by_id]
+    # Nested rows change independently, so their versions are part of the validator
+    nested_versions = ",".join(
+        str(getattr(row, version.name)) for row in found for _, _, _, version in joins
+    )
+    headers = conditional.list_validators(
+        f"{model.__tablename__}-batch", found, extra=f"{missing}|{nested_versions}"
+    )
+    if conditional.is_not_modified(request, headers):
+        return conditional.not_modified(headers)
+
+    items = []
+    for row in found:
+        item = shape.item(row)
+        for name, _, nested_shape, _ in joins:
+            item[name] = nested_shape.item(row)
+        items.append(item)
+    return json_response({"items": items, "missing": missing}, Batch[schema], headers=headers)
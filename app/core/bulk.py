@@ -0,0 +1,267 @@
+import codecs
+import csv
+import io
+import json
+from typing import AsyncIterator, Dict, List, Tuple
+
+from fastapi import HTTPException, Request, status
+from pydantic import ValidationError
+from sqlalchemy import func, insert, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import SQLAlchemyError
+
+from app.core import outbox
+from app.core.cache import cache, book_key
+from app.core.config import BULK_BATCH_SIZE
+from app.core.search import memory_backend
+from app.models.author import Author
+from app.models.book import Book
+from app.schemas.author import AuthorCreate
+from app.schemas.book import BookCreate
+
+
+Record = Tuple[int, dict]
+
+UPSERT_INSERTS = {
+    "postgresql": pg_insert,
+    "sqlite": sqlite_insert,
+}
+
+
+# -- request parsing ---------------------------------------------------------
+
+async def _iter_lines(request: Request) -> AsyncIterator[str]:
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    buffer = ""
+    async for chunk in request.stream():
+        buffer += decoder.decode(chunk)
+        *lines, buffer = buffer.split("\n")
+        for line in lines:
+            yield line
+    buffer += decoder.decode(b"", final=True)
+    if buffer:
+        yield buffer
+
+
+async def _iter_ndjson(request: Request) -> AsyncIterator[Record]:
+    row = 0
+    async for line in _iter_lines(request):
+        if not line.strip():
+            continue
+        row += 1
+        try:
+            yield row, json.loads(line)
+        except ValueError:
+            yield row, {"__error__": "Invalid JSON line"}
+
+
+async def _iter_csv(request: Request) -> AsyncIterator[Record]:
+    header = None
+    pending = ""
+    row = 0
+    async for line in _iter_lines(request):
+        # A quoted field may span lines; wait until the quotes balance
+        pending += line + "\n"
+        if pending.count('"') % 2:
+            continue
+        values = next(csv.reader(io.StringIO(pending)), [])
+        pending = ""
+        if not any(v.strip() for v in values):
+            continue
+        if header is None:
+            header = [v.strip() for v in values]
+            continue
+        row += 1
+        # Empty CSV cells mean "not provided"
+        yield row, {k: (v if v != "" else None) for k, v in zip(header, values)}
+
+
+async def _iter_json_array(request: Request) -> AsyncIterator[Record]:
+    try:
+        payload = json.loads(await request.body())
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Body is not valid JSON")
+    if not isinstance(payload, list):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Expected a JSON array")
+    for row, record in enumerate(payload, start=1):
+        yield row, record
+
+
+def iter_records(request: Request) -> AsyncIterator[Record]:
+    """Yield ``(row_number, record)`` from a JSON array, NDJSON or CSV body.
+
+    NDJSON and CSV are parsed as the body streams in, so memory is bounded
+    by the batch size rather than the upload.
+    """
+    content_type = request.headers.get("content-type", "application/json").split(";")[0].strip()
+    if content_type in ("application/x-ndjson", "application/ndjson", "application/jsonlines"):
+        return _iter_ndjson(request)
+    if content_type in ("text/csv", "application/csv"):
+        return _iter_csv(request)
+    if content_type == "application/json":
+        return _iter_json_array(request)
+    raise HTTPException(
+        status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+        detail="Use application/json, application/x-ndjson or text/csv"
+    )
+
+
+async def batches(records: AsyncIterator[Record], size: int = BULK_BATCH_SIZE):
+    batch = []
+    async for record in records:
+        batch.append(record)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class BulkReport:
+    def __init__(self):
+        self.created = 0
+        self.updated = 0
+        self.errors: List[dict] = []
+
+    def fail(self, row: int, *messages: str, key=None):
+        self.errors.append({"row": row, "key": key, "errors": list(messages)})
+
+    def as_dict(self):
+        return {
+            "created": self.created,
+            "updated": self.updated,
+            "failed": len(self.errors),
+            "errors": sorted(self.errors, key=lambda e: e["row"]),
+        }
+
+
+def _key(value):
+    return None if value is None else str(value)
+
+
+def _validate(schema, batch, report: BulkReport):
+    valid = []
+    for row, record in batch:
+        if not isinstance(record, dict):
+            report.fail(row, "Expected an object")
+            continue
+        if "__error__" in record:
+            report.fail(row, record["__error__"])
+            continue
+        try:
+            valid.append((row, schema.model_validate(record)))
+        except ValidationError as exc:
+            report.fail(row, *(f"{'.'.join(map(str, e['loc']))}: {e['msg']}" for e in exc.errors()),
+                        key=_key(record.get("isbn")))
+    return valid
+
+
+# -- authors -----------------------------------------------------------------
+
+async def import_authors(db, records) -> Dict:
+    report = BulkReport()
+    async for batch in batches(records):
+        valid = _validate(AuthorCreate, batch, report)
+        if not valid:
+            continue
+        try:
+            result = await db.execute(
+                insert(Author)
+                .values([author.model_dump() for _, author in valid])
+                .returning(Author.id, Author.name)
+            )
+            inserted = result.all()
+            await outbox.emit(db, "author", "created", [r.id for r in inserted])
+            await db.commit()
+        except SQLAlchemyError as exc:
+            await db.rollback()
+            for row, _ in valid:
+                report.fail(row, f"Batch rejected by the database: {exc.__class__.__name__}")
+            continue
+        report.created += len(inserted)
+        memory_backend.apply([], [(r.id, r.name) for r in inserted], set(), set())
+    return report.as_dict()
+
+
+# -- books -------------------------------------------------------------------
+
+async def import_books(db, records, upsert: bool = False) -> Dict:
+    """Insert (or upsert by ISBN) books in batches with per-row error reporting.
+
+    Each batch costs three statements: one set-based author check, one
+    lookup of already-present ISBNs, and one multi-row INSERT ... ON
+    CONFLICT, committed on its own so a bad batch never undoes good ones.
+    """
+    report = BulkReport()
+    make_insert = UPSERT_INSERTS.get(db.bind.dialect.name)
+    columns = list(BookCreate.model_fields)
+
+    async for batch in batches(records):
+        valid = _validate(BookCreate, batch, report)
+
+        author_ids = {book.author_id for _, book in valid}
+        known = set((await db.execute(select(Author.id).where(Author.id.in_(author_ids)))).scalars())
+
+        by_isbn = {}
+        for row, book in valid:
+            if book.author_id not in known:
+                report.fail(row, "Author does not exist with the given id", key=book.isbn)
+            elif book.isbn in by_isbn:
+                report.fail(by_isbn[book.isbn][0], "Superseded by a later row with the same ISBN", key=book.isbn)
+                by_isbn[book.isbn] = (row, book)
+            else:
+                by_isbn[book.isbn] = (row, book)
+        if not by_isbn:
+            continue
+
+        existing = set((await db.execute(select(Book.isbn).where(Book.isbn.in_(list(by_isbn))))).scalars())
+        if not upsert:
+            for isbn in existing:
+                report.fail(by_isbn.pop(isbn)[0], "A book with this ISBN already exists", key=isbn)
+            if not by_isbn:
+                continue
+
+        values = [book.model_dump() for _, book in by_isbn.values()]
+        if make_insert is None:
+            stmt = insert(Book).values(values)
+        else:
+            stmt = make_insert(Book).values(values)
+            if upsert:
+                stmt = stmt.on_conflict_do_update(
+                    index_elements=[Book.isbn],
+                    set_={
+                        **{name: stmt.excluded[name] for name in columns if name != "isbn"},
+                        "version": Book.version + 1,
+                        "updated_at": func.now(),
+                    },
+                )
+            else:
+                stmt = stmt.on_conflict_do_nothing(index_elements=[Book.isbn])
+        stmt = stmt.returning(Book.id, Book.isbn, Book.title, Book.author_id)
+
+        try:
+            written = (await db.execute(stmt)).all()
+            updated_ids = [r.id for r in written if r.isbn in existing]
+            await outbox.emit(db, "book", "created", [r.id for r in written if r.isbn not in existing])
+            await outbox.emit(db, "book", "updated", updated_ids)
+            await db.commit()
+        except SQLAlchemyError as exc:
+            await db.rollback()
+            for row, book in by_isbn.values():
+                report.fail(row, f"Batch rejected by the database: {exc.__class__.__name__}", key=book.isbn)
+            continue
+
+        written_isbns = {r.isbn for r in written}
+        for isbn, (row, _) in by_isbn.items():
+            if isbn not in written_isbns:
+                # Raced with a concurrent insert of the same ISBN
+                report.fail(row, "A book with this ISBN already exists", key=isbn)
+        report.updated += len(updated_ids)
+        report.created += len(written) - len(updated_ids)
+
+        # Core inserts bypass the session events, so sync the search index and cache here
+        memory_backend.apply([(r.id, r.title, r.isbn, r.author_id) for r in written], [], set(), set())
+        if updated_ids:
+            await cache.delete(*[book_key(book_id) for book_id in updated_ids])
+    return report.as_dict()
@@ -0,0 +1,387 @@
+import asyncio
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional, Set
+from urllib.parse import urlparse
+
+from fastapi import Request, Response
+
+from app.core.compression import ENCODINGS, compress, negotiate
+from app.core.config import (
+    CACHE_BACKEND,
+    CACHE_MAX_ENTRIES,
+    CACHE_POOL_SIZE,
+    CACHE_TIMEOUT,
+    CACHE_TTL,
+    CACHE_URL,
+    COMPRESSION_MIN_SIZE,
+)
+
+
+class CacheBackend:
+    """Byte store for serialized responses.
+
+    Keys can be tagged so that related entries (e.g. every cached book of an
+    author) are dropped together with :meth:`invalidate_tags`.
+    """
+
+    async def get(self, key: str) -> Optional[bytes]:
+        raise NotImplementedError
+
+    async def set(self, key: str, value: bytes, ttl: float, tags: Iterable[str] = ()):
+        raise NotImplementedError
+
+    async def delete(self, *keys: str):
+        raise NotImplementedError
+
+    async def invalidate_tags(self, *tags: str):
+        raise NotImplementedError
+
+    async def clear(self):
+        raise NotImplementedError
+
+
+class NullBackend(CacheBackend):
+    async def get(self, key):
+        return None
+
+    async def set(self, key, value, ttl, tags=()):
+        pass
+
+    async def delete(self, *keys):
+        pass
+
+    async def invalidate_tags(self, *tags):
+        pass
+
+    async def clear(self):
+        pass
+
+
+class MemoryBackend(CacheBackend):
+    """In-process LRU with per-entry TTL."""
+
+    def __init__(self, max_entries: int = CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._tags: Dict[str, Set[str]] = {}
+        # Reverse of _tags, so a dropped entry also leaves every tag it was in
+        self._key_tags: Dict[str, Set[str]] = {}
+        self._lock = threading.Lock()
+
+    def _unlink(self, key):
+        for tag in self._key_tags.pop(key, ()):
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+    def _drop(self, key):
+        self._entries.pop(key, None)
+        self._unlink(key)
+
+    async def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                self._drop(key)
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    async def set(self, key, value, ttl, tags=()):
+        with self._lock:
+            self._unlink(key)
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            for tag in tags:
+                self._tags.setdefault(tag, set()).add(key)
+            if tags:
+                self._key_tags[key] = set(tags)
+            while len(self._entries) > self.max_entries:
+                self._drop(next(iter(self._entries)))
+
+    async def delete(self, *keys):
+        with self._lock:
+            for key in keys:
+                self._drop(key)
+
+    async def invalidate_tags(self, *tags):
+        with self._lock:
+            for tag in tags:
+                for key in list(self._tags.get(tag, ())):
+                    self._drop(key)
+
+    async def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._tags.clear()
+            self._key_tags.clear()
+
+
+class RedisError(Exception):
+    pass
+
+
+class RedisBackend(CacheBackend):
+    """Minimal RESP client, so any Redis-protocol server (or a local stand-in) works.
+
+    Tags are stored as sets holding the tagged keys. Commands run on a small
+    pool of connections, and a write sends its SET/SADD/PEXPIRE in one
+    pipelined round trip. Connection failures, timeouts and error replies
+    are treated as misses so an unavailable cache never fails a request.
+    """
+
+    def __init__(self, url: str, timeout: float = CACHE_TIMEOUT, pool_size: int = CACHE_POOL_SIZE):
+        parsed = urlparse(url)
+        self.host = parsed.hostname or "localhost"
+        self.port = parsed.port or 6379
+        self.password = parsed.password
+        self.db = int(parsed.path.lstrip("/") or 0)
+        self.timeout = timeout
+        self.pool_size = pool_size
+        self.errors = 0
+        self._idle = []
+        self._slots = None
+        self._loop = None
+
+    async def _connect(self):
+        reader, writer = await asyncio.open_connection(self.host, self.port)
+        setup = []
+        if self.password:
+            setup.append(("AUTH", self.password))
+        if self.db:
+            setup.append(("SELECT", self.db))
+        if setup:
+            for reply in await self._roundtrip(reader, writer, setup):
+                if isinstance(reply, RedisError):
+                    writer.close()
+                    raise reply
+        return reader, writer
+
+    @staticmethod
+    def _encode(args) -> bytes:
+        out = [b"*%d\r\n" % len(args)]
+        for arg in args:
+            if not isinstance(arg, bytes):
+                arg = str(arg).encode()
+            out.append(b"$%d\r\n%s\r\n" % (len(arg), arg))
+        return b"".join(out)
+
+    async def _read_reply(self, reader):
+        line = await reader.readline()
+        if not line:
+            raise ConnectionError("Connection closed by cache server")
+        kind, payload = line[:1], line[1:-2]
+        if kind == b"+":
+            return payload
+        if kind == b"-":
+            # Returned rather than raised, so the replies after it in a pipeline are still read
+            return RedisError(payload.decode())
+        if kind == b":":
+            return int(payload)
+        if kind == b"$":
+            length = int(payload)
+            if length < 0:
+                return None
+            data = await reader.readexactly(length + 2)
+            return data[:-2]
+        if kind == b"*":
+            count = int(payload)
+            if count < 0:
+                return None
+            return [await self._read_reply(reader) for _ in range(count)]
+        raise RedisError(f"Unexpected reply: {line!r}")
+
+    async def _roundtrip(self, reader, writer, commands):
+        writer.write(b"".join(self._encode(args) for args in commands))
+        await writer.drain()
+        return [await self._read_reply(reader) for _ in commands]
+
+    async def pipeline(self, *commands):
+        """Send ``commands`` in one write; their replies in order, or None if the cache is unreachable.
+
+        A command the server rejects leaves a :class:`RedisError` in its slot.
+        """
+        # Connections and the pool belong to one event loop; start fresh on a new one
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            self._loop, self._slots, self._idle = loop, asyncio.Semaphore(self.pool_size), []
+        try:
+            await asyncio.wait_for(self._slots.acquire(), self.timeout)
+        except asyncio.TimeoutError:
+            self.errors += 1
+            return None
+        connection = self._idle.pop() if self._idle else None
+        try:
+            if connection is None:
+                connection = await asyncio.wait_for(self._connect(), self.timeout)
+            replies = await asyncio.wait_for(self._roundtrip(*connection, commands), self.timeout)
+        except (OSError, ConnectionError, ValueError, RedisError, asyncio.IncompleteReadError, asyncio.TimeoutError):
+            # A timed-out connection may still receive the late reply, so it is never reused
+            self.errors += 1
+            if connection is not None:
+                connection[1].close()
+            return None
+        finally:
+            self._slots.release()
+        self._idle.append(connection)
+        if any(isinstance(reply, RedisError) for reply in replies):
+            self.errors += 1
+        return replies
+
+    async def execute(self, *args):
+        replies = await self.pipeline(args)
+        if replies is None or isinstance(replies[0], RedisError):
+            return None
+        return replies[0]
+
+    async def get(self, key):
+        return await self.execute("GET", key)
+
+    async def set(self, key, value, ttl, tags=()):
+        ttl_ms = int(ttl * 1000)
+        commands = [("SET", key, value, "PX", ttl_ms)]
+        for tag in tags:
+            commands += [("SADD", tag, key), ("PEXPIRE", tag, ttl_ms)]
+        await self.pipeline(*commands)
+
+    async def delete(self, *keys):
+        if keys:
+            await self.execute("DEL", *keys)
+
+    async def invalidate_tags(self, *tags):
+        if not tags:
+            return
+        members = await self.pipeline(*[("SMEMBERS", tag) for tag in tags])
+        if members is None:
+            return
+        keys = [key for reply in members if isinstance(reply, list) for key in reply]
+        await self.execute("DEL", *tags, *keys)
+
+    async def clear(self):
+        await self.execute("FLUSHDB")
+
+
+class CachedResponse:
+    """A serialized JSON body with its validators and precompressed variants."""
+
+    def __init__(self, headers: Dict[str, str], variants: Dict[str, bytes]):
+        self.headers = headers
+        self.variants = variants
+
+    @classmethod
+    def build(cls, body: bytes, headers: Dict[str, str]) -> "CachedResponse":
+        variants = {"identity": body}
+        if len(body) >= COMPRESSION_MIN_SIZE:
+            # Paid once per fill instead of once per hit
+            for encoding in ENCODINGS:
+                variants[encoding] = compress(body, encoding)
+        return cls(headers, variants)
+
+    def dumps(self) -> bytes:
+        head = {"headers": self.headers, "variants": [[name, len(body)] for name, body in self.variants.items()]}
+        return json.dumps(head).encode() + b"\n" + b"".join(self.variants.values())
+
+    @classmethod
+    def loads(cls, value: bytes) -> "CachedResponse":
+        head, _, rest = value.partition(b"\n")
+        head = json.loads(head)
+        variants, offset = {}, 0
+        for name, length in head["variants"]:
+            variants[name] = rest[offset:offset + length]
+            offset += length
+        return cls(head["headers"], variants)
+
+    def response(self, request: Request) -> Response:
+        headers = dict(self.headers)
+        encoding = negotiate(request.headers.get("accept-encoding"))
+        if len(self.variants) > 1:
+            headers["Vary"] = "Accept-Encoding"
+        if encoding in self.variants:
+            headers["Content-Encoding"] = encoding
+            return Response(content=self.variants[encoding], media_type="application/json", headers=headers)
+        return Response(content=self.variants["identity"], media_type="application/json", headers=headers)
+
+
+class ResponseCache:
+    """Read-through cache of serialized response bodies with hit/miss counters."""
+
+    def __init__(self, backend: CacheBackend, ttl: float = CACHE_TTL):
+        self.backend = backend
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+
+    async def get(self, key: str) -> Optional[bytes]:
+        value = await self.backend.get(key)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    async def set(self, key: str, value: bytes, tags: Iterable[str] = ()):
+        await self.backend.set(key, value, self.ttl, tags)
+
+    async def get_response(self, key: str) -> Optional[CachedResponse]:
+        """Return the entry stored by :meth:`set_response`, or None."""
+        value = await self.get(key)
+        if value is None:
+            return None
+        return CachedResponse.loads(value)
+
+    async def set_response(self, key: str, body: bytes, headers, tags: Iterable[str] = ()) -> CachedResponse:
+        entry = CachedResponse.build(body, headers)
+        await self.set(key, entry.dumps(), tags)
+        return entry
+
+    async def delete(self, *keys: str):
+        await self.backend.delete(*keys)
+
+    async def invalidate_tags(self, *tags: str):
+        await self.backend.invalidate_tags(*tags)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "backend": type(self.backend).__name__,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "errors": getattr(self.backend, "errors", 0),
+        }
+
+
+# Bumped whenever the CachedResponse layout changes, so entries in the old format are never read
+KEY_VERSION = 2
+
+
+def book_key(book_id: int) -> str:
+    return f"book:v{KEY_VERSION}:{book_id}"
+
+
+def author_key(author_id: int) -> str:
+    return f"author:v{KEY_VERSION}:{author_id}"
+
+
+def author_books_tag(author_id: int) -> str:
+    # Tags every cached book detail that nests this author
+    return f"tag:author-books:{author_id}"
+
+
+def build_backend(name: str = CACHE_BACKEND) -> CacheBackend:
+    if name == "redis":
+        return RedisBackend(CACHE_URL)
+    if name == "none":
+        return NullBackend()
+    return MemoryBackend()
+
+
+cache = ResponseCache(build_backend())
@@ -0,0 +1,199 @@
+"""Catalog filters, sort orders and facet counts for ``/books``.
+
+Filters combine with AND and are backed by composite indexes: ``(price,
+id)``, ``(published_date, id)``, ``(author_id, price, id)`` and a partial
+``(price, id) WHERE stock > 0``, so a filtered or sorted page is one index
+range scan however large the table is.
+
+Each facet is counted with every filter applied except its own, so the
+counts show what choosing another bucket would return. A facet whose set
+holds more than ``CATALOG_EXACT_COUNT_LIMIT`` rows (a capped count per
+distinct set decides) is counted on Postgres from a ``TABLESAMPLE SYSTEM``
+sample sized to about that many rows and scaled up, and the response is
+flagged ``approximate``; SQLite always counts exactly.
+"""
+from datetime import date
+from typing import Dict, List, Optional
+
+from fastapi import HTTPException, Query, status
+from sqlalchemy import case, extract, func, or_, select, tablesample, text
+from sqlalchemy.orm import aliased
+
+from app.core.batch import parse_ids
+from app.core.config import CATALOG_EXACT_COUNT_LIMIT, CATALOG_FACET_AUTHORS, CATALOG_PRICE_BUCKETS
+from app.core.pagination import SortKey
+from app.models.author import Author
+from app.models.book import Book
+
+
+SORTS = {
+    "id": None,
+    "price": SortKey("price", Book.price, parse=float),
+    "-price": SortKey("-price", Book.price, descending=True, parse=float),
+    "published_date": SortKey("published_date", Book.published_date, parse=date.fromisoformat),
+    "-published_date": SortKey("-published_date", Book.published_date, descending=True, parse=date.fromisoformat),
+}
+
+
+def book_sort(
+    sort: str = Query("id", description=f"One of {', '.join(SORTS)}; books without a value come last"),
+) -> Optional[SortKey]:
+    if sort not in SORTS:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                            detail=f"sort must be one of {', '.join(SORTS)}")
+    return SORTS[sort]
+
+
+class BookFilters:
+    """Query parameters narrowing the catalog; ``conditions()`` turns them into WHERE clauses."""
+
+    def __init__(
+        self,
+        min_price: Optional[float] = Query(None, ge=0),
+        max_price: Optional[float] = Query(None, ge=0, description="Exclusive upper bound"),
+        published_from: Optional[date] = Query(None),
+        published_to: Optional[date] = Query(None, description="Inclusive"),
+        in_stock: Optional[bool] = Query(None, description="true: stock > 0, false: sold out"),
+        author_id: Optional[str] = Query(None, description="Comma separated author ids"),
+    ):
+        self.min_price = min_price
+        self.max_price = max_price
+        self.published_from = published_from
+        self.published_to = published_to
+        self.in_stock = in_stock
+        self.author_ids = parse_ids(author_id, "author_id") if author_id is not None else None
+
+    def conditions(self, entity=Book, skip=()) -> List:
+        """WHERE clauses against ``entity`` (Book or a sampled alias), leaving out the ``skip`` facets."""
+        clauses = []
+        if "price" not in skip:
+            if self.min_price is not None:
+                clauses.append(entity.price >= self.min_price)
+            if self.max_price is not None:
+                clauses.append(entity.price < self.max_price)
+        if "years" not in skip:
+            if self.published_from is not None:
+                clauses.append(entity.published_date >= self.published_from)
+            if self.published_to is not None:
+                clauses.append(entity.published_date <= self.published_to)
+        if "in_stock" not in skip and self.in_stock is not None:
+            # Books with no stock recorded count as sold out
+            clauses.append(entity.stock > 0 if self.in_stock else or_(entity.stock <= 0, entity.stock.is_(None)))
+        if "authors" not in skip and self.author_ids is not None:
+            clauses.append(entity.author_id.in_(self.author_ids))
+        return clauses
+
+
+# -- facets ------------------------------------------------------------------
+
+def _price_bucket(entity):
+    edges = CATALOG_PRICE_BUCKETS
+    return case(*((entity.price < edge, i) for i, edge in enumerate(edges)), else_=len(edges))
+
+
+# Grouped by output label, so the bucket bounds are not bound (and compared) a second time
+def _price_query(entity, clauses):
+    return (
+        select(_price_bucket(entity).label("bucket"), func.count())
+        .where(entity.price.isnot(None), *clauses)
+        .group_by(text("bucket"))
+    )
+
+
+def _years_query(entity, clauses):
+    return (
+        select(extract("year", entity.published_date).label("year"), func.count())
+        .where(entity.published_date.isnot(None), *clauses)
+        .group_by(text("year"))
+    )
+
+
+def _authors_query(entity, clauses):
+    return (
+        select(entity.author_id, func.count().label("count"))
+        .where(*clauses)
+        .group_by(entity.author_id)
+        .order_by(func.count().desc(), entity.author_id)
+        .limit(CATALOG_FACET_AUTHORS)
+    )
+
+
+def _count_query(entity, clauses):
+    return select(func.count()).select_from(entity).where(*clauses)
+
+
+def _in_stock_query(entity, clauses):
+    return select(func.count()).select_from(entity).where(entity.stock > 0, *clauses)
+
+
+FACETS = {
+    "total": (_count_query, None),
+    "in_stock": (_in_stock_query, "in_stock"),
+    "price": (_price_query, "price"),
+    "years": (_years_query, "years"),
+    "authors": (_authors_query, "authors"),
+}
+
+
+async def _capped_count(db, clauses) -> int:
+    # Stops reading after limit + 1 rows, so the check itself stays cheap
+    capped = select(Book.id).where(*clauses).limit(CATALOG_EXACT_COUNT_LIMIT + 1).subquery()
+    return (await db.execute(select(func.count()).select_from(capped))).scalar_one()
+
+
+async def _sample_percent(db) -> float:
+    rows = (await db.execute(
+        text("SELECT reltuples FROM pg_class WHERE relname = :table"), {"table": Book.__tablename__}
+    )).scalar() or 0
+    return min(100.0, max(0.01, 100.0 * CATALOG_EXACT_COUNT_LIMIT / rows)) if rows > 0 else 100.0
+
+
+async def facets(db, filters: BookFilters) -> Dict:
+    postgres = db.bind.dialect.name == "postgresql"
+    full = filters.conditions(Book)
+    capped = {}
+    sample = None
+    approximate = False
+    results = {}
+    for name, (build, own_filter) in FACETS.items():
+        clauses = filters.conditions(Book, skip=(own_filter,))
+        entity, scale = Book, 1.0
+        if postgres:
+            # Facets whose own filter is unset count the fully filtered set, so they share its check
+            key = own_filter if len(clauses) != len(full) else None
+            if key not in capped:
+                capped[key] = await _capped_count(db, clauses)
+            if capped[key] > CATALOG_EXACT_COUNT_LIMIT:
+                if sample is None:
+                    percent = await _sample_percent(db)
+                    sample = (aliased(Book, tablesample(Book.__table__, func.system(percent))), 100.0 / percent)
+                entity, scale = sample
+                clauses = filters.conditions(entity, skip=(own_filter,))
+                approximate = True
+            elif name == "total":
+                # Under the cap, the capped count is the exact total
+                results[name] = [(capped[key],)]
+                continue
+        rows = (await db.execute(build(entity, clauses))).all()
+        # The count is always the last column
+        results[name] = [(*row[:-1], round(row[-1] * scale)) for row in rows]
+
+    edges = [0.0] + CATALOG_PRICE_BUCKETS
+    price_counts = dict(results["price"])
+    names = dict((await db.execute(
+        select(Author.id, Author.name).where(Author.id.in_([author_id for author_id, _ in results["authors"]]))
+    )).all())
+    return {
+        "total": results["total"][0][0],
+        "in_stock": results["in_stock"][0][0],
+        "price": [
+            {"min": low, "max": edges[i + 1] if i + 1 < len(edges) else None, "count": price_counts.get(i, 0)}
+            for i, low in enumerate(edges)
+        ],
+        "years": [{"year": int(year), "count": count} for year, count in sorted(results["years"], reverse=True)],
+        "authors": [
+            {"author_id": author_id, "name": names.get(author_id, ""), "count": count}
+            for author_id, count in results["authors"]
+        ],
+        "approximate": approximate,
+    }
@@ -0,0 +1,107 @@
+"""Single-flight coalescing of identical concurrent reads.
+
+When many requests for the same route and parameters arrive together (a
+featured book, say), the first becomes the leader and runs the query and
+serialization; the others wait for its result instead of repeating the
+work. Flights run in their own task on their own session, so a leader
+whose client disconnects does not fail the requests waiting on it.
+A follower waits at most ``COALESCE_MAX_WAIT`` seconds before doing the
+work itself.
+
+Only async handlers are coalesced: every route reads through
+``get_async_db``, and the sync ``get_db`` dependency has no handlers left,
+so there is no thread-safe counterpart of :meth:`SingleFlight.run`.
+
+A follower can get a result whose query started just before it arrived,
+which is no staler than a cache hit. Clients pinned to the primary after
+a write never join a flight, so they still read their own writes.
+"""
+import asyncio
+from typing import Any, Callable, Dict, Hashable, Tuple
+
+from fastapi import Request
+
+from app.core.config import COALESCE_MAX_WAIT, COALESCE_READS
+from app.core.metrics import COALESCED_READS
+from app.core.replicas import wants_primary
+from app.database import AsyncSessionLocal, read_session
+
+
+class SingleFlight:
+    def __init__(self, max_wait: float = COALESCE_MAX_WAIT):
+        self.max_wait = max_wait
+        self._loop = None
+        self._tasks: Dict[Tuple[str, Hashable], asyncio.Task] = {}
+
+    async def run(self, route: str, params: Hashable, fn: Callable, *args) -> Any:
+        """Await ``fn(*args)`` once for every concurrent caller with the same route and params."""
+        # Tasks belong to one event loop; start fresh on a new one
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            self._loop, self._tasks = loop, {}
+        tasks, key = self._tasks, (route, params)
+
+        task = tasks.get(key)
+        if task is None:
+            COALESCED_READS.inc(route, "leader")
+            task = tasks[key] = loop.create_task(fn(*args))
+            task.add_done_callback(lambda done: self._finished(tasks, key, done))
+            return await asyncio.shield(task)
+
+        COALESCED_READS.inc(route, "follower")
+        try:
+            return await asyncio.wait_for(asyncio.shield(task), self.max_wait)
+        except asyncio.TimeoutError:
+            COALESCED_READS.inc(route, "timeout")
+            return await fn(*args)
+
+    @staticmethod
+    def _finished(tasks, key, task):
+        if tasks.get(key) is task:
+            del tasks[key]
+        if not task.cancelled():
+            # Marks the error as retrieved when every waiter has gone away
+            task.exception()
+
+
+flights = SingleFlight()
+
+
+def request_key(request: Request) -> Tuple[str, Tuple]:
+    """Route template (the metrics label) and the concrete path plus sorted query string."""
+    route = getattr(request.scope.get("route"), "path", None) or request.url.path
+    return route, (request.url.path, tuple(sorted(request.query_params.multi_items())))
+
+
+async def _on_session(factory, fn, *args):
+    async with factory() as db:
+        return await fn(db, *args)
+
+
+async def read_once(request: Request, db, fn: Callable, *args, primary: bool = False) -> Any:
+    """``await fn(db, *args)``, shared with identical in-flight reads of the same URL.
+
+    ``fn`` must return something every caller can reuse (body bytes and
+    validators, a :class:`CachedResponse`), not a Response. ``primary``
+    runs it on the primary even for requests that would use a replica;
+    cache fills need that, or an entry could predate the write that just
+    invalidated it and outlive the replica lag by the whole cache TTL.
+    """
+    pinned = wants_primary(request)
+    if not COALESCE_READS or pinned:
+        if primary and not pinned:
+            return await _on_session(AsyncSessionLocal, fn, *args)
+        return await fn(db, *args)
+    route, params = request_key(request)
+    return await flights.run(route, params, _on_session, AsyncSessionLocal if primary else read_session, fn, *args)
+
+
+def stats() -> Dict[str, Dict[str, float]]:
+    """Per route: leaders, followers, timeouts and the share of reads that were collapsed."""
+    routes: Dict[str, Dict[str, float]] = {}
+    for (route, role), value in COALESCED_READS.values().items():
+        routes.setdefault(route, {"leader": 0.0, "follower": 0.0, "timeout": 0.0})[role] = value
+    for counts in routes.values():
+        total = counts["leader"] + counts["follower"]
+        counts["collapse_ratio"] = (counts["follower"] - counts["timeout"]) / total if total else 0.0
+    return routes
@@ -0,0 +1,186 @@
+"""Negotiated response compression.
+
+gzip is always available and the default; brotli (``br``) and zstd are opt-in
+through ``COMPRESSION_ENCODINGS`` and need the ``brotli`` / ``zstandard``
+packages, which are not in requirements.txt. :class:`CompressionMiddleware`
+compresses JSON, NDJSON and text responses of at least
+``COMPRESSION_MIN_SIZE`` bytes on the fly (streamed bodies chunk by chunk)
+and leaves responses that already carry a ``Content-Encoding`` alone, which
+is how precompressed cache entries pass through untouched.
+
+ETags stay the same across encodings: they name the resource version, not
+the bytes on the wire, so ``If-Match`` keeps working for clients that read
+compressed. ``Vary: Accept-Encoding`` keeps shared caches from mixing variants.
+"""
+import zlib
+from typing import Dict, Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+
+from app.core.config import (
+    BROTLI_QUALITY,
+    COMPRESSION_ENCODINGS,
+    COMPRESSION_MIN_SIZE,
+    GZIP_LEVEL,
+    ZSTD_LEVEL,
+)
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+COMPRESSIBLE_TYPES = ("application/json", "application/x-ndjson", "text/")
+# Server-sent events must reach the client event by event
+UNCOMPRESSED_TYPES = ("text/event-stream",)
+
+
+class _Gzip:
+    def __init__(self):
+        self._obj = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._obj.compress(data) + self._obj.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        return self._obj.flush()
+
+
+class _Brotli:
+    def __init__(self):
+        self._obj = brotli.Compressor(quality=BROTLI_QUALITY)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._obj.process(data) + self._obj.flush()
+
+    def finish(self) -> bytes:
+        return self._obj.finish()
+
+
+class _Zstd:
+    def __init__(self):
+        self._obj = zstandard.ZstdCompressor(level=ZSTD_LEVEL).compressobj()
+
+    def compress(self, data: bytes) -> bytes:
+        return self._obj.compress(data) + self._obj.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+    def finish(self) -> bytes:
+        return self._obj.flush()
+
+
+_CODECS = {"gzip": _Gzip, "br": _Brotli if brotli else None, "zstd": _Zstd if zstandard else None}
+
+# Server preference order, restricted to what is enabled and installed
+ENCODINGS = [name for name in COMPRESSION_ENCODINGS if _CODECS.get(name)]
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    compressor = _CODECS[encoding]()
+    return compressor.compress(body) + compressor.finish()
+
+
+def negotiate(accept_encoding: Optional[str]) -> Optional[str]:
+    """Pick the best enabled encoding the client accepts, or None for identity."""
+    if not accept_encoding or not ENCODINGS:
+        return None
+    weights: Dict[str, float] = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        weights[name.strip().lower()] = q
+    wildcard = weights.get("*", 0.0)
+    best, best_q = None, 0.0
+    for name in ENCODINGS:
+        q = weights.get(name, wildcard)
+        if q > best_q:
+            best, best_q = name, q
+    return best
+
+
+def compressible(content_type: str) -> bool:
+    content_type = content_type.lower()
+    return content_type.startswith(COMPRESSIBLE_TYPES) and not content_type.startswith(UNCOMPRESSED_TYPES)
+
+
+def add_vary(headers: MutableHeaders):
+    vary = headers.get("vary")
+    if not vary:
+        headers["Vary"] = "Accept-Encoding"
+    elif "accept-encoding" not in vary.lower():
+        headers["Vary"] = f"{vary}, Accept-Encoding"
+
+
+class CompressionMiddleware:
+    """Pure ASGI, so streamed exports are compressed incrementally instead of buffered."""
+
+    def __init__(self, app, minimum_size: int = COMPRESSION_MIN_SIZE):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        encoding = negotiate(Headers(scope=scope).get("accept-encoding"))
+        if encoding is None:
+            return await self.app(scope, receive, send)
+
+        start = None
+        compressor = None
+        passthrough = False
+
+        async def send_wrapper(message):
+            nonlocal start, compressor, passthrough
+            if message["type"] == "http.response.start":
+                # Held back until the first body chunk shows whether compressing pays off
+                start = message
+                return
+            if message["type"] != "http.response.body":
+                return await send(message)
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            if start is not None:
+                headers = MutableHeaders(raw=start["headers"])
+                if ("content-encoding" in headers
+                        or not compressible(headers.get("content-type", ""))
+                        or start["status"] in (204, 304)):
+                    passthrough = True
+                else:
+                    add_vary(headers)
+                    if not more_body and len(body) < self.minimum_size:
+                        passthrough = True
+                    else:
+                        headers["Content-Encoding"] = encoding
+                        del headers["content-length"]
+                        if more_body:
+                            compressor = _CODECS[encoding]()
+                            body = compressor.compress(body)
+                        else:
+                            body = compress(body, encoding)
+                            headers["Content-Length"] = str(len(body))
+                            passthrough = True
+                start["headers"] = headers.raw
+                await send(start)
+                start = None
+                return await send({**message, "body": body})
+
+            if passthrough:
+                return await send(message)
+            data = compressor.compress(body) if body else b""
+            if not more_body:
+                data += compressor.finish()
+            await send({"type": "http.response.body", "body": data, "more_body": more_body})
+
+        await self.app(scope, receive, send_wrapper)
@@ -0,0 +1,81 @@
+import hashlib
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Dict, Iterable, Optional
+
+from fastapi import HTTPException, Request, Response, status
+
+
+def etag_for(resource: str, id: int, version: int) -> str:
+    return f'"{resource}-{id}-v{version}"'
+
+
+def list_etag(resource: str, rows: Iterable, extra: str = "") -> str:
+    """Strong ETag for a list payload, derived from each row's id and version."""
+    digest = hashlib.blake2b(f"{resource}|{extra}|".encode(), digest_size=16)
+    for row in rows:
+        digest.update(f"{row.id}:{row.version};".encode())
+    return f'"{resource}-list-{digest.hexdigest()}"'
+
+
+def http_date(value: Optional[datetime]) -> Optional[str]:
+    if value is None:
+        return None
+    # SQLite hands back naive timestamps; CURRENT_TIMESTAMP is UTC
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return format_datetime(value.astimezone(timezone.utc), usegmt=True)
+
+
+def validators(etag: str, last_modified: Optional[datetime] = None) -> Dict[str, str]:
+    headers = {"ETag": etag}
+    if last_modified is not None:
+        headers["Last-Modified"] = http_date(last_modified)
+    return headers
+
+
+def list_validators(resource: str, rows, extra: str = "") -> Dict[str, str]:
+    stamps = [row.updated_at for row in rows if row.updated_at is not None]
+    return validators(list_etag(resource, rows, extra), max(stamps) if stamps else None)
+
+
+def _etag_in(header: str, etag: str, weak: bool) -> bool:
+    tags = [tag.strip() for tag in header.split(",")]
+    if "*" in tags:
+        return True
+    if weak:
+        tags = [tag[2:] if tag.startswith("W/") else tag for tag in tags]
+    return etag in tags
+
+
+def has_preconditions(request: Request) -> bool:
+    return "if-none-match" in request.headers or "if-modified-since" in request.headers
+
+
+def is_not_modified(request: Request, headers: Dict[str, str]) -> bool:
+    """Evaluate If-None-Match (or, failing that, If-Modified-Since) per RFC 9110."""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        return _etag_in(if_none_match, headers["ETag"], weak=True)
+    if_modified_since = request.headers.get("if-modified-since")
+    last_modified = headers.get("Last-Modified")
+    if if_modified_since and last_modified:
+        try:
+            return parsedate_to_datetime(last_modified) <= parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+def not_modified(headers: Dict[str, str]) -> Response:
+    return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+
+def check_if_match(request: Request, etag: str):
+    """Reject a write whose If-Match no longer names the current representation."""
+    if_match = request.headers.get("if-match")
+    if if_match is not None and not _etag_in(if_match, etag, weak=False):
+        raise HTTPException(
+            status_code=status.HTTP_412_PRECONDITION_FAILED,
+            detail="Resource has been modified since it was fetched"
+        )
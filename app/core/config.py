@@ -0,0 +1,133 @@
+from dotenv import load_dotenv
+import os
+
+
+load_dotenv()
+
+
+def _bool(name, default):
+    return os.getenv(name, str(default)).strip().lower() in ("1", "true", "yes", "on")
+
+
+def _per_class(name, default):
+    """Parse ``"read=64,heavy=8"`` into ``{"read": 64.0, "heavy": 8.0}``."""
+    pairs = (item.split("=", 1) for item in os.getenv(name, default).split(",") if "=" in item)
+    return {key.strip(): float(value) for key, value in pairs}
+
+
+# Database
+DATABASE_URL = os.getenv("DATABASE_URL")
+# Derived from DATABASE_URL (asyncpg/aiosqlite) unless set explicitly
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL")
+
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "20"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = _bool("DB_POOL_PRE_PING", True)
+
+# Read replicas (comma-separated URLs) serve GET/HEAD; writes and pinned clients use DATABASE_URL.
+# Response cache fills always read from the primary, so cached entries never trail a write.
+DATABASE_REPLICA_URLS = [url.strip() for url in os.getenv("DATABASE_REPLICA_URLS", "").split(",") if url.strip()]
+REPLICA_HEALTH_INTERVAL = float(os.getenv("REPLICA_HEALTH_INTERVAL", "5"))
+REPLICA_MAX_LAG = float(os.getenv("REPLICA_MAX_LAG", "5"))
+READ_YOUR_WRITES_SECONDS = float(os.getenv("READ_YOUR_WRITES_SECONDS", "5"))
+# Signs the read-your-writes marker so clients cannot forge it; share it across workers
+READ_YOUR_WRITES_KEY = os.getenv("READ_YOUR_WRITES_KEY", "")
+
+# Admission control per route class (see app/core/admission.py): at most LIMIT requests of a
+# class run at once, up to QUEUE more wait at most QUEUE_TIMEOUT seconds for a slot, and the
+# rest get 503 with Retry-After. Health checks and /metrics are never limited.
+ADMISSION_CONTROL = _bool("ADMISSION_CONTROL", True)
+ADMISSION_LIMITS = _per_class("ADMISSION_LIMITS", "read=64,heavy=8,write=16,stream=100")
+ADMISSION_QUEUE = _per_class("ADMISSION_QUEUE", "read=256,heavy=32,write=64,stream=0")
+ADMISSION_QUEUE_TIMEOUT = _per_class("ADMISSION_QUEUE_TIMEOUT", "read=1,heavy=0.5,write=2,stream=0")
+ADMISSION_RETRY_AFTER = int(os.getenv("ADMISSION_RETRY_AFTER", "1"))
+
+# Catalog facets (/books/facets): price bucket edges, how many authors to list, and the result
+# size above which counts come from a table sample (Postgres) and are flagged approximate
+CATALOG_PRICE_BUCKETS = [float(edge) for edge in os.getenv("CATALOG_PRICE_BUCKETS", "10,25,50,100").split(",") if edge.strip()]
+CATALOG_FACET_AUTHORS = int(os.getenv("CATALOG_FACET_AUTHORS", "20"))
+CATALOG_EXACT_COUNT_LIMIT = int(os.getenv("CATALOG_EXACT_COUNT_LIMIT", "100000"))
+
+# Identical concurrent reads share one query (single-flight); followers stop waiting after COALESCE_MAX_WAIT
+COALESCE_READS = _bool("COALESCE_READS", True)
+COALESCE_MAX_WAIT = float(os.getenv("COALESCE_MAX_WAIT", "5"))
+
+# Schema is managed by Alembic (`alembic upgrade head`); only enable for throwaway databases
+AUTO_CREATE_TABLES = _bool("AUTO_CREATE_TABLES", False)
+
+
+# Instrumentation: /metrics is always on; Server-Timing headers are opt-in
+METRICS_SERVER_TIMING = _bool("METRICS_SERVER_TIMING", False)
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "200"))
+
+
+# List endpoints encode row tuples directly; set to validate those payloads against the response schemas
+RESPONSE_VALIDATION = _bool("RESPONSE_VALIDATION", False)
+
+# Response compression: encodings in server preference order. br and zstd are opt-in: install the
+# brotli / zstandard packages and set e.g. COMPRESSION_ENCODINGS=br,zstd,gzip. Cached responses
+# store every variant, so hits are never recompressed.
+COMPRESSION_ENCODINGS = [e.strip() for e in os.getenv("COMPRESSION_ENCODINGS", "gzip").split(",") if e.strip()]
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", "6"))
+BROTLI_QUALITY = int(os.getenv("BROTLI_QUALITY", "5"))
+ZSTD_LEVEL = int(os.getenv("ZSTD_LEVEL", "3"))
+
+# Pagination
+DEFAULT_PAGE_SIZE = int(os.getenv("DEFAULT_PAGE_SIZE", "50"))
+MAX_PAGE_SIZE = int(os.getenv("MAX_PAGE_SIZE", "500"))
+# ?ids=... batch lookups on list endpoints
+BATCH_MAX_IDS = int(os.getenv("BATCH_MAX_IDS", "200"))
+
+# Streaming export
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "1000"))
+EXPORT_CHUNK_SIZE = int(os.getenv("EXPORT_CHUNK_SIZE", "65536"))
+
+# Search: "auto" picks Postgres full-text/trigram when available, else the in-memory index, which
+# each worker rebuilds every SEARCH_REBUILD_INTERVAL seconds to pick up the other workers' writes
+SEARCH_BACKEND = os.getenv("SEARCH_BACKEND", "auto")
+SEARCH_REBUILD_INTERVAL = float(os.getenv("SEARCH_REBUILD_INTERVAL", "300"))
+SEARCH_MAX_PREFIX_EXPANSIONS = int(os.getenv("SEARCH_MAX_PREFIX_EXPANSIONS", "50"))
+SEARCH_DEFAULT_LIMIT = int(os.getenv("SEARCH_DEFAULT_LIMIT", "20"))
+SEARCH_MAX_LIMIT = int(os.getenv("SEARCH_MAX_LIMIT", "100"))
+
+# Recommendations (/books/{id}/similar): review changes are folded into the in-process index every
+# RECOMMEND_APPLY_INTERVAL seconds and it is rebuilt from the database every RECOMMEND_REBUILD_INTERVAL
+RECOMMEND_TOP_K = int(os.getenv("RECOMMEND_TOP_K", "20"))
+RECOMMEND_BATCH_SIZE = int(os.getenv("RECOMMEND_BATCH_SIZE", "1024"))
+RECOMMEND_APPLY_INTERVAL = float(os.getenv("RECOMMEND_APPLY_INTERVAL", "2"))
+RECOMMEND_REBUILD_INTERVAL = float(os.getenv("RECOMMEND_REBUILD_INTERVAL", "3600"))
+
+# Change feed (/changes): committed events are numbered every CHANGES_SEQUENCE_INTERVAL seconds;
+# events older than the retention are pruned hourly
+CHANGES_PAGE_SIZE = int(os.getenv("CHANGES_PAGE_SIZE", "100"))
+CHANGES_MAX_PAGE_SIZE = int(os.getenv("CHANGES_MAX_PAGE_SIZE", "1000"))
+CHANGES_SEQUENCE_INTERVAL = float(os.getenv("CHANGES_SEQUENCE_INTERVAL", "0.5"))
+CHANGES_SEQUENCE_BATCH = int(os.getenv("CHANGES_SEQUENCE_BATCH", "1000"))
+CHANGES_POLL_INTERVAL = float(os.getenv("CHANGES_POLL_INTERVAL", "1"))
+CHANGES_HEARTBEAT = float(os.getenv("CHANGES_HEARTBEAT", "15"))
+CHANGES_RETENTION_DAYS = float(os.getenv("CHANGES_RETENTION_DAYS", "7"))
+
+# Response cache: "memory" (in-process LRU), "redis" (any Redis-protocol server) or "none"
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "memory")
+CACHE_URL = os.getenv("CACHE_URL", "redis://localhost:6379/0")
+CACHE_TTL = float(os.getenv("CACHE_TTL", "300"))
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "10000"))
+# Redis: connections per worker, and how long a command may take before it counts as a miss
+CACHE_POOL_SIZE = int(os.getenv("CACHE_POOL_SIZE", "8"))
+CACHE_TIMEOUT = float(os.getenv("CACHE_TIMEOUT", "0.25"))
+
+# Bulk import
+BULK_BATCH_SIZE = int(os.getenv("BULK_BATCH_SIZE", "1000"))
+
+# Stock reservations: held stock returns to the shelf when the TTL lapses
+STOCK_RESERVATION_TTL = int(os.getenv("STOCK_RESERVATION_TTL", "900"))
+STOCK_RESERVATION_MAX_TTL = int(os.getenv("STOCK_RESERVATION_MAX_TTL", "3600"))
+STOCK_SWEEP_INTERVAL = float(os.getenv("STOCK_SWEEP_INTERVAL", "30"))
+STOCK_SWEEP_BATCH = int(os.getenv("STOCK_SWEEP_BATCH", "500"))
+
+# Password hashing (bcrypt runs in a dedicated process pool)
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", "2"))
@@ -0,0 +1,76 @@
+import asyncio
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+import bcrypt
+
+from app.core.config import BCRYPT_ROUNDS, PASSWORD_HASH_WORKERS
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _executor() -> ProcessPoolExecutor:
+    """Process pool shared by all hashing calls, created on first use.
+
+    A fixed number of worker processes caps bcrypt's CPU use, so a burst of
+    signups queues here instead of occupying event loop or threadpool
+    workers that serve catalog reads. Workers are started fresh rather than
+    forked from a process that runs an event loop and holds pool connections.
+    """
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+                _pool = ProcessPoolExecutor(max_workers=PASSWORD_HASH_WORKERS,
+                                            mp_context=multiprocessing.get_context(method))
+    return _pool
+
+
+def _encode(password: str) -> bytes:
+    # bcrypt only looks at the first 72 bytes (and bcrypt>=5 rejects longer input)
+    return password.encode("utf-8")[:72]
+
+
+def _hash(password: str, rounds: int) -> str:
+    return bcrypt.hashpw(_encode(password), bcrypt.gensalt(rounds=rounds)).decode()
+
+
+def _verify(password: str, hashed: str) -> bool:
+    try:
+        return bcrypt.checkpw(_encode(password), hashed.encode())
+    except ValueError:
+        # Not a bcrypt hash (e.g. a legacy plaintext row)
+        return False
+
+
+async def hash_password(password: str, rounds: int = BCRYPT_ROUNDS) -> str:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor(), _hash, password, rounds)
+
+
+async def verify_password(password: str, hashed: str) -> bool:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor(), _verify, password, hashed)
+
+
+def hash_rounds(hashed: str):
+    # "$2b$12$<salt+digest>"
+    try:
+        return int(hashed.split("$")[2])
+    except (IndexError, ValueError):
+        return None
+
+
+def needs_rehash(hashed: str, rounds: int = BCRYPT_ROUNDS) -> bool:
+    return hash_rounds(hashed) != rounds
+
+
+def shutdown():
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
@@ -0,0 +1,79 @@
+import csv
+import io
+import json
+
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import select
+
+from app.core.config import EXPORT_BATCH_SIZE, EXPORT_CHUNK_SIZE
+from app.database import read_session
+from app.models.author import Author
+from app.models.book import Book
+
+
+EXPORT_COLUMNS = [
+    Book.id,
+    Book.title,
+    Book.isbn,
+    Book.price,
+    Book.stock,
+    Book.published_date,
+    Book.cover_image_url,
+    Book.rating_count,
+    Book.rating_average,
+    Book.author_id,
+    Author.name.label("author_name"),
+    Author.nationality.label("author_nationality"),
+]
+
+EXPORT_FIELDS = [column.key for column in EXPORT_COLUMNS]
+
+
+async def iter_catalog_rows(batch_size: int = EXPORT_BATCH_SIZE):
+    """Yield the books/authors join as dicts from a server-side cursor.
+
+    The generator owns its session so it can outlive the request dependency,
+    and ``yield_per`` keeps only one batch of rows in memory at a time.
+    """
+    stmt = (
+        select(*EXPORT_COLUMNS)
+        .join(Author, Book.author_id == Author.id)
+        .order_by(Book.id)
+        .execution_options(yield_per=batch_size)
+    )
+    # Long catalog scans are exactly what replicas are for
+    async with read_session() as db:
+        result = await db.stream(stmt)
+        async for row in result:
+            yield row._asdict()
+
+
+# Rows are gathered into chunks of about EXPORT_CHUNK_SIZE characters, so the response (and the
+# compressor's sync flush behind it) writes once per chunk rather than once per row
+async def ndjson_lines(rows, chunk_size: int = EXPORT_CHUNK_SIZE):
+    buffer = io.StringIO()
+    async for row in rows:
+        buffer.write(json.dumps(jsonable_encoder(row), separators=(",", ":")))
+        buffer.write("\n")
+        if buffer.tell() >= chunk_size:
+            yield _drain(buffer)
+    if buffer.tell():
+        yield _drain(buffer)
+
+
+async def csv_lines(rows, chunk_size: int = EXPORT_CHUNK_SIZE):
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=EXPORT_FIELDS)
+    writer.writeheader()
+    async for row in rows:
+        writer.writerow(row)
+        if buffer.tell() >= chunk_size:
+            yield _drain(buffer)
+    yield _drain(buffer)
+
+
+def _drain(buffer: io.StringIO) -> str:
+    chunk = buffer.getvalue()
+    buffer.seek(0)
+    buffer.truncate(0)
+    return chunk
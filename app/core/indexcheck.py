@@ -0,0 +1,112 @@
+"""Static check that every filtered column has index support.
+
+Walks the ``.where()`` / ``.filter()`` calls in the routers and core query
+modules and reports any ``Model.column`` they reference that is not the
+leading column of the primary key, a unique constraint or an index. Run it
+after changing queries or models::
+
+    python -m app.core.indexcheck
+
+Exits with status 1 when an unindexed filter column is found.
+"""
+import ast
+import sys
+from pathlib import Path
+from typing import Dict, Iterator, List, Set, Tuple
+
+from sqlalchemy import Column
+
+from app.database import Base
+from app.models import user, author, book, review, reservation, change  # noqa: F401  (register models)
+
+
+APP_DIR = Path(__file__).resolve().parent.parent
+SCANNED = ("routers", "core")
+FILTER_METHODS = {"where", "filter", "having"}
+
+# Filters that are fine without a leading index, with the reason
+ALLOWED: Dict[str, str] = {
+    "Book.rating_count": "range filter applied while walking ix_books_top_rated in order",
+    "Book.stock": "guard on rows located by primary key; in_stock=true uses the partial "
+                  "ix_books_in_stock_price, in_stock=false is a residual filter on the price/id scans",
+    "ChangeEvent.resource": "filtered within the seq range scan of the change feed",
+    "StockReservation.expires_at": "always paired with status, ix_stock_reservations_status_expires",
+}
+
+
+def indexed_columns() -> Dict[str, Set[str]]:
+    """Map each table to the columns that lead an index, unique constraint or PK."""
+    leading: Dict[str, Set[str]] = {}
+    for table in Base.metadata.sorted_tables:
+        cols = leading.setdefault(table.name, set())
+        pk = list(table.primary_key.columns)
+        if pk:
+            cols.add(pk[0].name)
+        for index in table.indexes:
+            first = next(iter(index.expressions), None)
+            if isinstance(first, Column):
+                cols.add(first.name)
+            elif isinstance(first, str):
+                cols.add(first)
+        for constraint in table.constraints:
+            columns = list(getattr(constraint, "columns", ()))
+            if columns and constraint.__class__.__name__ == "UniqueConstraint":
+                cols.add(columns[0].name)
+    return leading
+
+
+def model_columns() -> Dict[str, Tuple[str, Dict[str, str]]]:
+    """Map model class names to ``(table, {attribute: column name})``."""
+    models = {}
+    for mapper in Base.registry.mappers:
+        columns = {attr.key: attr.columns[0].name for attr in mapper.column_attrs}
+        models[mapper.class_.__name__] = (mapper.local_table.name, columns)
+    return models
+
+
+def _filter_references(tree: ast.AST, models) -> Iterator[Tuple[int, str, str]]:
+    for node in ast.walk(tree):
+        if not (isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute)
+                and node.func.attr in FILTER_METHODS):
+            continue
+        for arg in list(node.args) + [kw.value for kw in node.keywords]:
+            for ref in ast.walk(arg):
+                if (isinstance(ref, ast.Attribute) and isinstance(ref.value, ast.Name)
+                        and ref.value.id in models and ref.attr in models[ref.value.id][1]):
+                    yield ref.lineno, ref.value.id, ref.attr
+
+
+def check(app_dir: Path = APP_DIR) -> List[str]:
+    models = model_columns()
+    leading = indexed_columns()
+    problems = []
+    for package in SCANNED:
+        for path in sorted((app_dir / package).glob("*.py")):
+            tree = ast.parse(path.read_text(), filename=str(path))
+            seen = set()
+            for lineno, model, attr in _filter_references(tree, models):
+                name = f"{model}.{attr}"
+                table, columns = models[model]
+                if name in ALLOWED or columns[attr] in leading.get(table, ()) or (lineno, name) in seen:
+                    continue
+                seen.add((lineno, name))
+                problems.append(
+                    f"{path.relative_to(app_dir.parent)}:{lineno}: {name} filters on "
+                    f"{table}.{columns[attr]}, which no index leads with"
+                )
+    return problems
+
+
+def main() -> int:
+    problems = check()
+    for problem in problems:
+        print(problem)
+    if problems:
+        print(f"{len(problems)} filter column(s) without index support", file=sys.stderr)
+        return 1
+    print("Every filter column has index support")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
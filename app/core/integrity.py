@@ -0,0 +1,81 @@
+import re
+from typing import Dict, Optional, Set, Tuple
+
+from fastapi import HTTPException, status
+from sqlalchemy import exists, select
+from sqlalchemy.exc import IntegrityError
+
+
+UNIQUE_VIOLATION = "23505"
+FOREIGN_KEY_VIOLATION = "23503"
+
+# Postgres: 'Key (book_id, user_id)=(1, 2) already exists.' / '... is not present in table "books".'
+PG_KEY_RE = re.compile(r"Key \(([^)]*)\)=")
+# SQLite: 'UNIQUE constraint failed: reviews.book_id, reviews.user_id'
+SQLITE_UNIQUE_RE = re.compile(r"UNIQUE constraint failed: (.+)$")
+
+
+def _details(orig) -> str:
+    # asyncpg keeps DETAIL on the wrapped exception, psycopg2 on .diag
+    cause = getattr(orig, "__cause__", None)
+    diag = getattr(orig, "diag", None)
+    return " ".join(filter(None, (
+        str(orig),
+        getattr(cause, "detail", None),
+        getattr(diag, "message_detail", None),
+    )))
+
+
+def classify(exc: IntegrityError) -> Tuple[Optional[str], Set[str]]:
+    """Return ``("unique" | "foreign_key" | None, columns)`` for a constraint error.
+
+    ``columns`` is empty when the driver does not say which columns were
+    involved (SQLite never does for foreign keys).
+    """
+    orig = exc.orig
+    text = _details(orig)
+    sqlstate = getattr(orig, "sqlstate", None) or getattr(orig, "pgcode", None)
+
+    match = PG_KEY_RE.search(text)
+    columns = {c.strip() for c in match.group(1).split(",")} if match else set()
+    if sqlstate == UNIQUE_VIOLATION:
+        return "unique", columns
+    if sqlstate == FOREIGN_KEY_VIOLATION:
+        return "foreign_key", columns
+
+    match = SQLITE_UNIQUE_RE.search(text)
+    if match:
+        return "unique", {c.strip().rsplit(".", 1)[-1] for c in match.group(1).split(",")}
+    if "FOREIGN KEY constraint failed" in text:
+        return "foreign_key", set()
+    return None, set()
+
+
+async def http_error(db, exc: IntegrityError, unique: Dict[str, str] = None,
+                     references: Dict[str, tuple] = None) -> Exception:
+    """Translate a constraint violation into the HTTP error the pre-checks used to raise.
+
+    ``unique`` maps a column (or comma-separated columns) to a 409 detail;
+    ``references`` maps a foreign-key column to ``(Model, id, detail)`` for
+    a 404. When the driver does not name the failing column, the referenced
+    rows are looked up once to find the missing one. The session must
+    already be rolled back. Returns ``exc`` itself for anything unmapped.
+    """
+    kind, columns = classify(exc)
+
+    if kind == "unique" and unique:
+        for key, detail in unique.items():
+            if not columns or set(key.split(",")) == columns:
+                return HTTPException(status_code=status.HTTP_409_CONFLICT, detail=detail)
+
+    if kind == "foreign_key" and references:
+        candidates = {c: ref for c, ref in references.items() if not columns or c in columns}
+        if len(candidates) > 1:
+            # Only reached on the error path, so the lookup costs nothing when writes succeed
+            checks = [exists().where(model.id == value).label(c) for c, (model, value, _) in candidates.items()]
+            found = (await db.execute(select(*checks))).one()._mapping
+            candidates = {c: ref for c, ref in candidates.items() if not found[c]} or candidates
+        _, _, detail = next(iter(candidates.values()))
+        return HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=detail)
+
+    return exc
@@ -0,0 +1,278 @@
+"""Request, query and pool instrumentation exposed in Prometheus text format.
+
+``MetricsMiddleware`` times each request and collects the statements it
+runs (counted by the engine events installed with :func:`instrument_engine`)
+into per-route histograms. Pools created with :class:`TimedQueuePool` or
+:class:`TimedAsyncQueuePool` also report how long checkouts waited, and
+their size/saturation is read at scrape time. :func:`render` produces the
+``/metrics`` payload.
+"""
+import logging
+import threading
+import time
+from contextvars import ContextVar
+from typing import Dict, Optional, Sequence, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+from app.core.config import METRICS_SERVER_TIMING, SLOW_QUERY_MS
+
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 50, 100)
+WAIT_BUCKETS = (0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names: Sequence[str], values: Sequence, extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name, self.help, self.labelnames = name, help, tuple(labelnames)
+        self._values: Dict[Tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount: float = 1.0):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def values(self) -> Dict[Tuple, float]:
+        with self._lock:
+            return dict(self._values)
+
+    def render(self):
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} counter"
+        with self._lock:
+            for labels, value in sorted(self._values.items()):
+                yield f"{self.name}{_labels(self.labelnames, labels)} {value}"
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (), buckets=LATENCY_BUCKETS):
+        self.name, self.help, self.labelnames = name, help, tuple(labelnames)
+        self.buckets = tuple(buckets)
+        # labels -> [per-bucket counts..., +Inf count, sum]
+        self._values: Dict[Tuple, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels):
+        with self._lock:
+            entry = self._values.get(labels)
+            if entry is None:
+                entry = self._values[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    entry[i] += 1
+            entry[-2] += 1
+            entry[-1] += value
+
+    def render(self):
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} histogram"
+        with self._lock:
+            for labels, entry in sorted(self._values.items()):
+                bounds = [f'le="{bound}"' for bound in self.buckets] + ['le="+Inf"']
+                for bound, count in zip(bounds, entry):
+                    yield f"{self.name}_bucket{_labels(self.labelnames, labels, bound)} {count}"
+                yield f"{self.name}_sum{_labels(self.labelnames, labels)} {entry[-1]}"
+                yield f"{self.name}_count{_labels(self.labelnames, labels)} {entry[-2]}"
+
+
+REQUESTS = Counter("http_requests_total", "Requests served.", ("method", "route", "status"))
+REQUEST_LATENCY = Histogram("http_request_duration_seconds", "Request latency.", ("method", "route"))
+REQUEST_QUERIES = Histogram("db_queries_per_request", "Statements executed per request.", ("route",),
+                            buckets=QUERY_BUCKETS)
+REQUEST_DB_TIME = Histogram("db_time_per_request_seconds", "Time spent in the database per request.", ("route",))
+SLOW_QUERIES = Counter("db_slow_queries_total", f"Statements slower than {SLOW_QUERY_MS} ms.", ("route",))
+POOL_WAIT = Histogram("db_pool_checkout_wait_seconds", "Time spent waiting for a pooled connection.", ("pool",),
+                      buckets=WAIT_BUCKETS)
+ADMISSION_WAIT = Histogram("admission_queue_wait_seconds", "Time requests queued for an admission slot.",
+                           ("route_class",), buckets=WAIT_BUCKETS)
+ADMISSION_REJECTED = Counter("admission_rejected_total",
+                             "Requests shed with 503: queue_full (no room to wait) or timeout (waited too long).",
+                             ("route_class", "reason"))
+COALESCED_READS = Counter("coalesced_reads_total",
+                          "Coalesced reads by role: leader ran the work, follower shared it, "
+                          "timeout stopped waiting and ran it again.", ("route", "role"))
+
+_pools: Dict[str, object] = {}
+_limiters: Dict[str, object] = {}
+
+
+# -- per-request state -------------------------------------------------------
+
+class RequestStats:
+    __slots__ = ("scope", "queries", "db_time")
+
+    def __init__(self, scope):
+        self.scope = scope
+        self.queries = 0
+        self.db_time = 0.0
+
+    @property
+    def route(self) -> str:
+        # Set by the router once the request has been matched
+        route = self.scope.get("route")
+        return getattr(route, "path", None) or "unmatched"
+
+
+_current: ContextVar[Optional[RequestStats]] = ContextVar("request_stats", default=None)
+
+
+def current_route() -> str:
+    stats = _current.get()
+    return stats.route if stats else "-"
+
+
+# -- engine and pool hooks ---------------------------------------------------
+
+def instrument_engine(engine):
+    """Count and time every statement; log the slow ones with their route and parameters."""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _start(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _finish(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["query_started"].pop()
+        stats = _current.get()
+        if stats is not None:
+            stats.queries += 1
+            stats.db_time += elapsed
+        if elapsed * 1000 >= SLOW_QUERY_MS:
+            route = current_route()
+            SLOW_QUERIES.inc(route)
+            logger.warning("Slow query (%.1f ms) on %s: %s | parameters: %r",
+                           elapsed * 1000, route, statement, parameters)
+
+    @event.listens_for(engine, "handle_error")
+    def _failed(context):
+        # Keep the timing stack balanced when a statement raises
+        started = context.connection.info.get("query_started") if context.connection is not None else None
+        if started:
+            started.pop()
+
+
+class _TimedPool:
+    """Records how long ``connect()`` waits for a connection."""
+
+    def __init__(self, *args, **kw):
+        super().__init__(*args, **kw)
+        self.capacity = kw.get("pool_size", 5) + max(kw.get("max_overflow", 10), 0)
+        _pools[self.logging_name or "default"] = self
+
+    def connect(self):
+        started = time.perf_counter()
+        try:
+            return super().connect()
+        finally:
+            POOL_WAIT.observe(time.perf_counter() - started, self.logging_name or "default")
+
+
+class TimedQueuePool(_TimedPool, QueuePool):
+    pass
+
+
+class TimedAsyncQueuePool(_TimedPool, AsyncAdaptedQueuePool):
+    pass
+
+
+def _pool_gauges():
+    rows = [(name, pool.checkedout(), pool.size(), pool.overflow(), pool.capacity)
+            for name, pool in sorted(_pools.items())]
+    gauges = (
+        ("db_pool_checked_out", "Connections currently checked out.", lambda r: r[1]),
+        ("db_pool_size", "Configured pool size.", lambda r: r[2]),
+        ("db_pool_overflow", "Connections open beyond pool_size (negative while the pool is filling).",
+         lambda r: r[3]),
+        ("db_pool_saturation", "Checked-out connections as a share of pool_size + max_overflow.",
+         lambda r: r[1] / r[4] if r[4] else 0.0),
+    )
+    for name, help, value in gauges:
+        yield f"# HELP {name} {help}"
+        yield f"# TYPE {name} gauge"
+        for row in rows:
+            yield f"{name}{_labels(('pool',), (row[0],))} {value(row)}"
+
+
+def register_limiter(limiter):
+    """Report an admission limiter's occupancy at scrape time."""
+    _limiters[limiter.name] = limiter
+
+
+def _admission_gauges():
+    gauges = (
+        ("admission_in_flight", "Requests holding an admission slot.", lambda l: l.active),
+        ("admission_queued", "Requests waiting for an admission slot.", lambda l: l.queued),
+        ("admission_limit", "Configured concurrency limit.", lambda l: l.limit),
+    )
+    for name, help, value in gauges:
+        yield f"# HELP {name} {help}"
+        yield f"# TYPE {name} gauge"
+        for limiter_name, limiter in sorted(_limiters.items()):
+            yield f"{name}{_labels(('route_class',), (limiter_name,))} {value(limiter)}"
+
+
+def render() -> str:
+    lines = []
+    for metric in (REQUESTS, REQUEST_LATENCY, REQUEST_QUERIES, REQUEST_DB_TIME, SLOW_QUERIES, POOL_WAIT,
+                   ADMISSION_WAIT, ADMISSION_REJECTED, COALESCED_READS):
+        lines.extend(metric.render())
+    lines.extend(_pool_gauges())
+    lines.extend(_admission_gauges())
+    return "\n".join(lines) + "\n"
+
+
+# -- middleware --------------------------------------------------------------
+
+class MetricsMiddleware:
+    """Pure ASGI middleware, so streamed responses are not buffered."""
+
+    def __init__(self, app, server_timing: bool = METRICS_SERVER_TIMING):
+        self.app = app
+        self.server_timing = server_timing
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        stats = RequestStats(scope)
+        token = _current.set(stats)
+        started = time.perf_counter()
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                if self.server_timing:
+                    total = (time.perf_counter() - started) * 1000
+                    value = (f'db;dur={stats.db_time * 1000:.1f};desc="{stats.queries} queries", '
+                             f"app;dur={total:.1f}")
+                    message.setdefault("headers", [])
+                    message["headers"] = list(message["headers"]) + [(b"server-timing", value.encode())]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current.reset(token)
+            elapsed = time.perf_counter() - started
+            route = stats.route
+            REQUESTS.inc(scope["method"], route, str(status_code))
+            REQUEST_LATENCY.observe(elapsed, scope["method"], route)
+            REQUEST_QUERIES.observe(stats.queries, route)
+            REQUEST_DB_TIME.observe(stats.db_time, route)
@@ -0,0 +1,161 @@
+"""Change feed backed by a transactional outbox (``change_events``).
+
+ORM writes to authors, books, users and reviews are recorded by a session
+hook as part of the flush that performs them; set-based Core statements,
+which the hook cannot see, call :func:`emit` before committing. Either way
+the event commits or rolls back with the change.
+
+Consumers read ``/changes?since=<seq>`` (or the SSE stream) and fetch the
+current state of what changed, e.g. with ``GET /books/?ids=...``.
+Rows are inserted without a sequence number. :func:`assign_sequence`
+numbers them only once they are committed, one sequencer at a time
+(a Postgres advisory lock), each run continuing above every number handed
+out before. A row that commits late therefore gets a higher number than
+anything already served, so a consumer's cursor can never pass an event
+it has not seen. Events reach the feed within ``CHANGES_SEQUENCE_INTERVAL``.
+"""
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Iterable, List, Optional
+
+from sqlalchemy import bindparam, delete, event, func, insert, select, update
+from sqlalchemy.orm import Session
+
+from app.core.config import (
+    CHANGES_HEARTBEAT,
+    CHANGES_POLL_INTERVAL,
+    CHANGES_RETENTION_DAYS,
+    CHANGES_SEQUENCE_BATCH,
+    CHANGES_SEQUENCE_INTERVAL,
+)
+from app.core.serialization import RowShape, dump
+from app.database import AsyncSessionLocal, read_session
+from app.models.author import Author
+from app.models.book import Book
+from app.models.change import ChangeEvent
+from app.models.review import Review
+from app.models.user import User
+from app.schemas.change import ChangeEventResponse
+
+
+logger = logging.getLogger(__name__)
+
+RESOURCES = {Author: "author", Book: "book", User: "user", Review: "review"}
+SHAPE = RowShape(ChangeEvent, ChangeEventResponse)
+# pg_try_advisory_xact_lock key shared by every worker's sequencer
+SEQUENCER_LOCK = 0x6F7574626F78
+
+
+async def emit(db, resource: str, action: str, ids: Iterable[int]):
+    """Record changes made with Core statements, in the caller's transaction."""
+    rows = [{"resource": resource, "resource_id": id, "action": action} for id in ids]
+    if rows:
+        await db.execute(insert(ChangeEvent), rows)
+
+
+@event.listens_for(Session, "after_flush")
+def _record_orm_changes(session, flush_context):
+    rows = []
+    for action, objects in (("created", session.new), ("updated", session.dirty), ("deleted", session.deleted)):
+        for obj in objects:
+            resource = RESOURCES.get(type(obj))
+            if resource is None:
+                continue
+            if action == "updated" and not session.is_modified(obj, include_collections=False):
+                continue
+            rows.append({"resource": resource, "resource_id": obj.id, "action": action})
+    if rows:
+        # Same connection and transaction as the flush that made the change
+        session.connection().execute(insert(ChangeEvent), rows)
+
+
+async def fetch(db, since: int, limit: int, resources: Optional[List[str]] = None):
+    """Sequenced events after ``since`` in sequence order, as dicts."""
+    stmt = (
+        select(*SHAPE.columns)
+        .where(ChangeEvent.seq > since)
+        .order_by(ChangeEvent.seq)
+        .limit(limit)
+    )
+    if resources:
+        stmt = stmt.where(ChangeEvent.resource.in_(resources))
+    return [SHAPE.item(row) for row in (await db.execute(stmt)).all()]
+
+
+async def stream(request, since: int, limit: int, resources: Optional[List[str]] = None):
+    """Server-sent events: one ``change`` event per row, ``id`` set to its seq."""
+    last, quiet = since, 0.0
+    # Browsers reconnect after this many ms and resume from Last-Event-ID
+    yield "retry: 3000\n\n"
+    while not await request.is_disconnected():
+        async with read_session() as db:
+            events = await fetch(db, last, limit, resources)
+        for item in events:
+            last = item["seq"]
+            yield f"id: {last}\nevent: change\ndata: {dump(item).decode()}\n\n"
+        if len(events) == limit:
+            # Still catching up; skip the wait
+            continue
+        if events:
+            quiet = 0.0
+        elif quiet >= CHANGES_HEARTBEAT:
+            # Keeps proxies from closing an idle connection
+            yield ": keep-alive\n\n"
+            quiet = 0.0
+        await asyncio.sleep(CHANGES_POLL_INTERVAL)
+        quiet += CHANGES_POLL_INTERVAL
+
+
+async def assign_sequence(db, batch_size: int = CHANGES_SEQUENCE_BATCH) -> int:
+    """Number up to ``batch_size`` committed, unsequenced rows; returns how many."""
+    if db.bind.dialect.name == "postgresql":
+        # Held until commit; a worker that finds it taken skips this round
+        if not (await db.execute(select(func.pg_try_advisory_xact_lock(SEQUENCER_LOCK)))).scalar():
+            await db.rollback()
+            return 0
+    pending = (await db.execute(
+        select(ChangeEvent.id).where(ChangeEvent.seq.is_(None)).order_by(ChangeEvent.id).limit(batch_size)
+    )).scalars().all()
+    if not pending:
+        await db.rollback()
+        return 0
+    last = (await db.execute(select(func.coalesce(func.max(ChangeEvent.seq), 0)))).scalar_one()
+    table = ChangeEvent.__table__
+    await db.execute(
+        update(table).where(table.c.id == bindparam("row_id")).values(seq=bindparam("row_seq")),
+        [{"row_id": row_id, "row_seq": last + n} for n, row_id in enumerate(pending, 1)],
+    )
+    await db.commit()
+    return len(pending)
+
+
+async def run_sequencer(interval: float = CHANGES_SEQUENCE_INTERVAL):
+    while True:
+        try:
+            async with AsyncSessionLocal() as db:
+                while await assign_sequence(db) == CHANGES_SEQUENCE_BATCH:
+                    pass
+        except Exception:
+            # SQLite workers racing for the write lock just retry next round
+            logger.exception("Change feed sequencing failed")
+        await asyncio.sleep(interval)
+
+
+async def prune(db, retention_days: float = CHANGES_RETENTION_DAYS) -> int:
+    cutoff = datetime.now(timezone.utc) - timedelta(days=retention_days)
+    deleted = await db.execute(
+        delete(ChangeEvent).where(ChangeEvent.created_at < cutoff).execution_options(synchronize_session=False)
+    )
+    await db.commit()
+    return deleted.rowcount
+
+
+async def run_pruner(interval: float = 3600):
+    while True:
+        try:
+            async with AsyncSessionLocal() as db:
+                await prune(db)
+        except Exception:
+            logger.exception("Change feed pruning failed")
+        await asyncio.sleep(interval)
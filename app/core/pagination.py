@@ -0,0 +1,151 @@
+import base64
+import binascii
+import json
+from typing import Any, Callable, Dict, NamedTuple, Optional, Type
+
+from fastapi import HTTPException, Query, Request, Response, status
+from pydantic import BaseModel
+from sqlalchemy import tuple_
+
+from app.core import conditional
+from app.core.config import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from app.core.serialization import RowShape, json_response
+from app.schemas.page import Page
+
+
+def encode_cursor(last_id: int, **position) -> str:
+    # Sorted pages also carry the sort name (s) and the last row's sort value (k)
+    raw = json.dumps({"id": last_id, **position}, separators=(",", ":"), default=str).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Dict[str, Any]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        position = json.loads(base64.urlsafe_b64decode(padded))
+    except (binascii.Error, ValueError, TypeError):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+    if not isinstance(position, dict) or not isinstance(position.get("id"), int):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+    return position
+
+
+class SortKey(NamedTuple):
+    """A keyset sort order: ``column`` then ``id``, both in the same direction."""
+    name: str                               # as passed in ?sort=, "-" prefix for descending
+    column: Any
+    descending: bool = False
+    parse: Callable[[Any], Any] = lambda value: value   # cursor JSON -> column value
+
+
+class PageParams:
+    """Shared keyset pagination dependency for list endpoints.
+
+    Pages are keyed on the primary key, so fetching page N costs the same
+    index range scan as page 1 no matter how large the table grows.
+    """
+
+    def __init__(
+        self,
+        request: Request,
+        response: Response,
+        cursor: Optional[str] = Query(None, description="Opaque cursor returned as next_cursor"),
+        limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+        fields: Optional[str] = Query(None, description="Comma separated list of fields to return"),
+    ):
+        self.request = request
+        self.response = response
+        self.cursor = cursor
+        self.position = decode_cursor(cursor) if cursor else None
+        self.after_id = self.position["id"] if self.position else None
+        self.limit = limit
+        self.fields = [f.strip() for f in fields.split(",") if f.strip()] if fields else None
+
+    def field_names(self, model, schema: Type[BaseModel]):
+        """Validate the requested fields against the schema and table, always including ``id``."""
+        if self.fields is None:
+            return None
+        unknown = [f for f in self.fields if f not in schema.model_fields or f not in model.__table__.c]
+        if unknown:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Unknown field(s): {', '.join(unknown)}"
+            )
+        return ["id"] + [f for f in self.fields if f != "id"]
+
+
+async def _sorted_rows(db, stmt, model, sort: SortKey, position: Optional[Dict[str, Any]], limit: int):
+    """Rows ordered by ``(sort.column, id)`` after ``position``; rows without a sort value come last."""
+    column = sort.column
+    in_tail = position is not None and position.get("k") is None
+    rows = []
+    if not in_tail:
+        ranged = stmt.where(column.isnot(None))
+        if position is not None:
+            try:
+                key = (sort.parse(position["k"]), position["id"])
+            except (KeyError, TypeError, ValueError):
+                raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+            # Row-value comparison, so the (column, id) index serves it as one range scan
+            after = tuple_(column, model.id)
+            ranged = ranged.where(after < key if sort.descending else after > key)
+        order = (column.desc(), model.id.desc()) if sort.descending else (column, model.id)
+        rows = (await db.execute(ranged.order_by(*order).limit(limit))).all()
+    if len(rows) < limit and column.expression.nullable:
+        tail = stmt.where(column.is_(None))
+        if in_tail:
+            tail = tail.where(model.id > position["id"])
+        rows += (await db.execute(tail.order_by(model.id).limit(limit - len(rows)))).all()
+    return rows
+
+
+async def paginate(db, stmt, model, schema: Type[BaseModel], page: PageParams,
+                   empty_detail: Optional[str] = None, sort: Optional[SortKey] = None):
+    """Apply keyset pagination (and optional projection) to ``stmt``.
+
+    Selects only the columns ``schema`` (or ``fields``) needs and returns a
+    ready JSON response built from the row tuples, so no ORM entity is
+    loaded or re-validated. The page carries an ETag built from row
+    versions, and a matching ``If-None-Match`` gets a 304 before any
+    serialization happens. ``empty_detail`` turns an empty first page into
+    a 404. ``sort`` pages by another column instead of the primary key;
+    the cursor then records where in that order the page ended.
+    """
+    fields = page.field_names(model, schema)
+    shape = RowShape(model, schema, fields)
+    if page.position is not None and page.position.get("s") != (sort.name if sort else None):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Cursor belongs to a different sort order")
+
+    if sort is None:
+        if page.after_id is not None:
+            stmt = stmt.where(model.id > page.after_id)
+        stmt = stmt.order_by(model.id).limit(page.limit + 1)
+        stmt = stmt.with_only_columns(*shape.columns, model.version, model.updated_at)
+        rows = (await db.execute(stmt)).all()
+    else:
+        stmt = stmt.with_only_columns(*shape.columns, model.version, model.updated_at, sort.column.label("sort_key"))
+        rows = await _sorted_rows(db, stmt, model, sort, page.position, page.limit + 1)
+
+    if empty_detail and page.cursor is None and not rows:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=empty_detail)
+    has_more = len(rows) > page.limit
+    rows = rows[:page.limit]
+    next_cursor = None
+    if has_more:
+        last = rows[-1]
+        next_cursor = encode_cursor(last.id, s=sort.name, k=last.sort_key) if sort else encode_cursor(last.id)
+
+    headers = conditional.list_validators(
+        model.__tablename__, rows, extra=f"{page.fields}|{next_cursor}"
+    )
+    if conditional.is_not_modified(page.request, headers):
+        return conditional.not_modified(headers)
+
+    items = [shape.item(row) for row in rows]
+    if fields is None:
+        return json_response({"items": items, "next_cursor": next_cursor}, Page[schema], headers=headers)
+    if "id" not in page.fields:
+        for item in items:
+            del item["id"]
+    # A projection is deliberately partial, so there is no schema to validate against
+    return json_response({"items": items, "next_cursor": next_cursor}, headers=headers)
@@ -0,0 +1,111 @@
+from sqlalchemy import case, func, select, update
+
+from app.core import outbox
+from app.models.book import Book
+from app.models.review import Review
+
+
+HISTOGRAM_COLUMNS = {
+    1: Book.rating_1,
+    2: Book.rating_2,
+    3: Book.rating_3,
+    4: Book.rating_4,
+    5: Book.rating_5,
+}
+
+
+async def _apply(db, book_id: int, rating: int, sign: int):
+    """Adjust one book's aggregates in place with a single UPDATE.
+
+    SET expressions see the row's old values, so the new average is derived
+    from the old sum/count plus this delta.
+    """
+    if rating is None:
+        return
+    new_count = Book.rating_count + sign
+    new_sum = Book.rating_sum + sign * rating
+    bucket = HISTOGRAM_COLUMNS[rating]
+    await db.execute(
+        update(Book)
+        .where(Book.id == book_id)
+        .values({
+            Book.rating_count: new_count,
+            Book.rating_sum: new_sum,
+            bucket: bucket + sign,
+            Book.rating_average: case((new_count > 0, new_sum * 1.0 / new_count), else_=0.0),
+            Book.version: Book.version + 1,
+            Book.updated_at: func.now(),
+        })
+        .execution_options(synchronize_session=False)
+    )
+    await outbox.emit(db, "book", "updated", [book_id])
+
+
+async def add_rating(db, book_id: int, rating: int):
+    await _apply(db, book_id, rating, 1)
+
+
+async def remove_rating(db, book_id: int, rating: int):
+    await _apply(db, book_id, rating, -1)
+
+
+async def move_rating(db, old_book_id: int, old_rating: int, new_book_id: int, new_rating: int):
+    if (old_book_id, old_rating) == (new_book_id, new_rating):
+        return
+    await remove_rating(db, old_book_id, old_rating)
+    await add_rating(db, new_book_id, new_rating)
+
+
+def recompute_statement(book_ids=None):
+    """UPDATE recomputing aggregates from the reviews table.
+
+    Covers every book when ``book_ids`` is None; used by the rebuild
+    command and when reviews are removed in bulk (e.g. a user is deleted).
+    """
+    def agg(expr):
+        return (
+            select(func.coalesce(expr, 0))
+            .where(Review.book_id == Book.id)
+            .scalar_subquery()
+        )
+
+    values = {
+        Book.rating_count: agg(func.count(Review.rating)),
+        Book.rating_sum: agg(func.sum(Review.rating)),
+        Book.rating_average: agg(func.avg(Review.rating)),
+        Book.version: Book.version + 1,
+        Book.updated_at: func.now(),
+    }
+    for rating, column in HISTOGRAM_COLUMNS.items():
+        values[column] = agg(func.sum(case((Review.rating == rating, 1), else_=0)))
+
+    stmt = update(Book).values(values).execution_options(synchronize_session=False)
+    if book_ids is not None:
+        stmt = stmt.where(Book.id.in_(list(book_ids)))
+    return stmt
+
+
+async def recompute(db, book_ids=None):
+    if book_ids is not None and not book_ids:
+        return 0
+    count = (await db.execute(recompute_statement(book_ids))).rowcount
+    if book_ids is not None:
+        await outbox.emit(db, "book", "updated", book_ids)
+    return count
+
+
+def rebuild():
+    from app.database import SessionLocal
+    from app.models import author, user  # noqa: F401  (register mappers)
+
+    db = SessionLocal()
+    try:
+        count = db.execute(recompute_statement()).rowcount
+        db.commit()
+    finally:
+        db.close()
+    return count
+
+
+if __name__ == "__main__":
+    print(f"Recomputed rating aggregates for {rebuild()} books")
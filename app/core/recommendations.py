@@ -0,0 +1,274 @@
+"""Item-item recommendations from co-ratings ("readers also liked").
+
+Reviews form a sparse book x user rating matrix. Each book's rating vector
+is L2-normalised, so the cosine similarity of every pair of books is one
+sparse product; builds run it over ``RECOMMEND_BATCH_SIZE`` books at a time
+and keep only the top ``RECOMMEND_TOP_K`` neighbours per book in two dense
+arrays (row indices and scores). A lookup is a dict hit plus an array slice.
+
+Writes are recorded as absolute ``(book, user) -> rating`` changes, so
+replaying one twice is harmless, and folded in by :func:`run_maintenance`
+every ``RECOMMEND_APPLY_INTERVAL`` seconds: only the changed books'
+similarity rows are recomputed, and their scores are patched into the
+neighbour lists of the books they co-occur with. Reads always see a
+complete snapshot; a new one is swapped in when the work is done. Each
+worker keeps its own index, so a periodic full rebuild picks up writes
+served by other workers and removes drift from the incremental patches.
+"""
+import asyncio
+import logging
+import threading
+from typing import Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+
+import numpy as np
+from scipy import sparse
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.core.config import (
+    RECOMMEND_APPLY_INTERVAL,
+    RECOMMEND_BATCH_SIZE,
+    RECOMMEND_REBUILD_INTERVAL,
+    RECOMMEND_TOP_K,
+)
+from app.models.review import Review
+
+
+logger = logging.getLogger(__name__)
+
+
+class _Snapshot(NamedTuple):
+    book_ids: np.ndarray           # row -> book id
+    book_row: Dict[int, int]       # book id -> row
+    user_col: Dict[int, int]       # user id -> column
+    ratings: sparse.csr_matrix     # books x users
+    neighbours: np.ndarray         # rows x K neighbour rows, -1 padded, best first
+    scores: np.ndarray             # rows x K cosine similarities
+
+
+def _normalized(ratings: sparse.csr_matrix) -> sparse.csr_matrix:
+    norms = np.sqrt(np.asarray(ratings.multiply(ratings).sum(axis=1)).ravel())
+    inverse = np.divide(1.0, norms, out=np.zeros_like(norms), where=norms > 0)
+    return sparse.diags(inverse.astype(np.float32)) @ ratings
+
+
+class RecommendationIndex:
+    def __init__(self, k: int = RECOMMEND_TOP_K, batch_size: int = RECOMMEND_BATCH_SIZE):
+        self.k = k
+        self.batch_size = batch_size
+        self._snapshot = self._empty()
+        self._built = False
+        self._building = False
+        # Serializes builds and applies; lookups never take it
+        self._write_lock = threading.Lock()
+        self._first_build = threading.Lock()
+        self._pending_lock = threading.Lock()
+        self._pending: Dict[Tuple[int, int], float] = {}
+        self._dropped: Set[int] = set()
+
+    def _empty(self) -> _Snapshot:
+        return _Snapshot(np.empty(0, dtype=np.int64), {}, {}, sparse.csr_matrix((0, 0), dtype=np.float32),
+                         np.full((0, self.k), -1, dtype=np.int32), np.zeros((0, self.k), dtype=np.float32))
+
+    @property
+    def built(self) -> bool:
+        return self._built
+
+    # -- lookups -----------------------------------------------------------
+
+    def similar(self, book_id: int, limit: Optional[int] = None) -> List[Tuple[int, float]]:
+        """Up to ``limit`` ``(book_id, score)`` pairs, most similar first."""
+        snapshot = self._snapshot
+        row = snapshot.book_row.get(book_id)
+        if row is None:
+            return []
+        neighbours = snapshot.neighbours[row, :limit]
+        scores = snapshot.scores[row, :limit]
+        found = neighbours >= 0
+        return list(zip(snapshot.book_ids[neighbours[found]].tolist(), scores[found].tolist()))
+
+    # -- recording writes --------------------------------------------------
+
+    def record(self, book_id: int, user_id: int, rating: Optional[int]):
+        """Note that ``user_id`` now rates ``book_id`` with ``rating`` (None: no longer)."""
+        if not (self._built or self._building):
+            return
+        with self._pending_lock:
+            self._pending[(book_id, user_id)] = float(rating or 0)
+
+    def forget_books(self, book_ids: Iterable[int]):
+        if not (self._built or self._building):
+            return
+        with self._pending_lock:
+            self._dropped.update(book_ids)
+
+    # -- building and applying ---------------------------------------------
+
+    def _top_k(self, normalized, transposed, rows: np.ndarray):
+        """Top-K neighbours of ``rows`` plus their full similarity rows."""
+        similarities = (normalized[rows] @ transposed).tocsr()
+        neighbours = np.full((len(rows), self.k), -1, dtype=np.int32)
+        scores = np.zeros((len(rows), self.k), dtype=np.float32)
+        indptr, indices, data = similarities.indptr, similarities.indices, similarities.data
+        for i, row in enumerate(rows):
+            cols = indices[indptr[i]:indptr[i + 1]]
+            vals = data[indptr[i]:indptr[i + 1]]
+            keep = (cols != row) & (vals > 0)
+            cols, vals = cols[keep], vals[keep]
+            if len(vals) > self.k:
+                top = np.argpartition(-vals, self.k - 1)[:self.k]
+                cols, vals = cols[top], vals[top]
+            order = np.lexsort((cols, -vals))
+            neighbours[i, :len(order)] = cols[order]
+            scores[i, :len(order)] = vals[order]
+        return neighbours, scores, similarities
+
+    def build(self, db: Session):
+        """Recompute the whole index from the reviews table."""
+        with self._write_lock:
+            self._building = True
+            try:
+                rows = db.execute(select(Review.book_id, Review.user_id, Review.rating)).all()
+                triples = np.array(rows, dtype=np.int64).reshape(-1, 3)
+                book_ids, book_index = np.unique(triples[:, 0], return_inverse=True)
+                user_ids, user_index = np.unique(triples[:, 1], return_inverse=True)
+                ratings = sparse.csr_matrix(
+                    (triples[:, 2].astype(np.float32), (book_index, user_index)),
+                    shape=(len(book_ids), len(user_ids)),
+                )
+                normalized = _normalized(ratings)
+                transposed = normalized.T.tocsr()
+                neighbours = np.full((len(book_ids), self.k), -1, dtype=np.int32)
+                scores = np.zeros((len(book_ids), self.k), dtype=np.float32)
+                for start in range(0, len(book_ids), self.batch_size):
+                    batch = np.arange(start, min(start + self.batch_size, len(book_ids)))
+                    neighbours[batch], scores[batch], _ = self._top_k(normalized, transposed, batch)
+                self._snapshot = _Snapshot(
+                    book_ids,
+                    {book_id: row for row, book_id in enumerate(book_ids.tolist())},
+                    {user_id: col for col, user_id in enumerate(user_ids.tolist())},
+                    ratings, neighbours, scores,
+                )
+                self._built = True
+            finally:
+                self._building = False
+        # Writes that landed while the reviews were being read; replaying them is harmless
+        self.apply_pending()
+
+    def _patch(self, neighbours, scores, row: int, other: int, score: float):
+        """Set ``other``'s score in ``row``'s neighbour list, keeping it top-K and sorted."""
+        entries, values = neighbours[row], scores[row]
+        hit = np.flatnonzero(entries == other)
+        if hit.size:
+            entries[hit[0]], values[hit[0]] = (other, score) if score > 0 else (-1, 0.0)
+        elif score > 0:
+            # An empty slot if there is one, else the weakest neighbour
+            slot = int(np.argmin(np.where(entries < 0, -1.0, values)))
+            if entries[slot] >= 0 and values[slot] >= score:
+                return
+            entries[slot], values[slot] = other, score
+        else:
+            return
+        order = np.lexsort((entries, -values, entries < 0))
+        neighbours[row], scores[row] = entries[order], values[order]
+
+    def apply_pending(self) -> int:
+        """Fold recorded writes into a new snapshot; returns the number of changes applied."""
+        with self._write_lock:
+            if not self._built:
+                return 0
+            with self._pending_lock:
+                changes, self._pending = self._pending, {}
+                dropped, self._dropped = self._dropped, set()
+            if not changes and not dropped:
+                return 0
+
+            current = self._snapshot
+            book_row, user_col = dict(current.book_row), dict(current.user_col)
+            new_books = sorted({book_id for book_id, _ in changes} - book_row.keys())
+            for book_id in new_books:
+                book_row[book_id] = len(book_row)
+            for user_id in sorted({user_id for _, user_id in changes} - user_col.keys()):
+                user_col[user_id] = len(user_col)
+            book_ids = np.concatenate([current.book_ids, np.array(new_books, dtype=np.int64)])
+
+            ratings = current.ratings.copy()
+            ratings.resize((len(book_row), len(user_col)))
+            dropped_rows = [book_row[book_id] for book_id in dropped if book_id in book_row]
+            affected = set(dropped_rows)
+            if changes:
+                rows = np.array([book_row[book_id] for book_id, _ in changes], dtype=np.int64)
+                cols = np.array([user_col[user_id] for _, user_id in changes], dtype=np.int64)
+                values = np.array(list(changes.values()), dtype=np.float32)
+                delta = values - np.asarray(ratings[rows, cols]).ravel()
+                ratings = ratings + sparse.csr_matrix((delta, (rows, cols)), shape=ratings.shape)
+                affected.update(rows.tolist())
+            if dropped_rows:
+                # Deleted books keep their row (ids are never reused) but lose every rating
+                keep = np.ones(ratings.shape[0], dtype=np.float32)
+                keep[dropped_rows] = 0
+                ratings = sparse.diags(keep) @ ratings
+            ratings = ratings.tocsr()
+            ratings.eliminate_zeros()
+
+            normalized = _normalized(ratings)
+            transposed = normalized.T.tocsr()
+            affected_rows = np.array(sorted(affected), dtype=np.int64)
+            padding = len(book_row) - len(current.neighbours)
+            neighbours = np.vstack([current.neighbours, np.full((padding, self.k), -1, dtype=np.int32)])
+            scores = np.vstack([current.scores, np.zeros((padding, self.k), dtype=np.float32)])
+            neighbours[affected_rows], scores[affected_rows], similarities = self._top_k(
+                normalized, transposed, affected_rows
+            )
+
+            # Similarity is symmetric, so the changed books' rows say how every other list moves
+            recomputed = set(affected_rows.tolist())
+            for i, row in enumerate(affected_rows.tolist()):
+                cols = similarities.indices[similarities.indptr[i]:similarities.indptr[i + 1]]
+                vals = similarities.data[similarities.indptr[i]:similarities.indptr[i + 1]]
+                co_rated = set()
+                for other, score in zip(cols.tolist(), vals.tolist()):
+                    if other != row and other not in recomputed:
+                        co_rated.add(other)
+                        self._patch(neighbours, scores, other, row, score)
+                # Lists that still name this book although nobody co-rates it any more
+                for other in np.flatnonzero((neighbours == row).any(axis=1)).tolist():
+                    if other not in co_rated and other not in recomputed:
+                        self._patch(neighbours, scores, other, row, 0.0)
+
+            self._snapshot = _Snapshot(book_ids, book_row, user_col, ratings, neighbours, scores)
+            return len(changes) + len(dropped)
+
+    def rebuild(self):
+        from app.database import SessionLocal
+
+        with SessionLocal() as db:
+            self.build(db)
+
+    def ensure_built(self):
+        # Concurrent first requests wait for one build instead of each running their own
+        with self._first_build:
+            if not self._built:
+                self.rebuild()
+
+
+index = RecommendationIndex()
+
+
+async def run_maintenance(apply_interval: float = RECOMMEND_APPLY_INTERVAL,
+                          rebuild_interval: float = RECOMMEND_REBUILD_INTERVAL):
+    """Fold recorded writes in regularly and rebuild from scratch now and then."""
+    loop = asyncio.get_running_loop()
+    last_rebuild = loop.time()
+    while True:
+        await asyncio.sleep(apply_interval)
+        if not index.built:
+            continue
+        try:
+            if loop.time() - last_rebuild >= rebuild_interval:
+                await asyncio.to_thread(index.rebuild)
+                last_rebuild = loop.time()
+            else:
+                await asyncio.to_thread(index.apply_pending)
+        except Exception:
+            logger.exception("Recommendation index maintenance failed")
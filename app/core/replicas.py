@@ -0,0 +1,147 @@
+"""Read-replica routing.
+
+``GET``/``HEAD`` requests read from the replicas in round-robin order;
+everything else, and every read while no replica is healthy, goes to the
+primary. A background task probes each replica every
+``REPLICA_HEALTH_INTERVAL`` seconds and takes it out of rotation when it is
+unreachable or (on Postgres) replaying more than ``REPLICA_MAX_LAG``
+seconds behind.
+
+Read-your-writes: a successful write marks the client as pinned to the
+primary for ``READ_YOUR_WRITES_SECONDS``, both as a cookie (browsers) and
+as a response header that API clients echo back on their next requests.
+The marker comes from the client, so a time more than the window ahead is
+ignored, and with ``READ_YOUR_WRITES_KEY`` set it carries an HMAC that must
+match.
+"""
+import asyncio
+import hmac
+import itertools
+import logging
+import time
+from typing import List, Optional
+
+from sqlalchemy import text
+
+from app.core.config import (
+    READ_YOUR_WRITES_KEY,
+    READ_YOUR_WRITES_SECONDS,
+    REPLICA_HEALTH_INTERVAL,
+    REPLICA_MAX_LAG,
+)
+
+
+logger = logging.getLogger(__name__)
+
+STICKY_COOKIE = "read_primary_until"
+STICKY_HEADER = "x-read-primary-until"
+READ_METHODS = frozenset(("GET", "HEAD"))
+
+# Replay lag in seconds: 0 once everything received has been replayed (so a quiet
+# primary does not look like lag), otherwise the age of the last replayed transaction.
+# NULL on a primary.
+PG_REPLICATION_LAG = text(
+    "SELECT CASE WHEN NOT pg_is_in_recovery() THEN NULL "
+    "WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+    "ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) END"
+)
+
+
+class ReplicaSet:
+    def __init__(self, engines):
+        self.engines = list(engines)
+        self.healthy: List = list(self.engines)
+        self._turn = itertools.count()
+
+    def pick(self) -> Optional[object]:
+        """Next healthy replica engine, or None to use the primary."""
+        healthy = self.healthy
+        if not healthy:
+            return None
+        return healthy[next(self._turn) % len(healthy)]
+
+    async def _probe(self, engine) -> bool:
+        try:
+            async with engine.connect() as conn:
+                if engine.dialect.name != "postgresql":
+                    await conn.execute(text("SELECT 1"))
+                    return True
+                lag = (await conn.execute(PG_REPLICATION_LAG)).scalar()
+        except Exception as exc:
+            logger.warning("Replica %s is unreachable: %s", engine.url.render_as_string(), exc)
+            return False
+        # No replayed transaction yet counts as caught up
+        if lag is not None and lag > REPLICA_MAX_LAG:
+            logger.warning("Replica %s is %.1fs behind", engine.url.render_as_string(), lag)
+            return False
+        return True
+
+    async def check(self):
+        results = await asyncio.gather(*(self._probe(engine) for engine in self.engines))
+        self.healthy = [engine for engine, ok in zip(self.engines, results) if ok]
+
+    async def run_health_checks(self, interval: float = REPLICA_HEALTH_INTERVAL):
+        while True:
+            try:
+                await self.check()
+            except Exception:
+                logger.exception("Replica health check failed")
+            await asyncio.sleep(interval)
+
+
+def _signature(until: str, key: str) -> str:
+    return hmac.new(key.encode(), until.encode(), "sha256").hexdigest()
+
+
+def sticky_marker(until: float, key: str = READ_YOUR_WRITES_KEY) -> str:
+    """The value a client echoes back to stay on the primary until ``until``."""
+    value = f"{until:.3f}"
+    return f"{value}:{_signature(value, key)}" if key else value
+
+
+def pinned_until(marker: str, key: str = READ_YOUR_WRITES_KEY) -> Optional[float]:
+    """The time in a marker from :func:`sticky_marker`, or None when it is malformed or forged."""
+    value, _, signature = marker.partition(":")
+    if key and not hmac.compare_digest(signature, _signature(value, key)):
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        return None
+
+
+def wants_primary(request) -> bool:
+    """Whether ``request`` must read from the primary."""
+    if request.method not in READ_METHODS:
+        return True
+    marker = request.headers.get(STICKY_HEADER) or request.cookies.get(STICKY_COOKIE)
+    until = pinned_until(marker) if marker else None
+    if until is None:
+        return False
+    now = time.time()
+    # No write pins for longer than the window (plus a second for rounding and clock drift)
+    return now < until <= now + READ_YOUR_WRITES_SECONDS + 1
+
+
+class ReadYourWritesMiddleware:
+    """Pins a client to the primary for a short window after each successful write."""
+
+    def __init__(self, app, window: float = READ_YOUR_WRITES_SECONDS):
+        self.app = app
+        self.window = window
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] in READ_METHODS or self.window <= 0:
+            return await self.app(scope, receive, send)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start" and message["status"] < 400:
+                until = sticky_marker(time.time() + self.window)
+                cookie = f"{STICKY_COOKIE}={until}; Max-Age={int(self.window) or 1}; Path=/; HttpOnly; SameSite=Lax"
+                message["headers"] = list(message.get("headers", [])) + [
+                    (STICKY_HEADER.encode(), until.encode()),
+                    (b"set-cookie", cookie.encode()),
+                ]
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
@@ -0,0 +1,363 @@
+"""Ranked book search for /books/search.
+
+On Postgres the query runs in the database against the tsvector and
+pg_trgm indexes. Elsewhere an in-process inverted index is used: it is
+built from the database by the first search (in a worker thread, so the
+event loop keeps serving) and then kept current by session events. Each
+worker keeps its own index and only sees its own writes, so
+:func:`run_maintenance` rebuilds it every ``SEARCH_REBUILD_INTERVAL``
+seconds to pick up writes served by other workers; searches keep using
+the old index until the new one is swapped in.
+"""
+import asyncio
+import bisect
+import logging
+import math
+import re
+import threading
+from typing import Dict, List, Optional, Set, Tuple
+
+from sqlalchemy import event, func, literal, literal_column, or_, select
+from sqlalchemy.orm import Session
+
+from app.core.config import SEARCH_BACKEND, SEARCH_MAX_PREFIX_EXPANSIONS, SEARCH_REBUILD_INTERVAL
+from app.models.author import Author
+from app.models.book import Book
+
+
+logger = logging.getLogger(__name__)
+
+TOKEN_RE = re.compile(r"\w+")
+# Rendered inline so queries match the ix_books_title_tsv expression index
+TS_CONFIG = literal_column("'simple'")
+
+
+def tokenize(text: Optional[str]) -> List[str]:
+    return TOKEN_RE.findall(text.lower()) if text else []
+
+
+class SearchBackend:
+    """Ranks books for /books/search.
+
+    ``search`` returns ``(total, [(book_id, score), ...])`` for the requested
+    page, ordered by descending score and then id.
+    """
+
+    async def search(self, db, title=None, isbn=None, author_name=None,
+                     limit: int = 20, offset: int = 0) -> Tuple[int, List[Tuple[int, float]]]:
+        raise NotImplementedError
+
+
+class PostgresSearchBackend(SearchBackend):
+    """Full-text (tsvector) plus trigram (pg_trgm) search.
+
+    Backed by the GIN indexes declared on ``books``/``authors`` and the
+    ``text_pattern_ops`` index on ``books.isbn`` for prefix lookups.
+    """
+
+    async def search(self, db, title=None, isbn=None, author_name=None, limit=20, offset=0):
+        score = literal(0.0)
+        conditions = []
+        if title:
+            tsv = func.to_tsvector(TS_CONFIG, Book.title)
+            tsq = func.plainto_tsquery(TS_CONFIG, title)
+            conditions.append(or_(tsv.op("@@")(tsq), Book.title.op("%")(title)))
+            score = score + func.ts_rank(tsv, tsq) + func.similarity(Book.title, title)
+        if author_name:
+            conditions.append(or_(Author.name.op("%")(author_name),
+                                  Author.name.icontains(author_name, autoescape=True)))
+            score = score + func.similarity(Author.name, author_name)
+        if isbn:
+            conditions.append(Book.isbn.startswith(isbn, autoescape=True))
+
+        score = score.label("score")
+        stmt = (
+            select(Book.id, score, func.count().over().label("total"))
+            .join(Author, Book.author_id == Author.id)
+            .where(*conditions)
+            .order_by(score.desc(), Book.id)
+            .limit(limit)
+            .offset(offset)
+        )
+        rows = (await db.execute(stmt)).all()
+        total = rows[0].total if rows else 0
+        return total, [(row.id, float(row.score)) for row in rows]
+
+
+class InMemorySearchBackend(SearchBackend):
+    """In-process inverted index used where pg_trgm/tsvector are unavailable.
+
+    Title and author-name tokens map to posting sets; every query token also
+    matches vocabulary terms it prefixes (via a sorted term list), and ISBNs
+    are kept sorted for prefix lookups with ``bisect``. The index is built
+    from the database on first use and then kept current by session events.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._first_build = threading.Lock()
+        self._build_lock = threading.Lock()
+        self._built = False
+        # Changes committed while a build reads the tables; replayed onto the new index
+        self._replay: Optional[list] = None
+        self._reset()
+
+    def _reset(self):
+        self.books: Dict[int, Tuple[Tuple[str, ...], Optional[str], int]] = {}
+        self.title_postings: Dict[str, Set[int]] = {}
+        self.title_terms: List[str] = []
+        self.authors: Dict[int, Tuple[str, ...]] = {}
+        self.author_postings: Dict[str, Set[int]] = {}
+        self.author_terms: List[str] = []
+        self.author_books: Dict[int, Set[int]] = {}
+        self.isbns: List[Tuple[str, int]] = []
+
+    # -- maintenance -------------------------------------------------------
+
+    def build(self, db: Session):
+        """Recompute the index from the database; searches use the current one meanwhile."""
+        with self._build_lock:
+            with self._lock:
+                self._replay = []
+            staging = InMemorySearchBackend()
+            try:
+                for row in db.execute(select(Author.id, Author.name).execution_options(yield_per=5000)):
+                    staging._put_author(row.id, row.name)
+                stmt = select(Book.id, Book.title, Book.isbn, Book.author_id).execution_options(yield_per=5000)
+                for row in db.execute(stmt):
+                    staging._put_book(row.id, row.title, row.isbn, row.author_id)
+            except BaseException:
+                with self._lock:
+                    self._replay = None
+                raise
+            with self._lock:
+                for changes in self._replay:
+                    staging._apply(*changes)
+                self._replay = None
+                # The public attributes are exactly the index structures set up by _reset
+                self.__dict__.update({name: value for name, value in vars(staging).items()
+                                      if not name.startswith("_")})
+                self._built = True
+
+    def rebuild(self):
+        from app.database import SessionLocal
+
+        with SessionLocal() as db:
+            self.build(db)
+
+    def ensure_built(self):
+        # Concurrent first searches wait for one build instead of each running their own
+        with self._first_build:
+            if not self._built:
+                self.rebuild()
+
+    def invalidate(self):
+        """Drop the index; it is rebuilt from the database on the next search."""
+        with self._lock:
+            self._reset()
+            self._built = False
+
+    @property
+    def built(self) -> bool:
+        return self._built
+
+    @property
+    def building(self) -> bool:
+        return self._replay is not None
+
+    def apply(self, books, authors, deleted_books, deleted_authors):
+        with self._lock:
+            if self._replay is not None:
+                self._replay.append((books, authors, deleted_books, deleted_authors))
+            if self._built:
+                self._apply(books, authors, deleted_books, deleted_authors)
+
+    def _apply(self, books, authors, deleted_books, deleted_authors):
+        with self._lock:
+            for book_id in deleted_books:
+                self._drop_book(book_id)
+            for author_id in deleted_authors:
+                for book_id in list(self.author_books.get(author_id, ())):
+                    self._drop_book(book_id)
+                self._drop_author(author_id)
+            for author_id, name in authors:
+                if author_id not in deleted_authors:
+                    self._put_author(author_id, name)
+            for book_id, title, isbn, author_id in books:
+                if book_id not in deleted_books and author_id not in deleted_authors:
+                    self._put_book(book_id, title, isbn, author_id)
+
+    @staticmethod
+    def _add_posting(postings, terms, term, key):
+        if term not in postings:
+            postings[term] = set()
+            bisect.insort(terms, term)
+        postings[term].add(key)
+
+    @staticmethod
+    def _remove_posting(postings, terms, term, key):
+        keys = postings.get(term)
+        if keys is None:
+            return
+        keys.discard(key)
+        if not keys:
+            del postings[term]
+            terms.pop(bisect.bisect_left(terms, term))
+
+    def _put_book(self, book_id, title, isbn, author_id):
+        self._drop_book(book_id)
+        tokens = tuple(tokenize(title))
+        self.books[book_id] = (tokens, isbn, author_id)
+        for token in set(tokens):
+            self._add_posting(self.title_postings, self.title_terms, token, book_id)
+        self.author_books.setdefault(author_id, set()).add(book_id)
+        if isbn:
+            bisect.insort(self.isbns, (isbn, book_id))
+
+    def _drop_book(self, book_id):
+        entry = self.books.pop(book_id, None)
+        if entry is None:
+            return
+        tokens, isbn, author_id = entry
+        for token in set(tokens):
+            self._remove_posting(self.title_postings, self.title_terms, token, book_id)
+        self.author_books.get(author_id, set()).discard(book_id)
+        if isbn:
+            i = bisect.bisect_left(self.isbns, (isbn, book_id))
+            if i < len(self.isbns) and self.isbns[i] == (isbn, book_id):
+                self.isbns.pop(i)
+
+    def _put_author(self, author_id, name):
+        self._drop_author(author_id)
+        tokens = tuple(tokenize(name))
+        self.authors[author_id] = tokens
+        for token in set(tokens):
+            self._add_posting(self.author_postings, self.author_terms, token, author_id)
+
+    def _drop_author(self, author_id):
+        tokens = self.authors.pop(author_id, None)
+        if tokens is None:
+            return
+        for token in set(tokens):
+            self._remove_posting(self.author_postings, self.author_terms, token, author_id)
+
+    # -- querying ----------------------------------------------------------
+
+    def _match(self, query, postings, terms) -> Dict[int, float]:
+        """Score keys matching every token of ``query`` (exact or prefix)."""
+        scores: Optional[Dict[int, float]] = None
+        for token in tokenize(query):
+            token_scores: Dict[int, float] = {}
+            start = bisect.bisect_left(terms, token)
+            for term in terms[start:start + SEARCH_MAX_PREFIX_EXPANSIONS]:
+                if not term.startswith(token):
+                    break
+                keys = postings[term]
+                weight = math.log(1 + len(self.books) / len(keys))
+                if term != token:
+                    weight *= len(token) / len(term)
+                for key in keys:
+                    if weight > token_scores.get(key, 0.0):
+                        token_scores[key] = weight
+            if scores is None:
+                scores = token_scores
+            else:
+                scores = {key: s + token_scores[key] for key, s in scores.items() if key in token_scores}
+            if not scores:
+                return {}
+        return scores or {}
+
+    def _isbn_prefix(self, isbn) -> Set[int]:
+        start = bisect.bisect_left(self.isbns, (isbn,))
+        ids = set()
+        for value, book_id in self.isbns[start:]:
+            if not value.startswith(isbn):
+                break
+            ids.add(book_id)
+        return ids
+
+    async def search(self, db, title=None, isbn=None, author_name=None, limit=20, offset=0):
+        if not self._built:
+            # Built off the event loop, on its own session; it reads every book and author once
+            await asyncio.to_thread(self.ensure_built)
+        with self._lock:
+            scores: Optional[Dict[int, float]] = None
+            if title:
+                scores = self._match(title, self.title_postings, self.title_terms)
+            if author_name:
+                author_scores = self._match(author_name, self.author_postings, self.author_terms)
+                by_book = {
+                    book_id: s
+                    for author_id, s in author_scores.items()
+                    for book_id in self.author_books.get(author_id, ())
+                }
+                scores = by_book if scores is None else {
+                    key: s + by_book[key] for key, s in scores.items() if key in by_book
+                }
+            if isbn:
+                isbn_ids = self._isbn_prefix(isbn)
+                if scores is None:
+                    scores = {book_id: 1.0 for book_id in isbn_ids}
+                else:
+                    scores = {key: s for key, s in scores.items() if key in isbn_ids}
+            if scores is None:
+                scores = dict.fromkeys(self.books, 0.0)
+
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+        return len(ranked), ranked[offset:offset + limit]
+
+
+memory_backend = InMemorySearchBackend()
+postgres_backend = PostgresSearchBackend()
+
+
+def get_search_backend(db) -> SearchBackend:
+    if SEARCH_BACKEND == "postgres":
+        return postgres_backend
+    if SEARCH_BACKEND == "memory":
+        return memory_backend
+    return postgres_backend if db.bind.dialect.name == "postgresql" else memory_backend
+
+
+# -- keep the in-memory index current ----------------------------------------
+
+@event.listens_for(Session, "after_flush")
+def _collect_search_changes(session, flush_context):
+    if not (memory_backend.built or memory_backend.building):
+        return
+    pending = session.info.setdefault("search_pending", ([], [], set(), set()))
+    books, authors, deleted_books, deleted_authors = pending
+    for obj in list(session.new) + list(session.dirty):
+        if isinstance(obj, Book):
+            books.append((obj.id, obj.title, obj.isbn, obj.author_id))
+        elif isinstance(obj, Author):
+            authors.append((obj.id, obj.name))
+    for obj in session.deleted:
+        if isinstance(obj, Book):
+            deleted_books.add(obj.id)
+        elif isinstance(obj, Author):
+            deleted_authors.add(obj.id)
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_search_changes(session):
+    pending = session.info.pop("search_pending", None)
+    if pending:
+        memory_backend.apply(*pending)
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _discard_search_changes(session, previous_transaction):
+    session.info.pop("search_pending", None)
+
+
+async def run_maintenance(interval: float = SEARCH_REBUILD_INTERVAL):
+    """Rebuild the in-memory index now and then to pick up other workers' writes."""
+    while True:
+        await asyncio.sleep(interval)
+        if not memory_backend.built:
+            continue
+        try:
+            await asyncio.to_thread(memory_backend.rebuild)
+        except Exception:
+            logger.exception("Search index rebuild failed")
@@ -0,0 +1,85 @@
+"""Fast response path for list endpoints.
+
+Instead of loading ORM entities and letting FastAPI validate each one
+against ``response_model`` (``from_attributes``), then ``jsonable_encoder``,
+then ``json.dumps``, list endpoints select exactly the columns their
+schema needs, turn each row tuple into a dict and encode the payload once
+with pydantic-core (``TypeAdapter.dump_json``). The route's
+``response_model`` still documents the shape; ``RESPONSE_VALIDATION=1``
+validates fast-path payloads against it, e.g. in development.
+"""
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple, Type
+
+from fastapi import Response
+from pydantic import BaseModel, TypeAdapter
+
+from app.core.config import RESPONSE_VALIDATION
+from app.models.book import Book
+
+
+_ANY = TypeAdapter(Any)
+
+# Schema fields that are not plain columns: model -> field -> (columns, build(row))
+COMPUTED: Dict[type, Dict[str, Tuple[Sequence, Callable]]] = {
+    Book: {
+        "rating_histogram": (
+            [Book.rating_1, Book.rating_2, Book.rating_3, Book.rating_4, Book.rating_5],
+            lambda row: {1: row.rating_1, 2: row.rating_2, 3: row.rating_3, 4: row.rating_4, 5: row.rating_5},
+        ),
+    },
+}
+
+
+@lru_cache(maxsize=None)
+def _adapter(schema) -> TypeAdapter:
+    return TypeAdapter(schema)
+
+
+class RowShape:
+    """The columns a schema needs from ``model`` and how to turn a row back into its fields.
+
+    ``label_prefix`` keeps column labels unique when several shapes share a
+    SELECT (e.g. a book and its author).
+    """
+
+    def __init__(self, model, schema: Type[BaseModel], fields: Optional[Sequence[str]] = None,
+                 label_prefix: str = ""):
+        computed = COMPUTED.get(model, {})
+        table = model.__table__.c
+        names = fields if fields is not None else [
+            name for name in schema.model_fields if name in table or name in computed
+        ]
+        self.fields: List[Tuple[str, str]] = []
+        self.computed: List[Tuple[str, Callable]] = []
+        self.columns = []
+        for name in names:
+            if name in computed:
+                columns, build = computed[name]
+                self.columns.extend(columns)
+                self.computed.append((name, build))
+            else:
+                label = f"{label_prefix}{name}"
+                self.columns.append(getattr(model, name).label(label))
+                self.fields.append((name, label))
+
+    def item(self, row) -> Dict[str, Any]:
+        item = {name: getattr(row, label) for name, label in self.fields}
+        for name, build in self.computed:
+            item[name] = build(row)
+        return item
+
+
+def dump(payload, schema=None) -> bytes:
+    """Encode plain dicts/lists in one pass; ``schema`` is only used when validation is on."""
+    if RESPONSE_VALIDATION and schema is not None:
+        adapter = _adapter(schema)
+        return adapter.dump_json(adapter.validate_python(payload))
+    return _ANY.dump_json(payload)
+
+
+def json_response(payload, schema=None, headers: Optional[Dict[str, str]] = None,
+                  status_code: int = 200) -> Response:
+    # Returning a Response makes FastAPI skip response_model validation and encoding
+    return Response(content=dump(payload, schema), media_type="application/json",
+                    headers=headers, status_code=status_code)
@@ -0,0 +1,160 @@
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, List
+
+from fastapi import HTTPException, status
+from sqlalchemy import func, select, update
+
+from app.core import outbox
+from app.core.cache import cache, book_key
+from app.core.config import (
+    STOCK_RESERVATION_TTL,
+    STOCK_RESERVATION_MAX_TTL,
+    STOCK_SWEEP_INTERVAL,
+    STOCK_SWEEP_BATCH,
+)
+from app.database import AsyncSessionLocal
+from app.models.book import Book
+from app.models.reservation import StockReservation, ReservationItem
+
+
+logger = logging.getLogger(__name__)
+
+HELD = "held"
+
+
+def _now():
+    return datetime.now(timezone.utc)
+
+
+def _adjust(book_id: int, delta: int):
+    # Stock is part of the book representation, so bump its validators too
+    stmt = (
+        update(Book)
+        .where(Book.id == book_id)
+        .values({
+            Book.stock: Book.stock + delta,
+            Book.version: Book.version + 1,
+            Book.updated_at: func.now(),
+        })
+        .execution_options(synchronize_session=False)
+    )
+    # Decrements only succeed while enough stock is left; no row is read first
+    return stmt.where(Book.stock >= -delta) if delta < 0 else stmt
+
+
+async def reserve(db, quantities: Dict[int, int], ttl_seconds: int = None) -> StockReservation:
+    """Hold ``{book_id: quantity}`` in one transaction or not at all.
+
+    Each book costs a single conditional UPDATE; rows are touched in id
+    order so concurrent multi-book reservations cannot deadlock, and locks
+    are held only until the commit a few statements later.
+    """
+    ttl = min(ttl_seconds or STOCK_RESERVATION_TTL, STOCK_RESERVATION_MAX_TTL)
+    for book_id in sorted(quantities):
+        result = await db.execute(_adjust(book_id, -quantities[book_id]))
+        if not result.rowcount:
+            await db.rollback()
+            exists = (await db.execute(select(Book.id).where(Book.id == book_id))).first()
+            if not exists:
+                raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
+                                    detail=f"Book not found with given id: {book_id}")
+            raise HTTPException(status_code=status.HTTP_409_CONFLICT,
+                                detail=f"Not enough stock for book {book_id}")
+    await outbox.emit(db, "book", "updated", sorted(quantities))
+
+    reservation = StockReservation(
+        status=HELD,
+        expires_at=_now() + timedelta(seconds=ttl),
+        items=[ReservationItem(book_id=book_id, quantity=qty) for book_id, qty in sorted(quantities.items())],
+    )
+    db.add(reservation)
+    await db.commit()
+    await cache.delete(*[book_key(book_id) for book_id in quantities])
+    return reservation
+
+
+async def _restock(db, reservation_ids: Iterable[int]) -> List[int]:
+    rows = (await db.execute(
+        select(ReservationItem.book_id, func.sum(ReservationItem.quantity))
+        .where(ReservationItem.reservation_id.in_(list(reservation_ids)))
+        .group_by(ReservationItem.book_id)
+        .order_by(ReservationItem.book_id)
+    )).all()
+    for book_id, quantity in rows:
+        await db.execute(_adjust(book_id, quantity))
+    await outbox.emit(db, "book", "updated", [book_id for book_id, _ in rows])
+    return [book_id for book_id, _ in rows]
+
+
+async def _transition(db, reservation_id: int, new_status: str, *conditions):
+    """Move a held reservation to ``new_status``; only one caller can win."""
+    moved = (await db.execute(
+        update(StockReservation)
+        .where(StockReservation.id == reservation_id, StockReservation.status == HELD, *conditions)
+        .values(status=new_status)
+        .returning(StockReservation.id)
+        .execution_options(synchronize_session=False)
+    )).first()
+    if moved:
+        return
+    await db.rollback()
+    current = await db.get(StockReservation, reservation_id)
+    if current is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Reservation not found with given id")
+    state = "expired" if current.status == HELD else current.status
+    raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=f"Reservation is already {state}")
+
+
+async def commit(db, reservation_id: int):
+    # The held stock simply stays taken
+    await _transition(db, reservation_id, "committed", StockReservation.expires_at > _now())
+    await db.commit()
+
+
+async def release(db, reservation_id: int):
+    # Releasing a lapsed reservation before the sweeper gets to it is fine
+    await _transition(db, reservation_id, "released")
+    book_ids = await _restock(db, [reservation_id])
+    await db.commit()
+    await cache.delete(*[book_key(book_id) for book_id in book_ids])
+
+
+async def expire_due(db, batch_size: int = STOCK_SWEEP_BATCH) -> int:
+    """Return the stock of up to ``batch_size`` lapsed reservations to the shelf."""
+    due = (
+        select(StockReservation.id)
+        .where(StockReservation.status == HELD, StockReservation.expires_at <= _now())
+        .order_by(StockReservation.expires_at)
+        .limit(batch_size)
+        # Parallel sweepers (one per worker) split the backlog instead of queueing on it
+        .with_for_update(skip_locked=True)
+    )
+    # Guarded on status, so a concurrent commit/release or another sweeper never double-restocks
+    expired = (await db.execute(
+        update(StockReservation)
+        .where(StockReservation.id.in_(due.scalar_subquery()), StockReservation.status == HELD)
+        .values(status="expired")
+        .returning(StockReservation.id)
+        .execution_options(synchronize_session=False)
+    )).scalars().all()
+    if not expired:
+        await db.rollback()
+        return 0
+    book_ids = await _restock(db, expired)
+    await db.commit()
+    await cache.delete(*[book_key(book_id) for book_id in book_ids])
+    return len(expired)
+
+
+async def run_sweeper(interval: float = STOCK_SWEEP_INTERVAL):
+    while True:
+        try:
+            async with AsyncSessionLocal() as db:
+                # Keep draining while full batches come back
+                while await expire_due(db) >= STOCK_SWEEP_BATCH:
+                    pass
+        except Exception:
+            logger.exception("Stock reservation sweep failed")
+        await asyncio.sleep(interval)
@@ -1,24 +1,110 @@
-from sqlalchemy import create_engine
+from fastapi import Request
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
-from dotenv import load_dotenv
-import os
 
+from app.core.metrics import TimedAsyncQueuePool, TimedQueuePool, instrument_engine
+from app.core.replicas import ReplicaSet, wants_primary
+from app.core.config import (
+    DATABASE_URL,
+    ASYNC_DATABASE_URL,
+    DATABASE_REPLICA_URLS,
+    DB_POOL_SIZE,
+    DB_MAX_OVERFLOW,
+    DB_POOL_TIMEOUT,
+    DB_POOL_RECYCLE,
+    DB_POOL_PRE_PING,
+)
 
-load_dotenv()
 
+ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+}
 
-DATABASE_URL = os.getenv("DATABASE_URL")
 
-engine = create_engine(DATABASE_URL)
+def async_url(url):
+    url = make_url(url)
+    driver = ASYNC_DRIVERS.get(url.get_backend_name())
+    return url.set(drivername=driver) if driver else url
 
 
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+def engine_options(url, name, is_async=False):
+    options = {"pool_pre_ping": DB_POOL_PRE_PING, "pool_recycle": DB_POOL_RECYCLE}
+    # Timed pools feed the checkout-wait and saturation metrics; in-memory SQLite keeps its own pool
+    if make_url(url).database not in (None, "", ":memory:"):
+        options.update(
+            poolclass=TimedAsyncQueuePool if is_async else TimedQueuePool,
+            pool_logging_name=name,
+        )
+    # SQLite connections are local files; queue sizing only applies to servers
+    if make_url(url).get_backend_name() != "sqlite":
+        options.update(
+            pool_size=DB_POOL_SIZE,
+            max_overflow=DB_MAX_OVERFLOW,
+            pool_timeout=DB_POOL_TIMEOUT,
+        )
+    return options
+
+
+engine = create_engine(DATABASE_URL, **engine_options(DATABASE_URL, "sync"))
+
+async_engine = create_async_engine(
+    ASYNC_DATABASE_URL or async_url(DATABASE_URL), **engine_options(DATABASE_URL, "async", is_async=True)
+)
+
+# Replicas only serve reads, so only the async routers use them
+replica_engines = [
+    create_async_engine(async_url(url), **engine_options(url, f"replica{i}", is_async=True))
+    for i, url in enumerate(DATABASE_REPLICA_URLS, 1)
+]
+replicas = ReplicaSet(replica_engines)
+
+instrument_engine(engine)
+instrument_engine(async_engine.sync_engine)
+for replica in replica_engines:
+    instrument_engine(replica.sync_engine)
+
+
+def enforce_sqlite_foreign_keys(engine):
+    # SQLite ignores ON DELETE CASCADE unless foreign keys are switched on per connection
+    if engine.dialect.name != "sqlite":
+        return
+
+    @event.listens_for(engine, "connect")
+    def _foreign_keys_on(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA foreign_keys=ON")
+        cursor.close()
+
+
+enforce_sqlite_foreign_keys(engine)
+enforce_sqlite_foreign_keys(async_engine.sync_engine)
+for replica in replica_engines:
+    enforce_sqlite_foreign_keys(replica.sync_engine)
+
+
+# Written rows come back via RETURNING (eager_defaults), so nothing needs reloading after commit
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False, bind=engine)
+
+# Objects must stay usable after commit: lazy loads cannot run outside the event loop
+AsyncSessionLocal = async_sessionmaker(
+    bind=async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False
+)
 
 
 Base = declarative_base()
 
 
+@event.listens_for(Base.metadata, "before_create")
+def create_extensions(target, connection, **kw):
+    # Trigram indexes used by /books/search
+    if connection.dialect.name == "postgresql":
+        connection.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+
+
 def get_db():
     
     db = SessionLocal()
@@ -26,3 +112,16 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+def read_session() -> AsyncSession:
+    """Session on the next healthy replica, or on the primary when there is none."""
+    replica = replicas.pick()
+    return AsyncSessionLocal(bind=replica) if replica is not None else AsyncSessionLocal()
+
+
+async def get_async_db(request: Request):
+    # Reads go to a replica unless the client just wrote and is pinned to the primary
+    session = AsyncSessionLocal() if wants_primary(request) else read_session()
+    async with session as db:
+        yield db
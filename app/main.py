@@ -1,21 +1,78 @@
-from fastapi import FastAPI
-from app.database import engine, Base
-from app.models import user, author, book, review
-from app.routers import authors,books,users,reviews
+import asyncio
+from contextlib import asynccontextmanager, suppress
+from fastapi import FastAPI, Request, status
+from fastapi.responses import JSONResponse, PlainTextResponse
+from sqlalchemy.orm.exc import StaleDataError
+from app.database import engine, Base, replicas
+from app.models import user, author, book, review, reservation, change
+from app.routers import authors,books,users,reviews,reservations,changes
+from app.core.cache import cache
+from app.core import coalesce, credentials, metrics, outbox, recommendations, search, stock
+from app.core.admission import AdmissionMiddleware
+from app.core.compression import CompressionMiddleware
+from app.core.replicas import ReadYourWritesMiddleware
+from app.core.config import AUTO_CREATE_TABLES
 
 
-app=FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Returns the stock of lapsed reservations; safe to run in every worker
+    tasks = [
+        asyncio.create_task(stock.run_sweeper()),
+        asyncio.create_task(recommendations.run_maintenance()),
+        asyncio.create_task(search.run_maintenance()),
+        asyncio.create_task(outbox.run_sequencer()),
+        asyncio.create_task(outbox.run_pruner()),
+    ]
+    if replicas.engines:
+        tasks.append(asyncio.create_task(replicas.run_health_checks()))
+    yield
+    for task in tasks:
+        task.cancel()
+        with suppress(asyncio.CancelledError):
+            await task
+    credentials.shutdown()
+
+
+app=FastAPI(lifespan=lifespan)
+app.add_middleware(ReadYourWritesMiddleware)
+# Inside the metrics middleware, so request latency includes compression
+app.add_middleware(CompressionMiddleware)
+# Sheds load before any routing or database work, but inside metrics so 503s are counted
+app.add_middleware(AdmissionMiddleware)
+app.add_middleware(metrics.MetricsMiddleware)
 app.include_router(authors.router)
 app.include_router(books.router)
 app.include_router(users.router)
 app.include_router(reviews.router)
+app.include_router(reservations.router)
+app.include_router(changes.router)
 
 
+@app.exception_handler(StaleDataError)
+async def stale_data_handler(request: Request, exc: StaleDataError):
+    # Another request changed the row between our read and our write
+    return JSONResponse(
+        status_code=status.HTTP_409_CONFLICT,
+        content={"detail": "Resource was modified concurrently, fetch it again and retry"},
+    )
 
-Base.metadata.create_all(bind=engine)
+
+if AUTO_CREATE_TABLES:
+    Base.metadata.create_all(bind=engine)
 
 
 
 @app.get("/healthcheck")
-def health_check():
-    return {"Message":"BookStore Api is running..."}
\ No newline at end of file
+async def health_check():
+    return {"Message":"BookStore Api is running..."}
+
+
+@app.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+async def prometheus_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/cache/stats")
+async def cache_stats():
+    return {**cache.stats(), "coalescing": coalesce.stats()}
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Date
+from sqlalchemy import Column, Integer, String, Date, DateTime, Index, func
 from sqlalchemy.orm import relationship
 from app.database import Base
 
@@ -11,5 +11,17 @@ class Author(Base):
     birth_date = Column(Date)
     nationality = Column(String)
 
+    __table_args__ = (
+        Index("ix_authors_name_trgm", name, postgresql_using="gin",
+              postgresql_ops={"name": "gin_trgm_ops"}).ddl_if(dialect="postgresql"),
+    )
+
+    # Bumped on every write; drives ETags and optimistic concurrency
+    version = Column(Integer, nullable=False, server_default="1")
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+    __mapper_args__ = {"version_id_col": version, "eager_defaults": True}
+
     # Relationships
-    books = relationship("Book", back_populates="author",cascade="all, delete" )
+    # Books (and their reviews) are removed by ON DELETE CASCADE, never loaded just to be deleted
+    books = relationship("Book", back_populates="author", cascade="all, delete", passive_deletes=True)
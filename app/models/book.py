@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, Date, ForeignKey
+from sqlalchemy import Column, Integer, String, Float, Date, DateTime, ForeignKey, Index, func, literal_column
 from sqlalchemy.orm import relationship
 from app.database import Base
 
@@ -7,17 +7,56 @@ class Book(Base):
 
     id = Column(Integer, primary_key=True, index=True)
     title = Column(String, nullable=False)
-    author_id = Column(Integer, ForeignKey("authors.id", ondelete="CASCADE"), nullable=False)
+    author_id = Column(Integer, ForeignKey("authors.id", ondelete="CASCADE"), nullable=False, index=True)
     published_date = Column(Date)
     isbn = Column(String, unique=True)
     price = Column(Float)
     stock = Column(Integer)
     cover_image_url = Column(String)
 
+    # Bumped on every write; drives ETags and optimistic concurrency
+    version = Column(Integer, nullable=False, server_default="1")
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+    __mapper_args__ = {"version_id_col": version, "eager_defaults": True}
+
+    # Rating aggregates, maintained incrementally by app.core.ratings
+    rating_count = Column(Integer, nullable=False, default=0, server_default="0")
+    rating_sum = Column(Integer, nullable=False, default=0, server_default="0")
+    rating_average = Column(Float, nullable=False, default=0.0, server_default="0")
+    rating_1 = Column(Integer, nullable=False, default=0, server_default="0")
+    rating_2 = Column(Integer, nullable=False, default=0, server_default="0")
+    rating_3 = Column(Integer, nullable=False, default=0, server_default="0")
+    rating_4 = Column(Integer, nullable=False, default=0, server_default="0")
+    rating_5 = Column(Integer, nullable=False, default=0, server_default="0")
+
+    # ix_books_top_rated backs /books/top-rated and the price/published/author/in-stock
+    # ones the catalog filters and sorts (app.core.catalog); the search indexes are
+    # Postgres only (SQLite uses the in-process index in app.core.search)
+    __table_args__ = (
+        Index("ix_books_top_rated", rating_average.desc(), rating_count.desc(), id),
+        Index("ix_books_price", price, id),
+        Index("ix_books_published", published_date, id),
+        Index("ix_books_author_price", author_id, price, id),
+        Index("ix_books_in_stock_price", price, id, postgresql_where=stock > 0, sqlite_where=stock > 0),
+        Index("ix_books_title_tsv", func.to_tsvector(literal_column("'simple'"), title),
+              postgresql_using="gin").ddl_if(dialect="postgresql"),
+        Index("ix_books_title_trgm", title, postgresql_using="gin",
+              postgresql_ops={"title": "gin_trgm_ops"}).ddl_if(dialect="postgresql"),
+        Index("ix_books_isbn_prefix", isbn,
+              postgresql_ops={"isbn": "text_pattern_ops"}).ddl_if(dialect="postgresql"),
+    )
+
+    @property
+    def rating_histogram(self):
+        return {1: self.rating_1, 2: self.rating_2, 3: self.rating_3, 4: self.rating_4, 5: self.rating_5}
+
     # Relationships
     author = relationship("Author", back_populates="books")
+    # Reviews are removed by ON DELETE CASCADE, never loaded just to be deleted
     reviews = relationship(
         "Review",
         back_populates="book",
-        cascade="all, delete"   
+        cascade="all, delete",
+        passive_deletes=True
     )
@@ -0,0 +1,26 @@
+from sqlalchemy import BigInteger, Column, Integer, String, DateTime, Index, func
+from app.database import Base
+
+class ChangeEvent(Base):
+    """Transactional outbox: one row per created, updated or deleted resource.
+
+    Rows are written in the same transaction as the change itself, so the
+    feed never shows a change that was rolled back or misses one that committed.
+    ``seq`` is NULL until the sequencer in app.core.outbox numbers the row
+    after its transaction has committed, so sequence order is commit order.
+    """
+    __tablename__ = "change_events"
+
+    # SQLite only autoincrements INTEGER PRIMARY KEY
+    id = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True, autoincrement=True)
+    seq = Column(BigInteger, unique=True)
+    resource = Column(String(20), nullable=False)      # author | book | user | review
+    resource_id = Column(Integer, nullable=False)
+    action = Column(String(10), nullable=False)        # created | updated | deleted
+    # Indexed for retention pruning
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False, index=True)
+
+    __table_args__ = (
+        # Rows still waiting for a sequence number, in insert order
+        Index("ix_change_events_pending", id, postgresql_where=seq.is_(None), sqlite_where=seq.is_(None)),
+    )
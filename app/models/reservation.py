@@ -0,0 +1,37 @@
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Index, func
+from sqlalchemy.orm import relationship
+from app.database import Base
+
+class StockReservation(Base):
+    __tablename__ = "stock_reservations"
+
+    id = Column(Integer, primary_key=True, index=True)
+    # held -> committed | released | expired; every transition is a guarded UPDATE
+    status = Column(String, nullable=False, default="held", server_default="held")
+    expires_at = Column(DateTime(timezone=True), nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    # The sweeper scans held reservations in expiry order
+    __table_args__ = (
+        Index("ix_stock_reservations_status_expires", status, expires_at),
+    )
+
+    # Relationships
+    items = relationship(
+        "ReservationItem",
+        back_populates="reservation",
+        cascade="all, delete",
+        passive_deletes=True,
+        lazy="selectin"
+    )
+
+
+class ReservationItem(Base):
+    __tablename__ = "reservation_items"
+
+    reservation_id = Column(Integer, ForeignKey("stock_reservations.id", ondelete="CASCADE"), primary_key=True)
+    book_id = Column(Integer, ForeignKey("books.id", ondelete="CASCADE"), primary_key=True, index=True)
+    quantity = Column(Integer, nullable=False)
+
+    # Relationships
+    reservation = relationship("StockReservation", back_populates="items")
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String
+from sqlalchemy import Column, Integer, String, DateTime, func
 from sqlalchemy.orm import relationship
 from app.database import Base
 
@@ -11,9 +11,17 @@ class User(Base):
     password_hash = Column(String, nullable=False)
     role = Column(String, nullable=False)
 
+    # Bumped on every write; drives ETags and optimistic concurrency
+    version = Column(Integer, nullable=False, server_default="1")
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+    __mapper_args__ = {"version_id_col": version, "eager_defaults": True}
+
     # Relationship with Review
+    # Reviews are removed by ON DELETE CASCADE, never loaded just to be deleted
     reviews = relationship(
         "Review",
         back_populates="user",
-        cascade="all, delete"     
+        cascade="all, delete",
+        passive_deletes=True
     )
@@ -1,54 +1,108 @@
-from fastapi import APIRouter,HTTPException,status,Depends
-from app.schemas.author import AuthorCreate,AuthorResponse,AuthorUpdate
+from fastapi import APIRouter,HTTPException,status,Depends,Request,Response
+from app.schemas.author import AuthorCreate,AuthorResponse,AuthorUpdate,AuthorDeleteResult
 from app.models.author import Author
-from sqlalchemy.orm import Session
-from typing import List
-from app.database import get_db
+from app.models.book import Book
+from app.models.review import Review
+from sqlalchemy import delete, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional, Union
+from app.database import AsyncSessionLocal, get_async_db
+from app.schemas.page import Page, Batch
+from app.schemas.bulk import BulkResult
+from app.core.pagination import PageParams, paginate
+from app.core.batch import batch_ids, fetch_by_ids
+from app.core.cache import cache, author_key, author_books_tag
+from app.core import conditional
+from app.core.bulk import iter_records, import_authors
+from app.core.search import memory_backend
+from app.core import outbox, recommendations
 router=APIRouter(
     prefix="/authors",
     tags=["Author"]
 )
 
 @router.post("/",response_model=AuthorResponse,status_code=status.HTTP_201_CREATED)
-def create_author(author:AuthorCreate,db: Session= Depends(get_db)):
+async def create_author(author:AuthorCreate,db: AsyncSession= Depends(get_async_db)):
     new_author=Author(**author.model_dump())
     db.add(new_author)
-    db.commit()
-    db.refresh(new_author)
+    await db.commit()
     return new_author
 
-@router.get("/",response_model=List[AuthorResponse],status_code=status.HTTP_200_OK)
-def get_all(db: Session=Depends(get_db)):
-    authors=db.query(Author).all()
-    if not authors:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="no authors registered")
-    return authors
+@router.post("/bulk",response_model=BulkResult,status_code=status.HTTP_200_OK)
+async def bulk_import_authors(request:Request,db:AsyncSession=Depends(get_async_db)):
+    # Body is a JSON array, NDJSON or CSV (by Content-Type) of AuthorCreate rows
+    return await import_authors(db,iter_records(request))
+
+@router.get("/",response_model=Union[Page[AuthorResponse],Batch[AuthorResponse]],status_code=status.HTTP_200_OK)
+async def get_all(page: PageParams=Depends(),ids: Optional[List[int]]=Depends(batch_ids),db: AsyncSession=Depends(get_async_db)):
+    if ids is not None:
+        return await fetch_by_ids(db,page.request,Author,AuthorResponse,ids)
+    return await paginate(db,select(Author),Author,AuthorResponse,page,empty_detail="no authors registered")
 
 @router.get("/{id}",response_model=AuthorResponse,status_code=status.HTTP_200_OK)
-def get_by_id(id:int,db:Session=Depends(get_db)):
-    author=db.query(Author).filter(Author.id==id).one_or_none()
-    if not author:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,detail="no author found with given id")
-    return author
+async def get_by_id(id:int,request:Request,db:AsyncSession=Depends(get_async_db)):
+    cached=await cache.get_response(author_key(id))
+    if cached is None:
+        if conditional.has_preconditions(request):
+            # Cheap version probe so a revalidation never loads or serializes the author
+            probe=(await db.execute(select(Author.version,Author.updated_at).where(Author.id==id))).one_or_none()
+            if probe:
+                headers=conditional.validators(conditional.etag_for("author",id,probe.version),probe.updated_at)
+                if conditional.is_not_modified(request,headers):
+                    return conditional.not_modified(headers)
+        # Filled from the primary: a replica could hand back the row as it was before
+        # the write that just invalidated this entry, and that would be cached for CACHE_TTL
+        async with AsyncSessionLocal() as primary:
+            author=await primary.get(Author,id)
+        if not author:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,detail="no author found with given id")
+        body=AuthorResponse.model_validate(author).model_dump_json().encode()
+        headers=conditional.validators(conditional.etag_for("author",id,author.version),author.updated_at)
+        cached=await cache.set_response(author_key(id),body,headers)
+    if conditional.is_not_modified(request,cached.headers):
+        return conditional.not_modified(cached.headers)
+    return cached.response(request)
 
-from fastapi import Response
+async def invalidate_author(id: int):
+    # Cached book details embed the author, so they go too
+    await cache.delete(author_key(id))
+    await cache.invalidate_tags(author_books_tag(id))
 
-@router.delete("/{id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_by_id(id: int, db: Session = Depends(get_db)):
-    author = db.query(Author).filter(Author.id == id).one_or_none()
-    if not author:
+@router.delete("/{id}", response_model=AuthorDeleteResult, status_code=status.HTTP_200_OK)
+async def delete_by_id(id: int, db: AsyncSession = Depends(get_async_db)):
+    # One set-based DELETE per table, so no book or review is ever loaded. ON DELETE
+    # CASCADE would remove the children too; deleting them explicitly gives the counts.
+    books = select(Book.id).where(Book.author_id == id)
+    deleted_reviews = (await db.execute(
+        delete(Review).where(Review.book_id.in_(books)).returning(Review.id).execution_options(synchronize_session=False)
+    )).scalars().all()
+    deleted_books = (await db.execute(
+        delete(Book).where(Book.author_id == id).returning(Book.id).execution_options(synchronize_session=False)
+    )).scalars().all()
+    deleted = await db.execute(delete(Author).where(Author.id == id).execution_options(synchronize_session=False))
+    if not deleted.rowcount:
+        await db.rollback()
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="No author found with the given id"
         )
-    db.delete(author)
-    db.commit()
-    return Response(status_code=status.HTTP_204_NO_CONTENT)
+    await outbox.emit(db, "review", "deleted", deleted_reviews)
+    await outbox.emit(db, "book", "deleted", deleted_books)
+    await outbox.emit(db, "author", "deleted", [id])
+    await db.commit()
+    # Core deletes bypass the session events that keep the search index current
+    memory_backend.apply([], [], set(), {id})
+    recommendations.index.forget_books(deleted_books)
+    await invalidate_author(id)
+    return {"id": id, "deleted_books": len(deleted_books), "deleted_reviews": len(deleted_reviews)}
+
+
 @router.put("/{id}", response_model=AuthorResponse, status_code=status.HTTP_202_ACCEPTED)
-def update_by_id(id: int, updated: AuthorCreate, db: Session = Depends(get_db)):
-    dbAuthor = db.query(Author).filter(Author.id == id).one_or_none()
+async def update_by_id(id: int, updated: AuthorCreate, request: Request, response: Response, db: AsyncSession = Depends(get_async_db)):
+    dbAuthor = await db.get(Author, id)
     if not dbAuthor:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="No author found with given id")
+    conditional.check_if_match(request, conditional.etag_for("author", id, dbAuthor.version))
 
     # Full update
     dbAuthor.name = updated.name
@@ -56,22 +110,25 @@ def update_by_id(id: int, updated: AuthorCreate, db: Session = Depends(get_db)):
     dbAuthor.birth_date = updated.birth_date
     dbAuthor.nationality = updated.nationality
 
-    db.commit()
-    db.refresh(dbAuthor)
+    await db.commit()
+    await invalidate_author(id)
+    response.headers.update(conditional.validators(conditional.etag_for("author", id, dbAuthor.version), dbAuthor.updated_at))
     return dbAuthor
 
 
 @router.patch("/{id}", response_model=AuthorResponse, status_code=status.HTTP_202_ACCEPTED)
-def partial_update_by_id(id: int, updated: AuthorUpdate, db: Session = Depends(get_db)):
-    dbAuthor = db.query(Author).filter(Author.id == id).one_or_none()
+async def partial_update_by_id(id: int, updated: AuthorUpdate, request: Request, response: Response, db: AsyncSession = Depends(get_async_db)):
+    dbAuthor = await db.get(Author, id)
     if not dbAuthor:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="No author found with given id")
+    conditional.check_if_match(request, conditional.etag_for("author", id, dbAuthor.version))
 
     # Partial update: only update provided fields
     update_data = updated.model_dump(exclude_unset=True)
     for key, value in update_data.items():
         setattr(dbAuthor, key, value)
 
-    db.commit()
-    db.refresh(dbAuthor)
+    await db.commit()
+    await invalidate_author(id)
+    response.headers.update(conditional.validators(conditional.etag_for("author", id, dbAuthor.version), dbAuthor.updated_at))
     return dbAuthor
@@ -1,59 +1,202 @@
-from fastapi import APIRouter,HTTPException,Depends,status, Query
-from sqlalchemy.orm import Session
+import asyncio
+from fastapi import APIRouter,HTTPException,Depends,status, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy import delete, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload
 from app.models.book import Book
 from app.models.author import Author
-from app.schemas.book import BookCreate,BookResponse,BookDetailResponse
-from app.database import get_db
+from app.models.review import Review
+from app.schemas.book import BookCreate,BookResponse,BookDetailResponse,BookSearchResponse,SimilarBook,BookFacets
+from app.schemas.author import AuthorResponse
+from app.schemas.page import Page, Batch
+from app.schemas.bulk import BulkResult
+from app.database import get_async_db
+from app.core.pagination import PageParams, SortKey, paginate
+from app.core.batch import batch_ids, fetch_by_ids
+from app.core import catalog
+from app.core.catalog import BookFilters, book_sort
+from app.core.export import iter_catalog_rows, ndjson_lines, csv_lines
+from app.core.search import get_search_backend
+from app.core.config import SEARCH_DEFAULT_LIMIT, SEARCH_MAX_LIMIT
+from app.core.cache import cache, book_key, author_books_tag, CachedResponse
+from app.core.coalesce import read_once
+from app.core import conditional, integrity
+from app.core.bulk import iter_records, import_books
+from app.core import outbox, stock, recommendations
+from app.core.serialization import RowShape, json_response
+from app.schemas.reservation import StockReserve, ReservationResponse
 from typing import List
-from typing import Optional
+from typing import Optional, Union
 router=APIRouter(
     prefix="/books",
     tags=["Book"]
 )
 
-@router.post("/", response_model=BookResponse, status_code=status.HTTP_201_CREATED)
-def add_book(book: BookCreate, db: Session = Depends(get_db)):
-    db_author = db.query(Author).filter(Author.id == book.author_id).one_or_none()
-    if not db_author:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Author does not exist with the given id"
+def detail_select():
+    # BookDetailResponse nests the author, so load it in the same SELECT
+    return select(Book).options(joinedload(Book.author))
+
+async def commit_book(db: AsyncSession, author_id: int, missing_author: str):
+    # The author foreign key and the unique ISBN do the checking
+    try:
+        await db.commit()
+    except IntegrityError as exc:
+        await db.rollback()
+        raise await integrity.http_error(
+            db, exc,
+            unique={"isbn": "A book with this ISBN already exists"},
+            references={"author_id": (Author, author_id, missing_author)},
         )
 
+@router.post("/", response_model=BookResponse, status_code=status.HTTP_201_CREATED)
+async def add_book(book: BookCreate, db: AsyncSession = Depends(get_async_db)):
     new_book = Book(**book.model_dump())
     db.add(new_book)
-    db.commit()
-    db.refresh(new_book)
+    await commit_book(db, book.author_id, "Author does not exist with the given id")
     return new_book
 
-@router.get("/",response_model=List[BookResponse],status_code=status.HTTP_200_OK)
-def get_all(db:Session=Depends(get_db)):
-    books=db.query(Book).all()
-    return books
+@router.post("/bulk", response_model=BulkResult, status_code=status.HTTP_200_OK)
+async def bulk_import_books(
+    request: Request,
+    upsert: bool = Query(False, description="Update books whose ISBN already exists"),
+    db: AsyncSession = Depends(get_async_db)
+):
+    # Body is a JSON array, NDJSON or CSV (by Content-Type) of BookCreate rows
+    return await import_books(db, iter_records(request), upsert=upsert)
+
+@router.get("/",response_model=Union[Page[BookResponse],Batch[BookDetailResponse]],status_code=status.HTTP_200_OK)
+async def get_all(page:PageParams=Depends(),ids:Optional[List[int]]=Depends(batch_ids),filters:BookFilters=Depends(),
+                  sort:Optional[SortKey]=Depends(book_sort),db:AsyncSession=Depends(get_async_db)):
+    if ids is not None:
+        # Carts and wishlists: one query with the authors joined in, in request order
+        return await fetch_by_ids(db,page.request,Book,BookDetailResponse,ids,nested={"author":(Book.author,AuthorResponse)})
+    return await paginate(db,select(Book).where(*filters.conditions()),Book,BookResponse,page,sort=sort)
 
-@router.get("/{id}",response_model=BookDetailResponse,status_code=status.HTTP_200_OK)
-def get_by_id(id:int,db:Session=Depends(get_db)):
-    dbBook=db.query(Book).filter(Book.id==id).one_or_none()
+@router.get("/export",status_code=status.HTTP_200_OK)
+async def export_books(format: str = Query("ndjson", pattern="^(ndjson|csv)$", description="ndjson or csv")):
+    if format == "csv":
+        return StreamingResponse(csv_lines(iter_catalog_rows()), media_type="text/csv",
+                                 headers={"Content-Disposition": "attachment; filename=books.csv"})
+    return StreamingResponse(ndjson_lines(iter_catalog_rows()), media_type="application/x-ndjson")
+
+@router.get("/search", response_model=BookSearchResponse, status_code=status.HTTP_200_OK)
+async def search_books(
+    title: Optional[str] = Query(None, description="Search by book title"),
+    isbn: Optional[str] = Query(None, description="Search by ISBN (exact or prefix)"),
+    author_name: Optional[str] = Query(None, description="Search by author name"),
+    limit: int = Query(SEARCH_DEFAULT_LIMIT, ge=1, le=SEARCH_MAX_LIMIT),
+    offset: int = Query(0, ge=0),
+    db: AsyncSession = Depends(get_async_db)
+):
+    total, hits = await get_search_backend(db).search(
+        db, title=title, isbn=isbn, author_name=author_name, limit=limit, offset=offset
+    )
+
+    if not total:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="No books found matching the criteria"
+        )
+
+    # Load the page in one query, then restore the ranked order
+    result = await db.execute(detail_select().where(Book.id.in_([book_id for book_id, _ in hits])))
+    books = {b.id: b for b in result.scalars()}
+    items = [
+        {**BookDetailResponse.model_validate(books[book_id]).model_dump(), "score": score}
+        for book_id, score in hits if book_id in books
+    ]
+    return {"items": items, "total": total, "limit": limit, "offset": offset}
+
+@router.get("/top-rated", response_model=List[BookResponse], status_code=status.HTTP_200_OK)
+async def top_rated(
+    request: Request,
+    response: Response,
+    limit: int = Query(20, ge=1, le=100),
+    min_count: int = Query(1, ge=1, description="Minimum number of ratings"),
+    db: AsyncSession = Depends(get_async_db)
+):
+    # Walks ix_books_top_rated in order and stops after `limit` rows
+    shape = RowShape(Book, BookResponse)
+    rows = (await db.execute(
+        select(*shape.columns, Book.version, Book.updated_at)
+        .where(Book.rating_count >= min_count)
+        .order_by(Book.rating_average.desc(), Book.rating_count.desc(), Book.id)
+        .limit(limit)
+    )).all()
+    headers = conditional.list_validators("books-top-rated", rows, extra=f"{limit}|{min_count}")
+    if conditional.is_not_modified(request, headers):
+        return conditional.not_modified(headers)
+    return json_response([shape.item(row) for row in rows], List[BookResponse], headers=headers)
+
+@router.get("/facets", response_model=BookFacets, status_code=status.HTTP_200_OK)
+async def book_facets(filters: BookFilters = Depends(), db: AsyncSession = Depends(get_async_db)):
+    """Counts per price bucket, year and author for the books matching ``filters``."""
+    return json_response(await catalog.facets(db, filters), BookFacets)
+
+async def fill_book_cache(db:AsyncSession,id:int)->CachedResponse:
+    dbBook=(await db.execute(detail_select().where(Book.id==id))).scalar_one_or_none()
     if not dbBook:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
                             detail="Book not found with given id")
-    return dbBook
+    body=BookDetailResponse.model_validate(dbBook).model_dump_json().encode()
+    headers=conditional.validators(conditional.etag_for("book",id,dbBook.version),dbBook.updated_at)
+    return await cache.set_response(book_key(id),body,headers,tags=[author_books_tag(dbBook.author_id)])
+
+@router.get("/{id}",response_model=BookDetailResponse,status_code=status.HTTP_200_OK)
+async def get_by_id(id:int,request:Request,db:AsyncSession=Depends(get_async_db)):
+    cached=await cache.get_response(book_key(id))
+    if cached is None:
+        if conditional.has_preconditions(request):
+            # Cheap version probe so a revalidation never loads or serializes the book
+            probe=(await db.execute(select(Book.version,Book.updated_at).where(Book.id==id))).one_or_none()
+            if probe:
+                headers=conditional.validators(conditional.etag_for("book",id,probe.version),probe.updated_at)
+                if conditional.is_not_modified(request,headers):
+                    return conditional.not_modified(headers)
+        # A stampede of misses for the same book runs one query (on the primary) and one serialization
+        cached=await read_once(request,db,fill_book_cache,id,primary=True)
+    if conditional.is_not_modified(request,cached.headers):
+        return conditional.not_modified(cached.headers)
+    return cached.response(request)
+
+
+@router.get("/{id}/similar", response_model=List[SimilarBook], status_code=status.HTTP_200_OK)
+async def similar_books(id: int, limit: int = Query(10, ge=1, le=100), db: AsyncSession = Depends(get_async_db)):
+    """Readers who rated this book also rated these, most similar first."""
+    index = recommendations.index
+    if not index.built:
+        # Built off the event loop; it reads every review once
+        await asyncio.to_thread(index.ensure_built)
+    hits = index.similar(id, limit)
+    if not hits:
+        if not (await db.execute(select(Book.id).where(Book.id == id))).first():
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Book not found with given id")
+        return json_response([], List[SimilarBook])
+
+    # The index only holds ids; hydrate them with one primary key lookup
+    shape = RowShape(Book, BookResponse)
+    rows = (await db.execute(select(*shape.columns).where(Book.id.in_([book_id for book_id, _ in hits])))).all()
+    by_id = {row.id: row for row in rows}
+    items = [{**shape.item(by_id[book_id]), "score": score} for book_id, score in hits if book_id in by_id]
+    return json_response(items, List[SimilarBook])
+
+@router.post("/{id}/stock/reserve", response_model=ReservationResponse, status_code=status.HTTP_201_CREATED)
+async def reserve_stock(id: int, body: StockReserve, db: AsyncSession = Depends(get_async_db)):
+    # Commit or release via /reservations/{id}; unclaimed holds expire after the TTL
+    return await stock.reserve(db, {id: body.quantity}, body.ttl_seconds)
+
 @router.put("/{id}", response_model=BookDetailResponse, status_code=status.HTTP_200_OK)
-def update_book(id: int, updated: BookCreate, db: Session = Depends(get_db)):
-    dbBook = db.query(Book).filter(Book.id == id).one_or_none()
+async def update_book(id: int, updated: BookCreate, request: Request, response: Response, db: AsyncSession = Depends(get_async_db)):
+    dbBook = (await db.execute(detail_select().where(Book.id == id))).scalar_one_or_none()
     if not dbBook:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Book not found with given id"
         )
-    
-    # Check author exists
-    dbAuthor = db.query(Author).filter(Author.id == updated.author_id).one_or_none()
-    if not dbAuthor:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Author not found with given id"
-        )
+    conditional.check_if_match(request, conditional.etag_for("book", id, dbBook.version))
+    author_changed = dbBook.author_id != updated.author_id
 
     # Update all fields
     dbBook.title = updated.title
@@ -64,56 +207,52 @@ def update_book(id: int, updated: BookCreate, db: Session = Depends(get_db)):
     dbBook.published_date = updated.published_date
     dbBook.stock = updated.stock
 
-    db.commit()
-    db.refresh(dbBook)
+    await commit_book(db, updated.author_id, "Author not found with given id")
+    await cache.delete(book_key(id))
+    if author_changed:
+        # The nested author was loaded up front; only a new one needs fetching
+        await db.refresh(dbBook, ["author"])
+    response.headers.update(conditional.validators(conditional.etag_for("book", id, dbBook.version), dbBook.updated_at))
     return dbBook
 
 
 @router.delete("/{id}",response_model=BookResponse,status_code=status.HTTP_200_OK)
-def delete_by_id(id:int,db:Session=Depends(get_db)):
-    dbBook=db.query(Book).filter(Book.id==id).one_or_none()
+async def delete_by_id(id:int,db:AsyncSession=Depends(get_async_db)):
+    dbBook=await db.get(Book, id)
     if not dbBook:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Book not found with given id"
         )
-    db.delete(dbBook)
-    db.commit()
+    # ON DELETE CASCADE would remove the reviews unseen; deleting them here records each one
+    reviews = (await db.execute(
+        delete(Review).where(Review.book_id == id).returning(Review.id).execution_options(synchronize_session=False)
+    )).scalars().all()
+    await outbox.emit(db, "review", "deleted", reviews)
+    await db.delete(dbBook)
+    await db.commit()
+    await cache.delete(book_key(id))
+    recommendations.index.forget_books([id])
     return dbBook
 
 @router.get("/author/{id}", response_model=List[BookDetailResponse], status_code=status.HTTP_200_OK)
-def get_by_author(id: int, db: Session = Depends(get_db)):
-    author = db.query(Author).filter(Author.id == id).one_or_none()
+async def get_by_author(id: int, request: Request, db: AsyncSession = Depends(get_async_db)):
+    author = await db.get(Author, id)
     if not author:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Author not found with given id"
         )
 
-    dbBooks = db.query(Book).filter(Book.author_id == id).all()
-    return dbBooks  
-@router.get("/search", response_model=List[BookDetailResponse], status_code=status.HTTP_200_OK)
-def search_books(
-    title: Optional[str] = Query(None, description="Search by book title"),
-    isbn: Optional[str] = Query(None, description="Search by ISBN"),
-    author_name: Optional[str] = Query(None, description="Search by author name"),
-    db: Session = Depends(get_db)
-):
-    query = db.query(Book).join(Author)
-
-    if title:
-        query = query.filter(Book.title.ilike(f"%{title}%"))
-    if isbn:
-        query = query.filter(Book.isbn.ilike(f"%{isbn}%"))
-    if author_name:
-        query = query.filter(Author.name.ilike(f"%{author_name}%"))
-
-    results = query.all()
-
-    if not results:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="No books found matching the criteria"
-        )
-
-    return results
\ No newline at end of file
+    shape = RowShape(Book, BookResponse)
+    rows = (await db.execute(
+        select(*shape.columns, Book.version, Book.updated_at).where(Book.author_id == id)
+    )).all()
+    # The payload nests the author, so its version is part of the validator
+    headers = conditional.list_validators("books-by-author", rows, extra=f"{id}|{author.version}")
+    if conditional.is_not_modified(request, headers):
+        return conditional.not_modified(headers)
+    # Every book shares the same author, so it is serialized once rather than per row
+    nested = AuthorResponse.model_validate(author).model_dump()
+    items = [{**shape.item(row), "author": nested} for row in rows]
+    return json_response(items, List[BookDetailResponse], headers=headers)
@@ -0,0 +1,64 @@
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
+from app.database import get_async_db
+from app.core import outbox
+from app.core.config import CHANGES_PAGE_SIZE, CHANGES_MAX_PAGE_SIZE
+from app.core.serialization import json_response
+from app.models.change import ChangeEvent
+from app.schemas.change import ChangeFeed
+
+router = APIRouter(
+    prefix="/changes",
+    tags=["Changes"]
+)
+
+
+def resource_filter(
+    resources: Optional[str] = Query(None, description="Comma separated subset of author,book,user,review"),
+) -> Optional[List[str]]:
+    if resources is None:
+        return None
+    wanted = [r.strip() for r in resources.split(",") if r.strip()]
+    unknown = [r for r in wanted if r not in outbox.RESOURCES.values()]
+    if unknown:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                            detail=f"Unknown resource(s): {', '.join(unknown)}")
+    return wanted
+
+
+@router.get("/", response_model=ChangeFeed, status_code=status.HTTP_200_OK)
+async def get_changes(
+    since: int = Query(0, ge=0, description="Return events after this seq (next_since of the previous page)"),
+    limit: int = Query(CHANGES_PAGE_SIZE, ge=1, le=CHANGES_MAX_PAGE_SIZE),
+    resources: Optional[List[str]] = Depends(resource_filter),
+    db: AsyncSession = Depends(get_async_db)
+):
+    items = await outbox.fetch(db, since, limit + 1, resources)
+    has_more = len(items) > limit
+    items = items[:limit]
+    next_since = items[-1]["seq"] if items else since
+    return json_response({"items": items, "next_since": next_since, "has_more": has_more}, ChangeFeed)
+
+
+@router.get("/stream", status_code=status.HTTP_200_OK)
+async def stream_changes(
+    request: Request,
+    since: Optional[int] = Query(None, ge=0, description="Replay events after this seq; default is only new events"),
+    resources: Optional[List[str]] = Depends(resource_filter),
+    last_event_id: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_async_db)
+):
+    # A reconnecting EventSource sends the last id it saw, which wins over the original ?since=
+    if last_event_id and last_event_id.isdigit():
+        since = int(last_event_id)
+    elif since is None:
+        since = (await db.execute(select(func.coalesce(func.max(ChangeEvent.seq), 0)))).scalar_one()
+    return StreamingResponse(
+        outbox.stream(request, since, CHANGES_PAGE_SIZE, resources),
+        media_type="text/event-stream",
+        # Proxies must pass events through as they arrive
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -0,0 +1,39 @@
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy.ext.asyncio import AsyncSession
+from collections import Counter
+from app.database import get_async_db
+from app.core import stock
+from app.models.reservation import StockReservation
+from app.schemas.reservation import ReservationCreate, ReservationResponse
+
+router = APIRouter(
+    prefix="/reservations",
+    tags=["Reservations"]
+)
+
+
+@router.post("/", response_model=ReservationResponse, status_code=status.HTTP_201_CREATED)
+async def create_reservation(reservation: ReservationCreate, db: AsyncSession = Depends(get_async_db)):
+    # All books are held in one transaction, or none are
+    quantities = Counter()
+    for item in reservation.items:
+        quantities[item.book_id] += item.quantity
+    return await stock.reserve(db, dict(quantities), reservation.ttl_seconds)
+
+
+@router.get("/{id}", response_model=ReservationResponse, status_code=status.HTTP_200_OK)
+async def get_reservation(id: int, db: AsyncSession = Depends(get_async_db)):
+    reservation = await db.get(StockReservation, id)
+    if not reservation:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Reservation not found with given id")
+    return reservation
+
+
+@router.post("/{id}/commit", status_code=status.HTTP_204_NO_CONTENT)
+async def commit_reservation(id: int, db: AsyncSession = Depends(get_async_db)):
+    await stock.commit(db, id)
+
+
+@router.post("/{id}/release", status_code=status.HTTP_204_NO_CONTENT)
+async def release_reservation(id: int, db: AsyncSession = Depends(get_async_db)):
+    await stock.release(db, id)
@@ -1,11 +1,21 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from app.database import get_db
+from fastapi import APIRouter, Depends, HTTPException, status, Request
+from sqlalchemy import delete, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.database import get_async_db
+from app.core.pagination import PageParams, paginate
+from app.core.batch import batch_ids, fetch_by_ids
+from app.core import outbox, ratings, recommendations
+from app.core.cache import cache, book_key
+from app.core import conditional, integrity
+from app.core.coalesce import read_once
+from app.core.serialization import RowShape, dump, json_response
 from app.models.review import Review
 from app.models.user import User
 from app.models.book import Book
 from app.schemas.review import ReviewCreate, ReviewResponse,ReviewUpdate
-from typing import List
+from app.schemas.page import Page, Batch
+from typing import List, Optional, Union
 from fastapi import Response
 router = APIRouter(
     prefix="/reviews",
@@ -13,154 +23,175 @@ router = APIRouter(
 )
 
 
+def review_references(user_id, book_id):
+    return {
+        "user_id": (User, user_id, "User not found with the given ID"),
+        "book_id": (Book, book_id, "Book not found with the given ID"),
+    }
+
+def record_review_change(old_book_id, old_user_id, review: Review):
+    # A review moved to another book or user no longer rates the old pair
+    if (old_book_id, old_user_id) != (review.book_id, review.user_id):
+        recommendations.index.record(old_book_id, old_user_id, None)
+    recommendations.index.record(review.book_id, review.user_id, review.rating)
+
+REVIEW_UNIQUE = {"book_id,user_id": "You have already reviewed this book"}
+
+async def flush_review(db: AsyncSession, review: Review):
+    # The foreign keys and uq_reviews_book_user do the checking; the INSERT/UPDATE
+    # returns server-generated columns, so nothing is re-read after commit
+    references = review_references(review.user_id, review.book_id)
+    try:
+        await db.flush()
+    except IntegrityError as exc:
+        await db.rollback()
+        raise await integrity.http_error(db, exc, unique=REVIEW_UNIQUE, references=references)
+
+
 @router.post("/", response_model=ReviewResponse, status_code=status.HTTP_201_CREATED)
-def create_review(review: ReviewCreate, db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.id == review.user_id).one_or_none()
-    if not user:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="User not found with the given ID"
-        )
-    book = db.query(Book).filter(Book.id == review.book_id).one_or_none()
-    if not book:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Book not found with the given ID"
-        )
-    existing_review = (
-        db.query(Review)
-        .filter(Review.book_id == review.book_id, Review.user_id == review.user_id)
-        .first()
-    )
-    if existing_review:
-        raise HTTPException(
-            status_code=status.HTTP_409_CONFLICT,
-            detail="You have already reviewed this book"
-        )
+async def create_review(review: ReviewCreate, db: AsyncSession = Depends(get_async_db)):
     new_review = Review(**review.model_dump())
     db.add(new_review)
-    db.commit()
-    db.refresh(new_review)
+    await flush_review(db, new_review)
+    await ratings.add_rating(db, new_review.book_id, new_review.rating)
+    await db.commit()
+    # Cached book details carry the rating aggregates
+    await cache.delete(book_key(new_review.book_id))
+    recommendations.index.record(new_review.book_id, new_review.user_id, new_review.rating)
     return new_review
 
-@router.get("/", response_model=List[ReviewResponse], status_code=status.HTTP_200_OK)
-def get_all_reviews(db: Session = Depends(get_db)):
-    reviews = db.query(Review).all()
-    return reviews
+@router.get("/", response_model=Union[Page[ReviewResponse], Batch[ReviewResponse]], status_code=status.HTTP_200_OK)
+async def get_all_reviews(page: PageParams = Depends(), ids: Optional[List[int]] = Depends(batch_ids),
+                          db: AsyncSession = Depends(get_async_db)):
+    if ids is not None:
+        return await fetch_by_ids(db, page.request, Review, ReviewResponse, ids)
+    return await paginate(db, select(Review), Review, ReviewResponse, page)
 
 @router.get("/{id}", response_model=ReviewResponse, status_code=status.HTTP_200_OK)
-def get_review_by_id(id: int, db: Session = Depends(get_db)):
-    review = db.query(Review).filter(Review.id == id).one_or_none()
+async def get_review_by_id(id: int, request: Request, response: Response, db: AsyncSession = Depends(get_async_db)):
+    review = await db.get(Review, id)
     if not review:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Review not found with the given ID"
         )
+    headers = conditional.validators(conditional.etag_for("review", id, review.version), review.updated_at)
+    if conditional.is_not_modified(request, headers):
+        return conditional.not_modified(headers)
+    response.headers.update(headers)
     return review
 
-@router.get("/book/{book_id}", response_model=List[ReviewResponse], status_code=status.HTTP_200_OK)
-def get_reviews_by_book(book_id: int, db: Session = Depends(get_db)):
+async def load_reviews_by_book(db: AsyncSession, book_id: int):
+    """Serialized reviews of a book plus their validators."""
     # Check if book exists
-    book = db.query(Book).filter(Book.id == book_id).one_or_none()
+    book = await db.get(Book, book_id)
     if not book:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Book not found with the given ID"
         )
 
-    reviews = db.query(Review).filter(Review.book_id == book_id).all()
-    return reviews
+    shape = RowShape(Review, ReviewResponse)
+    rows = (await db.execute(
+        select(*shape.columns, Review.version, Review.updated_at).where(Review.book_id == book_id)
+    )).all()
+    headers = conditional.list_validators("reviews-by-book", rows, extra=str(book_id))
+    return dump([shape.item(row) for row in rows], List[ReviewResponse]), headers
+
+@router.get("/book/{book_id}", response_model=List[ReviewResponse], status_code=status.HTTP_200_OK)
+async def get_reviews_by_book(book_id: int, request: Request, db: AsyncSession = Depends(get_async_db)):
+    # Identical concurrent requests (a featured book) share one query and one serialization
+    body, headers = await read_once(request, db, load_reviews_by_book, book_id)
+    if conditional.is_not_modified(request, headers):
+        return conditional.not_modified(headers)
+    return Response(content=body, media_type="application/json", headers=headers)
 
 @router.get("/user/{user_id}", response_model=List[ReviewResponse], status_code=status.HTTP_200_OK)
-def get_reviews_by_user(user_id: int, db: Session = Depends(get_db)):
+async def get_reviews_by_user(user_id: int, request: Request, db: AsyncSession = Depends(get_async_db)):
     # Check if user exists
-    user = db.query(User).filter(User.id == user_id).one_or_none()
+    user = await db.get(User, user_id)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="User not found with the given ID"
         )
 
-    reviews = db.query(Review).filter(Review.user_id == user_id).all()
-    return reviews
+    shape = RowShape(Review, ReviewResponse)
+    rows = (await db.execute(
+        select(*shape.columns, Review.version, Review.updated_at).where(Review.user_id == user_id)
+    )).all()
+    headers = conditional.list_validators("reviews-by-user", rows, extra=str(user_id))
+    if conditional.is_not_modified(request, headers):
+        return conditional.not_modified(headers)
+    return json_response([shape.item(row) for row in rows], List[ReviewResponse], headers=headers)
+
+
 @router.put("/{id}", response_model=ReviewResponse, status_code=status.HTTP_200_OK)
-def update_review(id: int, updated: ReviewCreate, db: Session = Depends(get_db)):
-    db_review = db.query(Review).filter(Review.id == id).one_or_none()
+async def update_review(id: int, updated: ReviewCreate, request: Request, response: Response, db: AsyncSession = Depends(get_async_db)):
+    db_review = await db.get(Review, id)
     if not db_review:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Review not found with the given ID"
         )
+    conditional.check_if_match(request, conditional.etag_for("review", id, db_review.version))
 
-    # Ensure the user exists
-    user = db.query(User).filter(User.id == updated.user_id).one_or_none()
-    if not user:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="User not found with the given ID"
-        )
-
-    # Ensure the book exists
-    book = db.query(Book).filter(Book.id == updated.book_id).one_or_none()
-    if not book:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Book not found with the given ID"
-        )
+    old_book_id, old_user_id, old_rating = db_review.book_id, db_review.user_id, db_review.rating
 
     # Update all fields
     for key, value in updated.model_dump().items():
         setattr(db_review, key, value)
 
-    db.commit()
-    db.refresh(db_review)
+    await flush_review(db, db_review)
+    await ratings.move_rating(db, old_book_id, old_rating, db_review.book_id, db_review.rating)
+    await db.commit()
+    await cache.delete(book_key(old_book_id), book_key(db_review.book_id))
+    record_review_change(old_book_id, old_user_id, db_review)
+    response.headers.update(conditional.validators(conditional.etag_for("review", id, db_review.version), db_review.updated_at))
     return db_review
 
 
 @router.patch("/{id}", response_model=ReviewResponse, status_code=status.HTTP_200_OK)
-def partial_update_review(id: int, updated: ReviewUpdate, db: Session = Depends(get_db)):
-    db_review = db.query(Review).filter(Review.id == id).one_or_none()
+async def partial_update_review(id: int, updated: ReviewUpdate, request: Request, response: Response, db: AsyncSession = Depends(get_async_db)):
+    db_review = await db.get(Review, id)
     if not db_review:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Review not found with the given ID"
         )
+    conditional.check_if_match(request, conditional.etag_for("review", id, db_review.version))
 
     update_data = updated.model_dump(exclude_unset=True)
 
-    # Validate new user/book if provided
-    if "user_id" in update_data:
-        user = db.query(User).filter(User.id == update_data["user_id"]).one_or_none()
-        if not user:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="User not found with the given ID"
-            )
-
-    if "book_id" in update_data:
-        book = db.query(Book).filter(Book.id == update_data["book_id"]).one_or_none()
-        if not book:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="Book not found with the given ID"
-            )
+    old_book_id, old_user_id, old_rating = db_review.book_id, db_review.user_id, db_review.rating
 
     for key, value in update_data.items():
         setattr(db_review, key, value)
 
-    db.commit()
-    db.refresh(db_review)
+    await flush_review(db, db_review)
+    await ratings.move_rating(db, old_book_id, old_rating, db_review.book_id, db_review.rating)
+    await db.commit()
+    await cache.delete(book_key(old_book_id), book_key(db_review.book_id))
+    record_review_change(old_book_id, old_user_id, db_review)
+    response.headers.update(conditional.validators(conditional.etag_for("review", id, db_review.version), db_review.updated_at))
     return db_review
 
 @router.delete("/{id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_review(id: int, db: Session = Depends(get_db)):
-    db_review = db.query(Review).filter(Review.id == id).one_or_none()
+async def delete_review(id: int, db: AsyncSession = Depends(get_async_db)):
+    # DELETE ... RETURNING hands back what the aggregates need without a SELECT first
+    db_review = (await db.execute(
+        delete(Review).where(Review.id == id).returning(Review.book_id, Review.user_id, Review.rating)
+        .execution_options(synchronize_session=False)
+    )).one_or_none()
     if not db_review:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Review not found with the given ID"
         )
 
-    db.delete(db_review)
-    db.commit()
+    await ratings.remove_rating(db, db_review.book_id, db_review.rating)
+    await outbox.emit(db, "review", "deleted", [id])
+    await db.commit()
+    await cache.delete(book_key(db_review.book_id))
+    recommendations.index.record(db_review.book_id, db_review.user_id, None)
     return Response(status_code=status.HTTP_204_NO_CONTENT)
\ No newline at end of file
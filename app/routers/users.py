@@ -1,9 +1,19 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Response
-from sqlalchemy.orm import Session
-from typing import List
-from app.database import get_db
+from fastapi import APIRouter, Depends, HTTPException, status, Request, Response
+from sqlalchemy import delete, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional, Union
+from app.database import get_async_db
+from app.core.pagination import PageParams, paginate
+from app.core.batch import batch_ids, fetch_by_ids
 from app.models.user import User
-from app.schemas.user import UserCreate, UserResponse, UserUpdate
+from app.models.review import Review
+from app.core import outbox, ratings, recommendations
+from app.core.cache import cache, book_key
+from app.core import conditional, integrity
+from app.core.credentials import hash_password, verify_password, needs_rehash
+from app.schemas.user import UserCreate, UserResponse, UserUpdate, UserLogin, UserDeleteResult
+from app.schemas.page import Page, Batch
 
 router = APIRouter(
     prefix="/users",
@@ -11,94 +21,122 @@ router = APIRouter(
 )
 
 
-@router.post("/", response_model=UserResponse, status_code=status.HTTP_201_CREATED)
-def create_user(user: UserCreate, db: Session = Depends(get_db)):
-    existing_user = db.query(User).filter(User.username == user.username).first()
-    if existing_user:
-        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Username already exists")
+USER_IN_USE = {"username": "Username already in use", "email": "Email already in use"}
+
 
-    existing_email = db.query(User).filter(User.email == user.email).first()
-    if existing_email:
-        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Email already registered")
+async def commit_user(db: AsyncSession, unique):
+    # The unique indexes on username/email do the duplicate checks
+    try:
+        await db.commit()
+    except IntegrityError as exc:
+        await db.rollback()
+        raise await integrity.http_error(db, exc, unique=unique)
 
-    new_user = User(**user.model_dump())
+
+@router.post("/", response_model=UserResponse, status_code=status.HTTP_201_CREATED)
+async def create_user(user: UserCreate, db: AsyncSession = Depends(get_async_db)):
+    new_user = User(**user.model_dump(exclude={"password"}), password_hash=await hash_password(user.password))
     db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
+    await commit_user(db, {"username": "Username already exists", "email": "Email already registered"})
     return new_user
 
 
 
-@router.get("/", response_model=List[UserResponse], status_code=status.HTTP_200_OK)
-def get_all_users(db: Session = Depends(get_db)):
-    users = db.query(User).all()
-    return users
+@router.post("/login", response_model=UserResponse, status_code=status.HTTP_200_OK)
+async def login(credentials: UserLogin, db: AsyncSession = Depends(get_async_db)):
+    db_user = (await db.execute(select(User).where(User.username == credentials.username))).scalars().first()
+    if not db_user or not await verify_password(credentials.password, db_user.password_hash):
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid username or password")
+
+    # Upgrade hashes made with an older cost factor while we have the plaintext
+    if needs_rehash(db_user.password_hash):
+        db_user.password_hash = await hash_password(credentials.password)
+        await db.commit()
+    return db_user
+
+
+
+@router.get("/", response_model=Union[Page[UserResponse], Batch[UserResponse]], status_code=status.HTTP_200_OK)
+async def get_all_users(page: PageParams = Depends(), ids: Optional[List[int]] = Depends(batch_ids),
+                        db: AsyncSession = Depends(get_async_db)):
+    if ids is not None:
+        return await fetch_by_ids(db, page.request, User, UserResponse, ids)
+    return await paginate(db, select(User), User, UserResponse, page)
 
 
 
 @router.get("/{id}", response_model=UserResponse, status_code=status.HTTP_200_OK)
-def get_user_by_id(id: int, db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.id == id).one_or_none()
+async def get_user_by_id(id: int, request: Request, response: Response, db: AsyncSession = Depends(get_async_db)):
+    user = await db.get(User, id)
     if not user:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
+    headers = conditional.validators(conditional.etag_for("user", id, user.version), user.updated_at)
+    if conditional.is_not_modified(request, headers):
+        return conditional.not_modified(headers)
+    response.headers.update(headers)
     return user
 
 
 
 @router.put("/{id}", response_model=UserResponse, status_code=status.HTTP_200_OK)
-def update_user(id: int, updated: UserCreate, db: Session = Depends(get_db)):
-    db_user = db.query(User).filter(User.id == id).one_or_none()
+async def update_user(id: int, updated: UserCreate, request: Request, response: Response, db: AsyncSession = Depends(get_async_db)):
+    db_user = await db.get(User, id)
     if not db_user:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
+    conditional.check_if_match(request, conditional.etag_for("user", id, db_user.version))
 
-
-    if db.query(User).filter(User.username == updated.username, User.id != id).first():
-        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Username already in use")
-
-    if db.query(User).filter(User.email == updated.email, User.id != id).first():
-        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Email already in use")
-
-    for field, value in updated.model_dump().items():
+    for field, value in updated.model_dump(exclude={"password"}).items():
         setattr(db_user, field, value)
+    db_user.password_hash = await hash_password(updated.password)
 
-    db.commit()
-    db.refresh(db_user)
+    await commit_user(db, USER_IN_USE)
+    response.headers.update(conditional.validators(conditional.etag_for("user", id, db_user.version), db_user.updated_at))
     return db_user
 
 
 
 @router.patch("/{id}", response_model=UserResponse, status_code=status.HTTP_200_OK)
-def partial_update_user(id: int, updated: UserUpdate, db: Session = Depends(get_db)):
-    db_user = db.query(User).filter(User.id == id).one_or_none()
+async def partial_update_user(id: int, updated: UserUpdate, request: Request, response: Response, db: AsyncSession = Depends(get_async_db)):
+    db_user = await db.get(User, id)
     if not db_user:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
+    conditional.check_if_match(request, conditional.etag_for("user", id, db_user.version))
 
     update_data = updated.model_dump(exclude_unset=True)
 
-
-    if "username" in update_data:
-        if db.query(User).filter(User.username == update_data["username"], User.id != id).first():
-            raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Username already in use")
-
-    if "email" in update_data:
-        if db.query(User).filter(User.email == update_data["email"], User.id != id).first():
-            raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Email already in use")
+    if "password" in update_data:
+        db_user.password_hash = await hash_password(update_data.pop("password"))
 
     for key, value in update_data.items():
         setattr(db_user, key, value)
 
-    db.commit()
-    db.refresh(db_user)
+    await commit_user(db, USER_IN_USE)
+    response.headers.update(conditional.validators(conditional.etag_for("user", id, db_user.version), db_user.updated_at))
     return db_user
 
 
 
-@router.delete("/{id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_user(id: int, db: Session = Depends(get_db)):
-    db_user = db.query(User).filter(User.id == id).one_or_none()
-    if not db_user:
+@router.delete("/{id}", response_model=UserDeleteResult, status_code=status.HTTP_200_OK)
+async def delete_user(id: int, db: AsyncSession = Depends(get_async_db)):
+    # Set-based deletes; RETURNING hands back the rated books without loading any review
+    reviews = await db.execute(
+        delete(Review).where(Review.user_id == id).returning(Review.id, Review.book_id)
+        .execution_options(synchronize_session=False)
+    )
+    removed = reviews.all()
+    rated = [review.book_id for review in removed]
+    deleted = await db.execute(delete(User).where(User.id == id).execution_options(synchronize_session=False))
+    if not deleted.rowcount:
+        await db.rollback()
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
 
-    db.delete(db_user)
-    db.commit()
-    return Response(status_code=status.HTTP_204_NO_CONTENT)
+    # The user's reviews went with them, so refresh the aggregates of the books they rated
+    book_ids = set(rated)
+    await ratings.recompute(db, book_ids)
+    await outbox.emit(db, "review", "deleted", [review.id for review in removed])
+    await outbox.emit(db, "user", "deleted", [id])
+    await db.commit()
+    await cache.delete(*[book_key(book_id) for book_id in book_ids])
+    for book_id in book_ids:
+        recommendations.index.record(book_id, id, None)
+    return {"id": id, "deleted_reviews": len(rated)}
@@ -20,6 +20,12 @@ class AuthorResponse(AuthorBase):
     model_config = ConfigDict(from_attributes=True)
 
 
+class AuthorDeleteResult(BaseModel):
+    id: int
+    deleted_books: int
+    deleted_reviews: int
+
+
 class AuthorUpdate(BaseModel):
     name: Optional[str] = None
     bio: Optional[str] = None
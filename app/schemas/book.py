@@ -1,5 +1,6 @@
 from pydantic import BaseModel, Field, ConfigDict, constr, field_validator, EmailStr
 from datetime import date
+from typing import Dict, List
 from .author import AuthorResponse
 class BookBase(BaseModel):
     title: constr(min_length=2, max_length=100)
@@ -22,8 +23,52 @@ class BookCreate(BookBase):
 
 class BookResponse(BookBase):
     id: int
+    rating_count: int = 0
+    rating_average: float = 0.0
+    rating_histogram: Dict[int, int] = {}
 
     model_config = ConfigDict(from_attributes=True)
 
 class BookDetailResponse(BookResponse):
     author: AuthorResponse   # nested author details
+
+
+class BookSearchHit(BookDetailResponse):
+    score: float
+
+
+class SimilarBook(BookResponse):
+    score: float   # cosine similarity of the two books' ratings
+
+
+class BookSearchResponse(BaseModel):
+    items: List[BookSearchHit]
+    total: int
+    limit: int
+    offset: int
+
+
+class PriceBucket(BaseModel):
+    min: float
+    max: float | None = None   # None: open-ended top bucket
+    count: int
+
+
+class YearCount(BaseModel):
+    year: int
+    count: int
+
+
+class AuthorCount(BaseModel):
+    author_id: int
+    name: str
+    count: int
+
+
+class BookFacets(BaseModel):
+    total: int
+    in_stock: int
+    price: List[PriceBucket]
+    years: List[YearCount]
+    authors: List[AuthorCount]
+    approximate: bool = False   # counts extrapolated from a table sample
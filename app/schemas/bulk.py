@@ -0,0 +1,15 @@
+from pydantic import BaseModel
+from typing import List, Optional
+
+
+class BulkRowError(BaseModel):
+    row: int
+    key: Optional[str] = None
+    errors: List[str]
+
+
+class BulkResult(BaseModel):
+    created: int
+    updated: int
+    failed: int
+    errors: List[BulkRowError]
@@ -0,0 +1,20 @@
+from pydantic import BaseModel, ConfigDict
+from datetime import datetime
+from typing import List
+
+
+class ChangeEventResponse(BaseModel):
+    seq: int
+    resource: str
+    resource_id: int
+    action: str
+    created_at: datetime
+
+    model_config = ConfigDict(from_attributes=True)
+
+
+class ChangeFeed(BaseModel):
+    items: List[ChangeEventResponse]
+    # Pass back as ?since= to continue; unchanged when there was nothing new
+    next_since: int
+    has_more: bool
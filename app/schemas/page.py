@@ -0,0 +1,14 @@
+from pydantic import BaseModel
+from typing import Generic, List, Optional, TypeVar
+
+T = TypeVar("T")
+
+
+class Page(BaseModel, Generic[T]):
+    items: List[T]
+    next_cursor: Optional[str] = None
+
+
+class Batch(BaseModel, Generic[T]):
+    items: List[T]
+    missing: List[int] = []
@@ -0,0 +1,32 @@
+from pydantic import BaseModel, Field, ConfigDict
+from datetime import datetime
+from typing import List, Optional
+
+
+class ReservationItemBase(BaseModel):
+    book_id: int
+    quantity: int = Field(..., ge=1, description="Copies to hold")
+
+
+class StockReserve(BaseModel):
+    quantity: int = Field(1, ge=1, description="Copies to hold")
+    ttl_seconds: Optional[int] = Field(None, ge=1, description="How long to hold the stock")
+
+
+class ReservationCreate(BaseModel):
+    items: List[ReservationItemBase] = Field(..., min_length=1)
+    ttl_seconds: Optional[int] = Field(None, ge=1, description="How long to hold the stock")
+
+
+class ReservationItemResponse(ReservationItemBase):
+    model_config = ConfigDict(from_attributes=True)
+
+
+class ReservationResponse(BaseModel):
+    id: int
+    status: str
+    expires_at: datetime
+    created_at: Optional[datetime] = None
+    items: List[ReservationItemResponse]
+
+    model_config = ConfigDict(from_attributes=True)
@@ -33,5 +33,23 @@ class UserResponse(UserBase):
 class UserUpdate(BaseModel):
     username: Optional[str] = None
     email: Optional[EmailStr] = None
-    password: Optional[str] = None
+    password: Optional[constr(min_length=6, max_length=50)] = None
     role: Optional[Role] = None
+
+    @field_validator("username", "email", "password", "role")
+    @classmethod
+    def reject_null(cls, v):
+        # Leave a field out to keep it; none of them can be cleared
+        if v is None:
+            raise ValueError("Field may be omitted but not set to null")
+        return v
+
+
+class UserDeleteResult(BaseModel):
+    id: int
+    deleted_reviews: int
+
+
+class UserLogin(BaseModel):
+    username: str
+    password: str
@@ -0,0 +1,284 @@
+"""Benchmark the API against a seeded database and gate on a stored baseline.
+
+Seeds a throwaway database, then drives every scenario in
+``benchmarks.scenarios`` in-process over ASGI and/or over a real uvicorn
+server, reporting p50/p95/p99 latency, throughput and queries per request::
+
+    python -m benchmarks.run                        # ASGI, SQLite, defaults
+    python -m benchmarks.run --mode both --concurrency 32 --books 20000
+    python -m benchmarks.run --update-baseline      # accept current numbers
+
+Each scenario runs ``--repeat`` times and every latency and throughput
+figure is the median across runs. Exits with status 1 when a scenario
+regresses against the baseline (``benchmarks/baseline.json`` by default):
+queries per request and server errors are gated tightly, since they do not
+depend on timing; p50 latency and throughput within ``--tolerance``; p95
+only past the wider ``--tail-tolerance``, because SQLite write-lock waits
+make single-run tails noisy. Baselines are only comparable on the same
+machine, database and volumes.
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import platform
+import random
+import statistics
+import sys
+import threading
+import time
+from pathlib import Path
+
+
+BASELINE = Path(__file__).resolve().parent / "baseline.json"
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--database-url", default=os.getenv("BENCH_DATABASE_URL", "sqlite:///./bench.db"),
+                        help="Database to seed and benchmark; it is dropped and recreated")
+    parser.add_argument("--mode", choices=("asgi", "http", "both"), default="asgi")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=200, help="Measured requests per scenario run")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per scenario; figures are medians across runs")
+    parser.add_argument("--warmup", type=int, default=20, help="Unmeasured requests before a scenario's first run")
+    parser.add_argument("--authors", type=int, default=200)
+    parser.add_argument("--books", type=int, default=2000)
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--reviews", type=int, default=5000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--skip-seed", action="store_true", help="Reuse the data already in the database")
+    parser.add_argument("--scenarios", help="Comma-separated scenario names or prefixes (e.g. books,users.login)")
+    parser.add_argument("--port", type=int, default=8765, help="Port for --mode http")
+    parser.add_argument("--output", help="Also write the results JSON here")
+    parser.add_argument("--baseline", default=str(BASELINE))
+    parser.add_argument("--update-baseline", action="store_true", help="Store these results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.5,
+                        help="Allowed relative regression in p50 latency and throughput")
+    parser.add_argument("--tail-tolerance", type=float, default=2.0,
+                        help="Allowed relative regression in p95 latency")
+    parser.add_argument("--query-tolerance", type=float, default=0.5,
+                        help="Allowed increase in queries per request")
+    return parser.parse_args(argv)
+
+
+def percentile(values, pct):
+    # Nearest-rank, on pre-sorted values
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, max(0, math.ceil(pct / 100 * len(values)) - 1))]
+
+
+async def run_scenario(client, scenario, volumes, args, counter, rng, warmup=0):
+    def request():
+        path = scenario.path(rng, volumes)
+        body = scenario.body(rng, volumes) if scenario.body else None
+        return client.request(scenario.method, path, json=body)
+
+    for _ in range(warmup):
+        await request()
+
+    latencies, errors, rejected = [], 0, 0
+    remaining = args.requests
+    counter.count = 0
+
+    async def worker():
+        nonlocal remaining, errors, rejected
+        while remaining > 0:
+            remaining -= 1
+            started = time.perf_counter()
+            response = await request()
+            latencies.append((time.perf_counter() - started) * 1000)
+            # 4xx (e.g. a 409 from concurrent writes) is an expected outcome, 5xx is not
+            if response.status_code >= 500:
+                errors += 1
+            elif response.status_code >= 400:
+                rejected += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "rejected": rejected,
+        "p50_ms": round(percentile(latencies, 50), 3),
+        "p95_ms": round(percentile(latencies, 95), 3),
+        "p99_ms": round(percentile(latencies, 99), 3),
+        "mean_ms": round(sum(latencies) / len(latencies), 3),
+        "throughput_rps": round(len(latencies) / elapsed, 1),
+        "queries_per_request": round(counter.count / len(latencies), 2),
+    }
+
+
+def summarize(runs):
+    """Median of every figure across repeated runs; request and error counts are totals."""
+    summary = {key: round(statistics.median(run[key] for run in runs), 3) for key in runs[0]}
+    for key in ("requests", "errors", "rejected"):
+        summary[key] = sum(run[key] for run in runs)
+    summary["runs"] = len(runs)
+    return summary
+
+
+async def run_mode(client, scenarios, volumes, args, counter):
+    rng = random.Random(args.seed)
+    results = {}
+    for scenario in scenarios:
+        runs = [
+            await run_scenario(client, scenario, volumes, args, counter, rng, warmup=args.warmup if i == 0 else 0)
+            for i in range(args.repeat)
+        ]
+        results[scenario.name] = summarize(runs)
+        print_row(scenario.name, results[scenario.name])
+    return results
+
+
+async def run_asgi(app, scenarios, volumes, args, counter):
+    import httpx
+    from app.database import async_engine
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        results = await run_mode(client, scenarios, volumes, args, counter)
+    # Pooled connections belong to this event loop
+    await async_engine.dispose()
+    return results
+
+
+async def run_http(app, scenarios, volumes, args, counter):
+    import httpx
+    import uvicorn
+
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=args.port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        if not thread.is_alive():
+            raise RuntimeError(f"uvicorn failed to start on port {args.port}")
+        await asyncio.sleep(0.05)
+    try:
+        limits = httpx.Limits(max_connections=args.concurrency)
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{args.port}", limits=limits) as client:
+            return await run_mode(client, scenarios, volumes, args, counter)
+    finally:
+        server.should_exit = True
+        thread.join()
+
+
+def print_header(mode):
+    print(f"\n[{mode}]")
+    print(f"{'scenario':<20}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'req/s':>10}{'queries':>9}{'4xx':>6}{'5xx':>6}")
+
+
+def print_row(name, r):
+    print(f"{name:<20}{r['p50_ms']:>10.2f}{r['p95_ms']:>10.2f}{r['p99_ms']:>10.2f}"
+          f"{r['throughput_rps']:>10.1f}{r['queries_per_request']:>9.2f}{r['rejected']:>6}{r['errors']:>6}")
+
+
+def compare(results, baseline, args):
+    """Return human-readable regressions of ``results`` against ``baseline``."""
+    regressions = []
+    for mode, scenarios in results["results"].items():
+        for name, current in scenarios.items():
+            base = baseline.get("results", {}).get(mode, {}).get(name)
+            if base is None:
+                continue
+            label = f"{mode} {name}"
+            # Query counts barely move between runs, so any real increase is an N+1 creeping in
+            if current["queries_per_request"] - base["queries_per_request"] > args.query_tolerance:
+                regressions.append(f"{label}: {current['queries_per_request']:.2f} queries/request "
+                                   f"vs {base['queries_per_request']:.2f}")
+            if current["errors"] > base["errors"]:
+                regressions.append(f"{label}: {current['errors']} errors vs {base['errors']}")
+            if current["p50_ms"] > base["p50_ms"] * (1 + args.tolerance):
+                regressions.append(f"{label}: p50 {current['p50_ms']:.2f} ms vs {base['p50_ms']:.2f} ms")
+            if current["p95_ms"] > base["p95_ms"] * (1 + args.tail_tolerance):
+                regressions.append(f"{label}: p95 {current['p95_ms']:.2f} ms vs {base['p95_ms']:.2f} ms")
+            if current["throughput_rps"] < base["throughput_rps"] * (1 - args.tolerance):
+                regressions.append(f"{label}: {current['throughput_rps']:.1f} req/s vs {base['throughput_rps']:.1f}")
+    return regressions
+
+
+def select_scenarios(all_scenarios, spec):
+    if not spec:
+        return all_scenarios
+    wanted = [s.strip() for s in spec.split(",") if s.strip()]
+    return [s for s in all_scenarios if any(s.name == w or s.name.startswith(w + ".") for w in wanted)]
+
+
+class QueryCounter:
+    """``before_cursor_execute`` listener counting the statements the app issues."""
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, *args):
+        self.count += 1
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    # The app reads its settings at import time
+    os.environ["DATABASE_URL"] = args.database_url
+
+    from app.main import app
+    from app.database import async_engine
+    from sqlalchemy import event
+    from benchmarks.scenarios import SCENARIOS
+    from benchmarks.seed import seed
+
+    volumes = {"authors": args.authors, "books": args.books, "users": args.users, "reviews": args.reviews}
+    if not args.skip_seed:
+        started = time.perf_counter()
+        volumes = seed(**volumes, seed=args.seed)
+        print(f"Seeded {volumes} in {time.perf_counter() - started:.1f}s")
+
+    scenarios = select_scenarios(SCENARIOS, args.scenarios)
+    counter = QueryCounter()
+    event.listen(async_engine.sync_engine, "before_cursor_execute", counter)
+
+    modes = ("asgi", "http") if args.mode == "both" else (args.mode,)
+    runners = {"asgi": run_asgi, "http": run_http}
+    results = {
+        "meta": {
+            "database": async_engine.dialect.name,
+            "volumes": volumes,
+            "concurrency": args.concurrency,
+            "requests": args.requests,
+            "repeat": args.repeat,
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+        },
+        "results": {},
+    }
+    for mode in modes:
+        print_header(mode)
+        results["results"][mode] = asyncio.run(runners[mode](app, scenarios, volumes, args, counter))
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2) + "\n")
+
+    baseline_path = Path(args.baseline)
+    if args.update_baseline:
+        baseline_path.write_text(json.dumps(results, indent=2) + "\n")
+        print(f"\nBaseline written to {baseline_path}")
+        return 0
+    if not baseline_path.exists():
+        print(f"\nNo baseline at {baseline_path}; run with --update-baseline to create one")
+        return 0
+
+    baseline = json.loads(baseline_path.read_text())
+    if baseline.get("meta", {}).get("volumes") != volumes:
+        print("\nWarning: baseline was recorded with different volumes", file=sys.stderr)
+    regressions = compare(results, baseline, args)
+    for regression in regressions:
+        print(f"REGRESSION {regression}", file=sys.stderr)
+    print(f"\n{len(regressions)} regression(s) against {baseline_path}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,48 @@
+"""Requests the benchmark drives, one or more per router."""
+from typing import Callable, NamedTuple, Optional
+
+from benchmarks.seed import PASSWORD, WORDS
+
+
+class Scenario(NamedTuple):
+    name: str
+    method: str
+    # (rng, volumes) -> path
+    path: Callable
+    # (rng, volumes) -> JSON body, for writes
+    body: Optional[Callable] = None
+
+
+def _pick(rng, volumes, kind):
+    return rng.randint(1, volumes[kind])
+
+
+SCENARIOS = [
+    Scenario("books.list", "GET", lambda rng, v: "/books/?limit=50"),
+    Scenario("books.detail", "GET", lambda rng, v: f"/books/{_pick(rng, v, 'books')}"),
+    Scenario("books.search", "GET", lambda rng, v: f"/books/search?title={rng.choice(WORDS)}"),
+    Scenario("books.top_rated", "GET", lambda rng, v: "/books/top-rated?limit=20"),
+    # A 50-item cart in one request
+    Scenario("books.batch", "GET",
+             lambda rng, v: "/books/?ids=" + ",".join(str(_pick(rng, v, "books")) for _ in range(50))),
+    # Price range, in stock, cheapest first
+    Scenario("books.filtered", "GET",
+             lambda rng, v: f"/books/?limit=50&in_stock=true&min_price={rng.randint(5, 40)}&max_price=60&sort=price"),
+    Scenario("books.facets", "GET", lambda rng, v: f"/books/facets?max_price={rng.randint(20, 80)}"),
+    Scenario("books.by_author", "GET", lambda rng, v: f"/books/author/{_pick(rng, v, 'authors')}"),
+    Scenario("books.similar", "GET", lambda rng, v: f"/books/{_pick(rng, v, 'books')}/similar"),
+    Scenario("books.reserve", "POST", lambda rng, v: f"/books/{_pick(rng, v, 'books')}/stock/reserve",
+             lambda rng, v: {"quantity": 1}),
+    Scenario("authors.list", "GET", lambda rng, v: "/authors/?limit=50"),
+    Scenario("authors.detail", "GET", lambda rng, v: f"/authors/{_pick(rng, v, 'authors')}"),
+    Scenario("authors.patch", "PATCH", lambda rng, v: f"/authors/{_pick(rng, v, 'authors')}",
+             lambda rng, v: {"bio": f"Updated {rng.random()}"}),
+    Scenario("users.detail", "GET", lambda rng, v: f"/users/{_pick(rng, v, 'users')}"),
+    Scenario("users.login", "POST", lambda rng, v: "/users/login",
+             lambda rng, v: {"username": f"user{_pick(rng, v, 'users')}", "password": PASSWORD}),
+    Scenario("reviews.list", "GET", lambda rng, v: "/reviews/?limit=50"),
+    Scenario("reviews.by_book", "GET", lambda rng, v: f"/reviews/book/{_pick(rng, v, 'books')}"),
+    # Every request for the same featured book, so concurrent misses coalesce
+    Scenario("reviews.featured", "GET", lambda rng, v: "/reviews/book/1"),
+    Scenario("reviews.by_user", "GET", lambda rng, v: f"/reviews/user/{_pick(rng, v, 'users')}"),
+]
@@ -0,0 +1,76 @@
+"""Seed a throwaway database with synthetic catalogue data for benchmarks."""
+import random
+from datetime import date, timedelta
+
+from sqlalchemy import insert, text
+
+from app.database import Base, engine
+from app.core import ratings
+from app.core.config import BCRYPT_ROUNDS
+from app.core.credentials import _hash
+from app.models.author import Author
+from app.models.book import Book
+from app.models.review import Review
+from app.models.user import User
+
+
+WORDS = (
+    "shadow river garden winter empire silent glass paper storm golden "
+    "night city forest machine ocean letter crown echo harbor lantern"
+).split()
+NATIONALITIES = ("Indian", "British", "American", "French", "Japanese", "Nigerian", "Brazilian")
+BATCH = 1000
+
+# One real hash shared by every seeded user, so POST /users/login works
+PASSWORD = "benchmark"
+
+
+def _title(rng):
+    return " ".join(rng.choice(WORDS) for _ in range(rng.randint(2, 4))).title()
+
+
+def _insert(conn, model, rows):
+    for start in range(0, len(rows), BATCH):
+        conn.execute(insert(model), rows[start:start + BATCH])
+
+
+def seed(authors=200, books=2000, users=500, reviews=5000, seed=42):
+    """Drop and recreate every table, then bulk insert the requested volumes."""
+    rng = random.Random(seed)
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    password_hash = _hash(PASSWORD, BCRYPT_ROUNDS)
+
+    reviews = min(reviews, books * users)
+    pairs = set()
+    while len(pairs) < reviews:
+        pairs.add((rng.randint(1, books), rng.randint(1, users)))
+
+    with engine.begin() as conn:
+        _insert(conn, Author, [
+            {"id": i, "name": f"{rng.choice(WORDS).title()} {rng.choice(WORDS).title()} {i}",
+             "bio": "Seeded author", "nationality": rng.choice(NATIONALITIES)}
+            for i in range(1, authors + 1)
+        ])
+        _insert(conn, Book, [
+            {"id": i, "title": _title(rng), "author_id": rng.randint(1, authors),
+             "isbn": f"978{i:010d}", "price": round(rng.uniform(5, 60), 2), "stock": 1_000_000,
+             "published_date": date(1950, 1, 1) + timedelta(days=rng.randint(0, 27000))}
+            for i in range(1, books + 1)
+        ])
+        _insert(conn, User, [
+            {"id": i, "username": f"user{i}", "email": f"user{i}@example.com",
+             "password_hash": password_hash, "role": "user"}
+            for i in range(1, users + 1)
+        ])
+        _insert(conn, Review, [
+            {"book_id": book_id, "user_id": user_id, "rating": rng.randint(1, 5), "comment": "Seeded"}
+            for book_id, user_id in sorted(pairs)
+        ])
+        conn.execute(ratings.recompute_statement())
+        if conn.dialect.name == "postgresql":
+            # Explicit ids above do not advance the sequences
+            for table in ("authors", "books", "users"):
+                conn.execute(text(f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), MAX(id)) FROM {table}"))
+
+    return {"authors": authors, "books": books, "users": users, "reviews": reviews}
@@ -0,0 +1,106 @@
+"""Per-row cost of the list serialization paths.
+
+Compares, for growing page sizes, the old ORM path (load entities, validate
+them against the response schema with ``from_attributes``, run
+``jsonable_encoder`` and ``json.dumps``) with the row-tuple path in
+``app.core.serialization`` (select only the schema's columns, encode once
+with pydantic-core), plus orjson on the same dicts when it is installed::
+
+    python -m benchmarks.serialization --sizes 100,1000,10000
+
+Load and encode are timed separately and reported in microseconds per row.
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+from typing import List
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--database-url", default=os.getenv("BENCH_DATABASE_URL", "sqlite:///./bench.db"),
+                        help="Database to seed and read; it is dropped and recreated")
+    parser.add_argument("--sizes", default="100,1000,10000", help="Comma-separated rows per payload")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per measurement; the median is reported")
+    parser.add_argument("--skip-seed", action="store_true", help="Reuse the data already in the database")
+    return parser.parse_args(argv)
+
+
+def timed(fn, repeat):
+    samples, result = [], None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        samples.append(time.perf_counter() - started)
+    return statistics.median(samples), result
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    sizes = [int(size) for size in args.sizes.split(",")]
+    # The app reads its settings at import time
+    os.environ["DATABASE_URL"] = args.database_url
+
+    from fastapi.encoders import jsonable_encoder
+    from pydantic import TypeAdapter
+    from sqlalchemy import select
+    from app.core.serialization import RowShape, dump
+    from app.database import SessionLocal
+    from app.models.book import Book
+    from app.schemas.book import BookResponse
+    from benchmarks.seed import seed
+
+    try:
+        import orjson
+    except ImportError:
+        orjson = None
+
+    if not args.skip_seed:
+        seed(authors=max(1, max(sizes) // 10), books=max(sizes), users=10, reviews=0)
+
+    orm_adapter = TypeAdapter(List[BookResponse])
+    shape = RowShape(Book, BookResponse)
+
+    print(f"{'rows':>8}  {'path':<10}{'load us/row':>14}{'encode us/row':>15}{'total us/row':>14}{'bytes':>10}")
+    for size in sizes:
+        with SessionLocal() as db:
+            def load_orm():
+                db.expunge_all()
+                return db.execute(select(Book).order_by(Book.id).limit(size)).scalars().all()
+
+            def load_rows():
+                return db.execute(select(*shape.columns).order_by(Book.id).limit(size)).all()
+
+            orm_load, books = timed(load_orm, args.repeat)
+            row_load, rows = timed(load_rows, args.repeat)
+
+        if len(rows) < size:
+            print(f"Only {len(rows)} books seeded; rerun without --skip-seed", file=sys.stderr)
+            return 1
+
+        items = [shape.item(row) for row in rows]
+        paths = [
+            ("orm", orm_load,
+             lambda: json.dumps(jsonable_encoder(orm_adapter.validate_python(books, from_attributes=True))).encode()),
+            ("rows", row_load, lambda: dump([shape.item(row) for row in rows])),
+        ]
+        if orjson is not None:
+            # orjson needs string keys, which is what JSON ends up with anyway
+            paths.append(("orjson", row_load, lambda: orjson.dumps(
+                [shape.item(row) for row in rows], option=orjson.OPT_NON_STR_KEYS)))
+
+        for name, load, encode in paths:
+            encode_time, body = timed(encode, args.repeat)
+            per_row = 1e6 / size
+            print(f"{size:>8}  {name:<10}{load * per_row:>14.2f}{encode_time * per_row:>15.2f}"
+                  f"{(load + encode_time) * per_row:>14.2f}{len(body):>10}")
+        # Both paths must produce the same document
+        assert json.loads(paths[0][2]()) == json.loads(dump(items))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
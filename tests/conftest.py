@@ -0,0 +1,67 @@
+import asyncio
+import itertools
+import os
+import tempfile
+
+# The app reads its configuration at import time, so point it at a throwaway database first
+_db_dir = tempfile.mkdtemp(prefix="bookstore-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_db_dir, 'test.db')}"
+os.environ["AUTO_CREATE_TABLES"] = "1"
+os.environ["CACHE_BACKEND"] = "memory"
+os.environ["DATABASE_REPLICA_URLS"] = ""
+os.environ["BCRYPT_ROUNDS"] = "4"
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.core import recommendations
+from app.core.cache import cache
+from app.core.search import memory_backend
+from app.database import Base, SessionLocal, engine
+from app.models.author import Author
+from app.models.book import Book
+
+
+@pytest.fixture(autouse=True)
+def fresh_state(monkeypatch):
+    """Empty tables, cache and in-process indexes for every test."""
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    asyncio.run(cache.backend.clear())
+    memory_backend.invalidate()
+    monkeypatch.setattr(recommendations, "index", recommendations.RecommendationIndex())
+    yield
+
+
+@pytest.fixture
+def client():
+    # No lifespan: the sweeper, sequencer and index maintenance loops stay off
+    return TestClient(app)
+
+
+@pytest.fixture
+def db():
+    with SessionLocal() as session:
+        yield session
+
+
+@pytest.fixture
+def make_book(db):
+    """Create a book (and its author) directly in the database; returns its id."""
+    isbns = itertools.count(9780000000000)
+
+    def make(stock=5, price=10.0, author_id=None, **fields):
+        if author_id is None:
+            author = Author(name="Test Author", bio="b")
+            db.add(author)
+            db.flush()
+            author_id = author.id
+        fields.setdefault("title", "Test Book")
+        fields.setdefault("isbn", str(next(isbns)))
+        book = Book(author_id=author_id, stock=stock, price=price, **fields)
+        db.add(book)
+        db.commit()
+        return book.id
+
+    return make
@@ -0,0 +1,52 @@
+from contextlib import contextmanager
+
+from sqlalchemy import event
+
+
+class QueryCounter:
+    """Counts statements executed on an engine while active.
+
+    Pins the number of queries an endpoint issues. The routers run on the
+    async engine, so listen on its sync core, e.g.::
+
+        with count_queries(async_engine.sync_engine) as counter:
+            client.get("/books/author/1")
+        assert counter.count <= 2
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.statements = []
+
+    def __call__(self, conn, cursor, statement, parameters, context, executemany):
+        self.count += 1
+        self.statements.append(statement)
+
+
+@contextmanager
+def count_queries(engine):
+    counter = QueryCounter()
+    event.listen(engine, "before_cursor_execute", counter)
+    try:
+        yield counter
+    finally:
+        event.remove(engine, "before_cursor_execute", counter)
+
+
+def assert_constant_queries(engine, run, sizes, max_queries=None):
+    """Fail if the queries issued by ``run(size)`` grow with ``size``.
+
+    ``run`` is called once per entry in ``sizes`` (e.g. after seeding that
+    many rows); every run must issue the same number of statements, and no
+    more than ``max_queries`` when given.
+    """
+    counts = {}
+    for size in sizes:
+        with count_queries(engine) as counter:
+            run(size)
+        counts[size] = counter.count
+    if len(set(counts.values())) > 1:
+        raise AssertionError(f"Query count grows with result size: {counts}")
+    if max_queries is not None and max(counts.values()) > max_queries:
+        raise AssertionError(f"Expected at most {max_queries} queries, got {counts}")
+    return counts
@@ -0,0 +1,22 @@
+import pytest
+
+from app.core.admission import EXEMPT, classify
+
+
+@pytest.mark.parametrize("method, path, route_class", [
+    ("GET", "/healthcheck", EXEMPT),
+    ("GET", "/changes/stream", "stream"),
+    ("POST", "/books/bulk", "heavy"),
+    ("GET", "/books/search", "heavy"),
+    ("GET", "/books/author/3", "heavy"),
+    ("GET", "/books/3/similar", "heavy"),
+    ("GET", "/reviews/book/3", "heavy"),
+    ("HEAD", "/reviews/user/3/", "heavy"),
+    ("GET", "/books/", "heavy"),
+    ("GET", "/books/3", "read"),
+    ("GET", "/reviews/3", "read"),
+    ("PUT", "/books/3", "write"),
+    ("DELETE", "/reviews/3", "write"),
+])
+def test_route_classes(method, path, route_class):
+    assert classify(method, path) == route_class
@@ -0,0 +1,49 @@
+from app.core import batch
+from app.database import async_engine
+from app.models.book import Book
+from querycount import count_queries
+
+
+def test_batch_keeps_request_order_and_lists_missing_ids(client, db, make_book):
+    first = make_book(title="First")
+    author_id = db.get(Book, first).author_id
+    second = make_book(title="Second", author_id=author_id)
+    with count_queries(async_engine.sync_engine) as counter:
+        response = client.get("/books/", params={"ids": f"{second},999,{first},{second}"})
+    assert response.status_code == 200
+    body = response.json()
+    # Duplicates are dropped, the first occurrence keeps its place
+    assert [book["id"] for book in body["items"]] == [second, first]
+    assert body["items"][0]["author"]["id"] == author_id
+    assert body["missing"] == [999]
+    # Books and their authors come back from a single query
+    assert counter.count == 1
+
+
+def test_batch_etag_follows_nested_author(client, make_book):
+    book_id = make_book()
+    response = client.get("/books/", params={"ids": str(book_id)})
+    etag = response.headers["ETag"]
+    assert client.get("/books/", params={"ids": str(book_id)}, headers={"If-None-Match": etag}).status_code == 304
+    client.patch(f"/authors/{response.json()['items'][0]['author_id']}", json={"name": "Renamed"})
+    assert client.get("/books/", params={"ids": str(book_id)}, headers={"If-None-Match": etag}).status_code == 200
+
+
+def test_malformed_empty_and_oversized_batches_are_rejected(client, make_book, monkeypatch):
+    make_book()
+    monkeypatch.setattr(batch, "BATCH_MAX_IDS", 3)
+    for ids, detail in [("1,two", "ids must be comma separated integers"),
+                        (",", "ids must not be empty"),
+                        ("1,2,3,4", "At most 3 ids per request")]:
+        response = client.get("/books/", params={"ids": ids})
+        assert response.status_code == 400, ids
+        assert response.json()["detail"] == detail
+    # The cap counts distinct ids
+    assert client.get("/books/", params={"ids": "1,2,3,3,3"}).status_code == 200
+
+
+def test_batch_on_other_resources(client, make_book):
+    author_id = client.get(f"/books/{make_book()}").json()["author_id"]
+    body = client.get("/authors/", params={"ids": f"{author_id},{author_id + 1}"}).json()
+    assert [author["id"] for author in body["items"]] == [author_id]
+    assert body["missing"] == [author_id + 1]
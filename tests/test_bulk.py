@@ -0,0 +1,95 @@
+import json
+
+from app.models.book import Book
+
+
+def book_row(author_id, isbn, **fields):
+    return {"title": "Bulk Book", "author_id": author_id, "isbn": isbn, "price": 9.5, "stock": 3, **fields}
+
+
+def post_ndjson(client, rows, upsert=False):
+    body = "\n".join(row if isinstance(row, str) else json.dumps(row) for row in rows)
+    return client.post("/books/bulk", params={"upsert": upsert}, content=body,
+                       headers={"Content-Type": "application/x-ndjson"}).json()
+
+
+def author_of(client, book_id):
+    return client.get(f"/books/{book_id}").json()["author_id"]
+
+
+def test_insert_rejects_existing_isbns_and_upsert_updates_them(client, db, make_book):
+    existing = make_book(isbn="9781111111111", title="Original")
+    author_id = author_of(client, existing)
+
+    inserted = client.post("/books/bulk", json=[book_row(author_id, "9781111111111", title="Changed"),
+                                                book_row(author_id, "9782222222222")]).json()
+    assert (inserted["created"], inserted["updated"], inserted["failed"]) == (1, 0, 1)
+    assert inserted["errors"] == [{"row": 1, "key": "9781111111111", "errors": ["A book with this ISBN already exists"]}]
+    assert db.get(Book, existing).title == "Original"
+
+    upserted = client.post("/books/bulk", params={"upsert": True},
+                           json=[book_row(author_id, "9781111111111", title="Changed"),
+                                 book_row(author_id, "9783333333333")]).json()
+    assert (upserted["created"], upserted["updated"], upserted["failed"]) == (1, 1, 0)
+    db.expire_all()
+    book = db.get(Book, existing)
+    assert (book.title, book.version) == ("Changed", 2)
+    assert db.query(Book).count() == 3
+
+
+def test_duplicate_isbn_in_one_batch_keeps_the_last_row(client, db, make_book):
+    author_id = author_of(client, make_book())
+    report = post_ndjson(client, [book_row(author_id, "9784444444444", title="First"),
+                                  book_row(author_id, "9784444444444", title="Second")])
+    assert (report["created"], report["failed"]) == (1, 1)
+    assert report["errors"] == [
+        {"row": 1, "key": "9784444444444", "errors": ["Superseded by a later row with the same ISBN"]},
+    ]
+    assert db.query(Book).filter(Book.isbn == "9784444444444").one().title == "Second"
+
+
+def test_malformed_rows_are_reported_by_line(client, make_book):
+    author_id = author_of(client, make_book())
+    report = post_ndjson(client, [
+        book_row(author_id, "9785555555555"),
+        "{not json",
+        "",
+        book_row(author_id, "9786666666666", price="cheap"),
+        book_row(author_id, "9787777777777"),
+    ])
+    assert (report["created"], report["failed"]) == (2, 2)
+    # Blank lines are skipped and not numbered
+    assert [(error["row"], error["key"]) for error in report["errors"]] == [(2, None), (3, "9786666666666")]
+    assert report["errors"][0]["errors"] == ["Invalid JSON line"]
+    assert report["errors"][1]["errors"][0].startswith("price:")
+
+    csv_body = "title,author_id,isbn,price,stock\n" \
+               f"CSV Book,{author_id},9788888888888,5,1\n" \
+               f"Bad Stock,{author_id},9789999999999,5,-1\n"
+    report = client.post("/books/bulk", content=csv_body, headers={"Content-Type": "text/csv"}).json()
+    assert (report["created"], report["failed"]) == (1, 1)
+    assert report["errors"][0]["row"] == 2
+    assert report["errors"][0]["errors"][0].startswith("stock:")
+
+
+def test_upsert_moving_a_book_refreshes_both_authors(client, db, make_book):
+    book_id = make_book(isbn="9781212121212")
+    old_author = author_of(client, book_id)
+    new_author = author_of(client, make_book())
+    # Warm the cached detail (which nests the old author) and both authors' book lists
+    assert client.get(f"/books/{book_id}").json()["author"]["id"] == old_author
+    old_etag = client.get(f"/books/author/{old_author}").headers["ETag"]
+    new_etag = client.get(f"/books/author/{new_author}").headers["ETag"]
+
+    report = post_ndjson(client, [book_row(new_author, "9781212121212")], upsert=True)
+    assert (report["created"], report["updated"]) == (0, 1)
+
+    assert client.get(f"/books/{book_id}").json()["author"]["id"] == new_author
+    old_list = client.get(f"/books/author/{old_author}", headers={"If-None-Match": old_etag})
+    assert old_list.status_code == 200 and book_id not in [book["id"] for book in old_list.json()]
+    new_list = client.get(f"/books/author/{new_author}", headers={"If-None-Match": new_etag})
+    assert new_list.status_code == 200 and book_id in [book["id"] for book in new_list.json()]
+
+    # The refilled detail is tagged with the new author, so renaming that author reaches it
+    client.patch(f"/authors/{new_author}", json={"name": "Renamed Author"})
+    assert client.get(f"/books/{book_id}").json()["author"]["name"] == "Renamed Author"
@@ -0,0 +1,157 @@
+import asyncio
+import time
+
+from app.core.cache import MemoryBackend, RedisBackend
+
+
+class FakeRedis:
+    """Just enough of a Redis server to exercise the RESP client."""
+
+    def __init__(self):
+        self.store = {}
+        self.sets = {}
+        self.stall = False
+        self.connections = 0
+
+    async def handle(self, reader, writer):
+        self.connections += 1
+        while True:
+            line = await reader.readline()
+            if not line:
+                break
+            args = []
+            for _ in range(int(line[1:-2])):
+                length = int((await reader.readline())[1:-2])
+                args.append((await reader.readexactly(length + 2))[:-2])
+            if self.stall:
+                await asyncio.sleep(3600)
+            writer.write(self.reply(args[0].upper(), args[1:]))
+            await writer.drain()
+        writer.close()
+
+    def reply(self, command, args):
+        if command == b"GET":
+            value = self.store.get(args[0])
+            return b"$-1\r\n" if value is None else b"$%d\r\n%s\r\n" % (len(value), value)
+        if command == b"SET":
+            self.store[args[0]] = args[1]
+            return b"+OK\r\n"
+        if command == b"SADD":
+            self.sets.setdefault(args[0], set()).add(args[1])
+            return b":1\r\n"
+        if command == b"PEXPIRE":
+            return b":1\r\n"
+        if command == b"SMEMBERS":
+            members = self.sets.get(args[0], set())
+            return b"*%d\r\n" % len(members) + b"".join(b"$%d\r\n%s\r\n" % (len(m), m) for m in members)
+        if command == b"DEL":
+            removed = sum(self.store.pop(k, None) is not None or self.sets.pop(k, None) is not None for k in args)
+            return b":%d\r\n" % removed
+        return b"-ERR unknown command '%s'\r\n" % command
+
+
+def with_server(test):
+    async def run():
+        fake = FakeRedis()
+        server = await asyncio.start_server(fake.handle, "127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        backend = RedisBackend(f"redis://127.0.0.1:{port}/0", timeout=0.2, pool_size=2)
+        async with server:
+            await test(backend, fake)
+    asyncio.run(run())
+
+
+def test_redis_set_get_and_tags():
+    async def test(backend, fake):
+        await backend.set("book:1", b"one", 60, tags=["tag:a"])
+        await backend.set("book:2", b"two", 60, tags=["tag:a"])
+        assert await backend.get("book:1") == b"one"
+        await backend.invalidate_tags("tag:a")
+        assert await backend.get("book:1") is None
+        assert await backend.get("book:2") is None
+        assert backend.errors == 0
+    with_server(test)
+
+
+def test_redis_set_is_pipelined():
+    async def test(backend, fake):
+        commands = []
+        original = backend._roundtrip
+
+        async def roundtrip(reader, writer, batch):
+            commands.append(len(batch))
+            return await original(reader, writer, batch)
+
+        backend._roundtrip = roundtrip
+        await backend.set("book:1", b"one", 60, tags=["tag:a", "tag:b"])
+        assert commands == [5]
+    with_server(test)
+
+
+def test_redis_reuses_a_bounded_pool():
+    async def test(backend, fake):
+        await asyncio.gather(*(backend.get(f"book:{i}") for i in range(20)))
+        await backend.get("book:1")
+        assert fake.connections == 2
+    with_server(test)
+
+
+def test_redis_error_reply_is_a_miss_and_keeps_the_connection():
+    async def test(backend, fake):
+        assert await backend.execute("NOPE") is None
+        assert backend.errors == 1
+        await backend.set("book:1", b"one", 60)
+        assert await backend.get("book:1") == b"one"
+        assert fake.connections == 1
+    with_server(test)
+
+
+def test_redis_stalled_server_is_a_miss():
+    async def test(backend, fake):
+        fake.stall = True
+        started = time.monotonic()
+        assert await backend.get("book:1") is None
+        assert time.monotonic() - started < 1
+        assert backend.errors == 1
+        # The timed-out connection is dropped rather than reused out of sync
+        fake.stall = False
+        await backend.set("book:1", b"one", 60)
+        assert await backend.get("book:1") == b"one"
+        assert fake.connections == 2
+    with_server(test)
+
+
+def test_redis_unreachable_server_is_a_miss():
+    async def run():
+        server = await asyncio.start_server(lambda r, w: None, "127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        server.close()
+        await server.wait_closed()
+        backend = RedisBackend(f"redis://127.0.0.1:{port}/0", timeout=0.2)
+        assert await backend.get("book:1") is None
+        await backend.set("book:1", b"one", 60, tags=["tag:a"])
+        await backend.invalidate_tags("tag:a")
+        assert backend.errors == 3
+    asyncio.run(run())
+
+
+def test_memory_backend_forgets_tags_of_dropped_entries():
+    async def run():
+        backend = MemoryBackend(max_entries=2)
+        await backend.set("book:1", b"one", 60, tags=["tag:a"])
+        await backend.set("book:2", b"two", 60, tags=["tag:a", "tag:b"])
+        await backend.set("book:3", b"three", 60, tags=["tag:b"])   # evicts book:1
+        await backend.delete("book:2")
+        await backend.set("book:4", b"four", -1, tags=["tag:c"])    # already expired
+        assert await backend.get("book:4") is None
+        assert backend._tags == {"tag:b": {"book:3"}}
+        assert backend._key_tags == {"book:3": {"tag:b"}}
+
+        # Re-setting a key replaces its tags instead of adding to them
+        await backend.set("book:3", b"three", 60, tags=["tag:c"])
+        await backend.invalidate_tags("tag:b")
+        assert await backend.get("book:3") == b"three"
+        await backend.invalidate_tags("tag:c")
+        assert await backend.get("book:3") is None
+        assert backend._tags == {} and backend._key_tags == {}
+    asyncio.run(run())
@@ -0,0 +1,113 @@
+import asyncio
+from datetime import date
+
+import pytest
+
+from app.core import catalog
+from app.core.pagination import encode_cursor
+from app.database import AsyncSessionLocal
+from app.models.book import Book
+
+
+@pytest.fixture
+def shelf(db, make_book):
+    first = make_book(price=5.0, stock=0, published_date=date(2001, 1, 1))
+    author_id = db.get(Book, first).author_id
+    ids = [first] + [
+        make_book(price=price, stock=stock, author_id=author_id, published_date=date(year, 1, 1))
+        for price, stock, year in [(12.5, 1, 2001), (12.5, 2, 2005), (30.0, 0, 2005), (120.0, 3, 2010)]
+    ]
+    ids.append(make_book(price=None, stock=1))
+    return author_id, ids
+
+
+def walk(client, sort, limit=2):
+    seen, cursor = [], None
+    while True:
+        params = {"sort": sort, "limit": limit, **({"cursor": cursor} if cursor else {})}
+        page = client.get("/books/", params=params).json()
+        seen += [book["id"] for book in page["items"]]
+        cursor = page["next_cursor"]
+        if cursor is None:
+            return seen
+
+
+def test_price_sort_pages_through_every_book(client, shelf):
+    _, ids = shelf
+    ascending = walk(client, "price")
+    assert ascending == [ids[0], ids[1], ids[2], ids[3], ids[4], ids[5]]
+    descending = walk(client, "-price")
+    assert descending == [ids[4], ids[3], ids[2], ids[1], ids[0], ids[5]]
+
+
+@pytest.mark.parametrize("sort, value", [("price", "cheap"), ("-price", {"a": 1}), ("published_date", "soon")])
+def test_malformed_sort_value_in_cursor_is_a_400(client, shelf, sort, value):
+    cursor = encode_cursor(1, s=sort, k=value)
+    response = client.get("/books/", params={"sort": sort, "cursor": cursor})
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Invalid cursor"
+
+
+def test_facets_count_each_facet_without_its_own_filter(client, shelf):
+    author_id, _ = shelf
+    facets = client.get("/books/facets", params={"min_price": 10, "in_stock": "true"}).json()
+    assert facets["total"] == 3
+    assert facets["approximate"] is False
+    # Each facet leaves out its own filter: in_stock counts every book priced 10 or more,
+    # price counts every book in stock
+    assert facets["in_stock"] == 3
+    assert {bucket["min"]: bucket["count"] for bucket in facets["price"]} == {
+        0.0: 0, 10.0: 2, 25.0: 0, 50.0: 0, 100.0: 1,
+    }
+    assert facets["years"] == [{"year": 2010, "count": 1}, {"year": 2005, "count": 1}, {"year": 2001, "count": 1}]
+    assert facets["authors"] == [{"author_id": author_id, "name": "Test Author", "count": 3}]
+
+
+def test_sold_out_includes_books_without_stock(client, db, make_book):
+    sold_out = make_book(stock=0)
+    unknown = make_book(stock=None)
+    make_book(stock=2)
+    page = client.get("/books/", params={"in_stock": "false"}).json()
+    assert sorted(book["id"] for book in page["items"]) == [sold_out, unknown]
+
+
+class _PostgresLike:
+    """Runs on SQLite but reports the Postgres dialect, so the sampling path is taken."""
+
+    def __init__(self, session):
+        self.session = session
+        self.bind = type("Bind", (), {"dialect": type("Dialect", (), {"name": "postgresql"})})()
+
+    async def execute(self, *args, **kwargs):
+        return await self.session.execute(*args, **kwargs)
+
+
+def test_facets_decide_sampling_per_facet(shelf, monkeypatch):
+    author_id, _ = shelf
+    checked = []
+
+    async def capped_count(db, clauses):
+        checked.append(len(clauses))
+        # Only the author facet, which drops the author filter, sees more than the limit
+        return catalog.CATALOG_EXACT_COUNT_LIMIT + 1 if not clauses else 5
+
+    async def sample_percent(db):
+        return 100.0
+
+    monkeypatch.setattr(catalog, "_capped_count", capped_count)
+    monkeypatch.setattr(catalog, "_sample_percent", sample_percent)
+    # A 100% "sample" of the plain table, since SQLite has no TABLESAMPLE
+    monkeypatch.setattr(catalog, "tablesample", lambda table, method: table.alias("sampled"))
+
+    async def run():
+        async with AsyncSessionLocal() as session:
+            filters = catalog.BookFilters(min_price=None, max_price=None, published_from=None,
+                                          published_to=None, in_stock=None, author_id=str(author_id))
+            return await catalog.facets(_PostgresLike(session), filters)
+
+    result = asyncio.run(run())
+    # One check for the filtered set (shared by total, in_stock, price, years), one for authors
+    assert checked == [1, 0]
+    assert result["approximate"] is True
+    assert result["total"] == 5
+    assert result["authors"][0]["count"] == 5
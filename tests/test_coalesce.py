@@ -0,0 +1,61 @@
+import asyncio
+
+from app.core.coalesce import SingleFlight
+
+
+def test_concurrent_identical_calls_share_one_run():
+    calls = []
+
+    async def load(book_id):
+        calls.append(book_id)
+        await asyncio.sleep(0.01)
+        return {"id": book_id}
+
+    async def run():
+        flights = SingleFlight()
+        results = await asyncio.gather(*(flights.run("/books/{id}", 1, load, 1) for _ in range(10)),
+                                       flights.run("/books/{id}", 2, load, 2))
+        # The flight is over, so a later call runs again
+        await flights.run("/books/{id}", 1, load, 1)
+        return results
+
+    results = asyncio.run(run())
+    assert results == [{"id": 1}] * 10 + [{"id": 2}]
+    assert calls == [1, 2, 1]
+
+
+def test_followers_share_the_leaders_error():
+    calls = []
+
+    async def fail():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        raise LookupError("missing")
+
+    async def run():
+        flights = SingleFlight()
+        return await asyncio.gather(*(flights.run("/books/{id}", 1, fail) for _ in range(3)),
+                                    return_exceptions=True)
+
+    results = asyncio.run(run())
+    assert calls == [1]
+    assert all(isinstance(result, LookupError) for result in results)
+
+
+def test_slow_leader_lets_followers_run_themselves():
+    calls = []
+
+    async def load(delay):
+        calls.append(delay)
+        await asyncio.sleep(delay)
+        return delay
+
+    async def run():
+        flights = SingleFlight(max_wait=0.01)
+        leader = asyncio.ensure_future(flights.run("/books/{id}", 1, load, 0.2))
+        await asyncio.sleep(0)
+        follower = await flights.run("/books/{id}", 1, load, 0)
+        return follower, await leader
+
+    assert asyncio.run(run()) == (0, 0.2)
+    assert calls == [0.2, 0]
@@ -0,0 +1,135 @@
+import asyncio
+import gzip
+
+import pytest
+
+from app.core import cache as cache_module
+from app.core import compression
+from app.core.cache import book_key, cache
+from app.core.compression import CompressionMiddleware, negotiate
+
+
+@pytest.mark.parametrize("accept, expected", [
+    (None, None),
+    ("", None),
+    ("identity", None),
+    ("gzip", "gzip"),
+    ("GZIP;q=0.5", "gzip"),
+    ("gzip;q=0", None),
+    ("*", "gzip"),
+    ("*;q=0.2, gzip;q=0", None),
+    ("gzip;q=bogus", None),
+])
+def test_negotiate_honours_q_values(accept, expected):
+    assert negotiate(accept) == expected
+
+
+def test_negotiate_prefers_the_highest_q_then_server_order(monkeypatch):
+    monkeypatch.setattr(compression, "ENCODINGS", ["zstd", "gzip"])
+    assert negotiate("gzip, zstd") == "zstd"
+    assert negotiate("gzip;q=1.0, zstd;q=0.5") == "gzip"
+    assert negotiate("br") is None
+
+
+def call(app, accept="gzip", minimum_size=10):
+    messages = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        messages.append(message)
+
+    scope = {"type": "http", "method": "GET", "path": "/", "headers": [(b"accept-encoding", accept.encode())]}
+    asyncio.run(CompressionMiddleware(app, minimum_size=minimum_size)(scope, receive, send))
+    start = messages[0]
+    return dict((k.decode(), v.decode()) for k, v in start["headers"]), b"".join(m.get("body", b"") for m in messages[1:])
+
+
+def endpoint(chunks, content_type="application/json", extra=()):
+    async def app(scope, receive, send):
+        headers = [(b"content-type", content_type.encode()), *extra]
+        if len(chunks) == 1:
+            headers.append((b"content-length", str(len(chunks[0])).encode()))
+        await send({"type": "http.response.start", "status": 200, "headers": headers})
+        for i, chunk in enumerate(chunks):
+            await send({"type": "http.response.body", "body": chunk, "more_body": i < len(chunks) - 1})
+    return app
+
+
+def test_middleware_compresses_whole_bodies():
+    body = b'{"title": "%s"}' % (b"x" * 200)
+    headers, sent = call(endpoint([body]))
+    assert headers["content-encoding"] == "gzip"
+    assert headers["vary"] == "Accept-Encoding"
+    assert headers["content-length"] == str(len(sent))
+    assert gzip.decompress(sent) == body
+
+
+def test_middleware_compresses_streams_chunk_by_chunk():
+    chunks = [b'{"id": %d}\n' % i for i in range(50)]
+    headers, sent = call(endpoint(chunks, "application/x-ndjson"))
+    assert headers["content-encoding"] == "gzip"
+    assert "content-length" not in headers
+    assert gzip.decompress(sent) == b"".join(chunks)
+
+
+def test_middleware_leaves_small_identity_and_uncompressible_bodies_alone():
+    body = b'{"title": "%s"}' % (b"x" * 200)
+    # Too small to pay off, but the response still depends on Accept-Encoding
+    headers, sent = call(endpoint([b"{}"]))
+    assert "content-encoding" not in headers and headers["vary"] == "Accept-Encoding"
+    assert sent == b"{}"
+
+    for accept in ("identity", "gzip;q=0"):
+        headers, sent = call(endpoint([body]), accept=accept)
+        assert "content-encoding" not in headers and "vary" not in headers
+        assert sent == body
+
+    headers, sent = call(endpoint([body], "text/event-stream"))
+    assert "content-encoding" not in headers and sent == body
+    headers, sent = call(endpoint([body], "image/png"))
+    assert "content-encoding" not in headers and sent == body
+
+
+def test_middleware_passes_precompressed_bodies_through():
+    packed = gzip.compress(b"{}" * 100)
+    headers, sent = call(endpoint([packed], extra=[(b"content-encoding", b"gzip"), (b"vary", b"Accept-Encoding")]))
+    assert sent == packed
+    assert headers["vary"] == "Accept-Encoding"
+
+
+def test_middleware_appends_to_an_existing_vary():
+    headers, _ = call(endpoint([b"{}" * 100], extra=[(b"vary", b"Origin")]))
+    assert headers["vary"] == "Origin, Accept-Encoding"
+
+
+def test_cached_book_serves_the_variant_the_client_accepts(client, make_book, monkeypatch):
+    monkeypatch.setattr(cache_module, "COMPRESSION_MIN_SIZE", 0)
+    book_id = make_book()
+    identity = client.get(f"/books/{book_id}", headers={"Accept-Encoding": "identity"})
+    entry = asyncio.run(cache.get_response(book_key(book_id)))
+    assert set(entry.variants) == {"identity", "gzip"}
+    assert gzip.decompress(entry.variants["gzip"]) == entry.variants["identity"]
+    assert "content-encoding" not in identity.headers
+    assert identity.headers["Vary"] == "Accept-Encoding"
+
+    # Hits come straight from the stored variants, and the ETag names the resource, not the bytes
+    compressed = client.get(f"/books/{book_id}", headers={"Accept-Encoding": "br;q=1, gzip;q=0.8"})
+    assert compressed.headers["Content-Encoding"] == "gzip"
+    assert compressed.headers["Vary"] == "Accept-Encoding"
+    assert compressed.headers["Content-Length"] == str(len(entry.variants["gzip"]))
+    assert compressed.headers["ETag"] == identity.headers["ETag"]
+    assert compressed.json() == identity.json()
+
+    refused = client.get(f"/books/{book_id}", headers={"Accept-Encoding": "gzip;q=0"})
+    assert "content-encoding" not in refused.headers
+    assert refused.content == entry.variants["identity"]
+
+
+def test_small_cached_book_stores_only_identity(client, make_book):
+    book_id = make_book()
+    response = client.get(f"/books/{book_id}", headers={"Accept-Encoding": "gzip"})
+    entry = asyncio.run(cache.get_response(book_key(book_id)))
+    assert set(entry.variants) == {"identity"}
+    assert "content-encoding" not in response.headers
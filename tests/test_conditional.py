@@ -0,0 +1,82 @@
+def book_payload(client, book_id, **changes):
+    book = client.get(f"/books/{book_id}").json()
+    payload = {key: book[key] for key in ("title", "author_id", "isbn", "price", "stock", "published_date", "cover_image_url")}
+    return {**payload, **changes}
+
+
+def test_book_detail_revalidates_with_304(client, make_book):
+    book_id = make_book()
+    response = client.get(f"/books/{book_id}")
+    etag = response.headers["ETag"]
+    assert etag == f'"book-{book_id}-v1"'
+
+    revalidated = client.get(f"/books/{book_id}", headers={"If-None-Match": etag})
+    assert revalidated.status_code == 304
+    assert revalidated.headers["ETag"] == etag
+    assert revalidated.content == b""
+    # If-None-Match uses weak comparison
+    assert client.get(f"/books/{book_id}", headers={"If-None-Match": f"W/{etag}"}).status_code == 304
+    assert client.get(f"/books/{book_id}", headers={"If-None-Match": '"other"'}).status_code == 200
+
+
+def test_uncached_book_revalidates_from_version_probe(client, make_book):
+    book_id = make_book()
+    response = client.get(f"/books/{book_id}", headers={"If-None-Match": f'"book-{book_id}-v1"'})
+    assert response.status_code == 304
+
+
+def test_if_modified_since(client, make_book):
+    book_id = make_book()
+    last_modified = client.get(f"/books/{book_id}").headers["Last-Modified"]
+    assert client.get(f"/books/{book_id}", headers={"If-Modified-Since": last_modified}).status_code == 304
+    stale = "Mon, 01 Jan 2001 00:00:00 GMT"
+    assert client.get(f"/books/{book_id}", headers={"If-Modified-Since": stale}).status_code == 200
+
+
+def test_update_changes_etag(client, make_book):
+    book_id = make_book()
+    etag = client.get(f"/books/{book_id}").headers["ETag"]
+    updated = client.put(f"/books/{book_id}", json=book_payload(client, book_id, title="Renamed"))
+    assert updated.status_code == 200
+    assert updated.headers["ETag"] != etag
+
+    response = client.get(f"/books/{book_id}", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.json()["title"] == "Renamed"
+    assert response.headers["ETag"] == updated.headers["ETag"]
+
+
+def test_stale_if_match_is_rejected_with_412(client, make_book):
+    book_id = make_book()
+    etag = client.get(f"/books/{book_id}").headers["ETag"]
+    payload = book_payload(client, book_id)
+    assert client.put(f"/books/{book_id}", json={**payload, "title": "First"}, headers={"If-Match": etag}).status_code == 200
+
+    lost_update = client.put(f"/books/{book_id}", json={**payload, "title": "Second"}, headers={"If-Match": etag})
+    assert lost_update.status_code == 412
+    assert client.get(f"/books/{book_id}").json()["title"] == "First"
+    # If-Match uses strong comparison, and "*" matches any current representation
+    weak = client.put(f"/books/{book_id}", json=payload, headers={"If-Match": f'W/"book-{book_id}-v2"'})
+    assert weak.status_code == 412
+    assert client.put(f"/books/{book_id}", json=payload, headers={"If-Match": "*"}).status_code == 200
+
+
+def test_author_patch_honours_if_match(client):
+    author_id = client.post("/authors/", json={"name": "Ann", "bio": "b"}).json()["id"]
+    etag = client.get(f"/authors/{author_id}").headers["ETag"]
+    assert client.patch(f"/authors/{author_id}", json={"bio": "new"}, headers={"If-Match": etag}).status_code == 202
+    assert client.patch(f"/authors/{author_id}", json={"bio": "newer"}, headers={"If-Match": etag}).status_code == 412
+    assert client.get(f"/authors/{author_id}").json()["bio"] == "new"
+
+
+def test_books_by_author_etag_follows_nested_author(client, make_book):
+    book_id = make_book()
+    author_id = client.get(f"/books/{book_id}").json()["author_id"]
+    etag = client.get(f"/books/author/{author_id}").headers["ETag"]
+    assert client.get(f"/books/author/{author_id}", headers={"If-None-Match": etag}).status_code == 304
+
+    # The list nests the author, so renaming the author must change the list's validator
+    client.patch(f"/authors/{author_id}", json={"name": "Renamed Author"})
+    response = client.get(f"/books/author/{author_id}", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.json()[0]["author"]["name"] == "Renamed Author"
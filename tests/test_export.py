@@ -0,0 +1,46 @@
+import asyncio
+import csv
+import io
+import json
+
+from app.core import export
+
+
+async def rows(count):
+    for i in range(count):
+        yield {field: None for field in export.EXPORT_FIELDS} | {"id": i, "title": f"Book {i}"}
+
+
+def collect(lines):
+    async def run():
+        return [chunk async for chunk in lines]
+    return asyncio.run(run())
+
+
+def test_ndjson_rows_are_batched_into_chunks():
+    chunks = collect(export.ndjson_lines(rows(100), chunk_size=1000))
+    assert 1 < len(chunks) < 100
+    assert all(chunk.endswith("\n") for chunk in chunks)
+    assert [json.loads(line)["id"] for line in "".join(chunks).splitlines()] == list(range(100))
+
+
+def test_csv_rows_are_batched_into_chunks():
+    chunks = collect(export.csv_lines(rows(100), chunk_size=1000))
+    assert 1 < len(chunks) < 100
+    parsed = list(csv.DictReader(io.StringIO("".join(chunks))))
+    assert [int(row["id"]) for row in parsed] == list(range(100))
+
+
+def test_empty_exports():
+    assert collect(export.ndjson_lines(rows(0))) == []
+    assert collect(export.csv_lines(rows(0))) == [",".join(export.EXPORT_FIELDS) + "\r\n"]
+
+
+def test_export_endpoint_streams_every_book(client, make_book):
+    first = make_book(title="Café")
+    author_id = client.get(f"/books/{first}").json()["author_id"]
+    ids = [first] + [make_book(author_id=author_id) for _ in range(20)]
+    response = client.get("/books/export", headers={"Accept-Encoding": "identity"})
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert [line["id"] for line in lines] == ids
+    assert lines[0]["title"] == "Café" and lines[0]["author_name"] == "Test Author"
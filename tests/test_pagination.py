@@ -0,0 +1,74 @@
+import base64
+
+import pytest
+
+from app.core.pagination import decode_cursor, encode_cursor
+from app.models.book import Book
+
+
+@pytest.fixture
+def books(db, make_book):
+    first = make_book(title="Book 0")
+    author_id = db.get(Book, first).author_id
+    return [first] + [make_book(title=f"Book {i}", author_id=author_id) for i in range(1, 5)]
+
+
+def test_cursor_round_trip():
+    cursor = encode_cursor(42, s="-price", k=12.5)
+    assert "=" not in cursor
+    assert decode_cursor(cursor) == {"id": 42, "s": "-price", "k": 12.5}
+
+
+def test_cursor_pages_through_every_row_once(client, books):
+    seen, cursor = [], None
+    while True:
+        page = client.get("/books/", params={"limit": 2, **({"cursor": cursor} if cursor else {})}).json()
+        assert len(page["items"]) <= 2
+        seen += [book["id"] for book in page["items"]]
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+    assert seen == books
+
+
+@pytest.mark.parametrize("cursor", [
+    "not base64!",
+    base64.urlsafe_b64encode(b"[1, 2]").decode(),
+    base64.urlsafe_b64encode(b'{"id": "7"}').decode(),
+    base64.urlsafe_b64encode(b"{broken").decode(),
+])
+def test_tampered_cursors_are_rejected(client, books, cursor):
+    response = client.get("/books/", params={"cursor": cursor})
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Invalid cursor"
+
+
+def test_cursor_from_another_sort_order_is_rejected(client, books):
+    cursor = client.get("/books/", params={"limit": 2, "sort": "price"}).json()["next_cursor"]
+    response = client.get("/books/", params={"cursor": cursor})
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Cursor belongs to a different sort order"
+
+
+def test_fields_projection(client, books):
+    page = client.get("/books/", params={"fields": "title,price", "limit": 2}).json()
+    assert page["items"] == [{"title": "Book 0", "price": 10.0}, {"title": "Book 1", "price": 10.0}]
+    # id is selected for the cursor even when it is not returned
+    rest = client.get("/books/", params={"fields": "id,title", "cursor": page["next_cursor"]}).json()
+    assert rest["items"][0] == {"id": books[2], "title": "Book 2"}
+
+    response = client.get("/books/", params={"fields": "title,author"})
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Unknown field(s): author"
+
+
+def test_page_etag_tracks_rows_and_projection(client, books):
+    etag = client.get("/books/", params={"limit": 2}).headers["ETag"]
+    assert client.get("/books/", params={"limit": 2}, headers={"If-None-Match": etag}).status_code == 304
+    projected = client.get("/books/", params={"limit": 2, "fields": "title"}, headers={"If-None-Match": etag})
+    assert projected.status_code == 200
+
+    book = client.get(f"/books/{books[0]}").json()
+    payload = {key: book[key] for key in ("title", "author_id", "isbn", "price", "stock")}
+    client.put(f"/books/{books[0]}", json={**payload, "title": "Renamed"})
+    assert client.get("/books/", params={"limit": 2}, headers={"If-None-Match": etag}).status_code == 200
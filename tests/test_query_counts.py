@@ -0,0 +1,35 @@
+from app.database import async_engine
+from app.models.author import Author
+from app.models.book import Book
+from querycount import assert_constant_queries, count_queries
+
+
+def seed_author(db, books):
+    author = Author(name=f"Author with {books}", bio="b")
+    db.add(author)
+    db.flush()
+    db.add_all(
+        Book(title=f"Book {i}", author_id=author.id, isbn=f"{author.id:03d}-{i:06d}", price=10, stock=1)
+        for i in range(books)
+    )
+    db.commit()
+    return author.id
+
+
+def test_books_by_author_issue_constant_queries(client, db):
+    def run(size):
+        author_id = authors[size]
+        response = client.get(f"/books/author/{author_id}")
+        assert response.status_code == 200
+        assert len(response.json()) == size
+
+    authors = {size: seed_author(db, size) for size in (1, 200)}
+    counts = assert_constant_queries(async_engine.sync_engine, run, sizes=(1, 200), max_queries=2)
+    assert counts[1] == 2
+
+
+def test_count_queries_sees_async_statements(client, db):
+    author_id = seed_author(db, 3)
+    with count_queries(async_engine.sync_engine) as counter:
+        client.get(f"/books/author/{author_id}")
+    assert any("FROM books" in statement for statement in counter.statements)
@@ -0,0 +1,71 @@
+import pytest
+from sqlalchemy import func, insert, select
+
+from app.models.book import Book
+from app.models.review import Review
+from app.models.user import User
+
+
+@pytest.fixture
+def readers(db):
+    db.execute(insert(User), [
+        {"username": f"reader{i}", "email": f"reader{i}@example.com", "password_hash": "x", "role": "user"}
+        for i in range(3)
+    ])
+    db.commit()
+    return list(db.scalars(select(User.id).order_by(User.id)))
+
+
+def assert_consistent(client, db, book_id):
+    """The stored aggregates match the reviews table, and the API serves them."""
+    db.expire_all()
+    ratings = list(db.scalars(select(Review.rating).where(Review.book_id == book_id)))
+    expected_average = sum(ratings) / len(ratings) if ratings else 0.0
+    expected_histogram = {str(star): ratings.count(star) for star in range(1, 6)}
+
+    book = db.get(Book, book_id)
+    assert (book.rating_count, book.rating_sum) == (len(ratings), sum(ratings))
+    assert book.rating_average == pytest.approx(expected_average)
+    served = client.get(f"/books/{book_id}").json()
+    assert served["rating_count"] == len(ratings)
+    assert served["rating_average"] == pytest.approx(expected_average)
+    assert served["rating_histogram"] == expected_histogram
+    return served
+
+
+def test_aggregates_follow_review_writes(client, db, make_book, readers):
+    first = make_book()
+    second = make_book(author_id=db.get(Book, first).author_id)
+    reviews = [
+        client.post("/reviews/", json={"book_id": first, "user_id": user_id, "rating": rating}).json()["id"]
+        for user_id, rating in zip(readers, (5, 3, 3))
+    ]
+    served = assert_consistent(client, db, first)
+    assert served["rating_histogram"] == {"1": 0, "2": 0, "3": 2, "4": 0, "5": 1}
+
+    client.put(f"/reviews/{reviews[1]}", json={"book_id": first, "user_id": readers[1], "rating": 4})
+    assert assert_consistent(client, db, first)["rating_average"] == pytest.approx(4.0)
+
+    # Moving a review to another book takes its rating along
+    client.patch(f"/reviews/{reviews[2]}", json={"book_id": second, "rating": 1})
+    assert_consistent(client, db, first)
+    assert assert_consistent(client, db, second)["rating_histogram"]["1"] == 1
+
+    # A comment-only edit leaves the aggregates alone
+    version = db.get(Book, first).version
+    client.patch(f"/reviews/{reviews[0]}", json={"comment": "Still great"})
+    db.expire_all()
+    assert db.get(Book, first).version == version
+
+    assert client.delete(f"/reviews/{reviews[0]}").status_code == 204
+    assert assert_consistent(client, db, first)["rating_count"] == 1
+
+
+def test_deleting_a_user_recomputes_their_books(client, db, make_book, readers):
+    book_id = make_book()
+    for user_id, rating in zip(readers, (2, 4, 5)):
+        client.post("/reviews/", json={"book_id": book_id, "user_id": user_id, "rating": rating})
+    client.delete(f"/users/{readers[1]}")
+    served = assert_consistent(client, db, book_id)
+    assert served["rating_histogram"] == {"1": 0, "2": 1, "3": 0, "4": 0, "5": 1}
+    assert db.scalar(select(func.count()).select_from(Review)) == 2
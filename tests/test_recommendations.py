@@ -0,0 +1,121 @@
+import random
+
+import pytest
+from sqlalchemy import delete, insert, update
+
+from app.core import recommendations
+from app.core.recommendations import RecommendationIndex
+from app.models.book import Book
+from app.models.review import Review
+from app.models.user import User
+
+
+# Wider than the catalog, so top-K truncation never hides a neighbour from the comparison
+K = 50
+
+
+@pytest.fixture
+def catalog(db, make_book):
+    rng = random.Random(7)
+    author_book = make_book()
+    author_id = db.get(Book, author_book).author_id
+    book_ids = [author_book] + [make_book(author_id=author_id) for _ in range(11)]
+    db.execute(insert(User), [
+        {"username": f"user{i}", "email": f"user{i}@example.com", "password_hash": "x", "role": "user"}
+        for i in range(15)
+    ])
+    user_ids = [user.id for user in db.query(User).order_by(User.id)]
+    ratings = {
+        (book_id, user_id): rng.randint(1, 5)
+        for book_id in book_ids for user_id in user_ids if rng.random() < 0.4
+    }
+    db.execute(insert(Review), [{"book_id": b, "user_id": u, "rating": r} for (b, u), r in ratings.items()])
+    db.commit()
+    return rng, book_ids, user_ids, ratings
+
+
+def similar_map(index, book_id):
+    return dict(index.similar(book_id))
+
+
+def assert_same_neighbours(incremental, rebuilt, book_ids):
+    for book_id in book_ids:
+        expected = similar_map(rebuilt, book_id)
+        actual = similar_map(incremental, book_id)
+        assert actual.keys() == expected.keys(), book_id
+        for other, score in expected.items():
+            assert actual[other] == pytest.approx(score, abs=1e-5), (book_id, other)
+
+
+def test_incremental_apply_matches_full_rebuild(db, make_book, catalog):
+    rng, book_ids, user_ids, ratings = catalog
+    index = RecommendationIndex(k=K)
+    index.build(db)
+
+    def rate(book_id, user_id, rating):
+        if rating is None:
+            db.execute(delete(Review).where(Review.book_id == book_id, Review.user_id == user_id))
+        elif (book_id, user_id) in ratings:
+            db.execute(update(Review).where(Review.book_id == book_id, Review.user_id == user_id).values(rating=rating))
+        else:
+            db.execute(insert(Review).values(book_id=book_id, user_id=user_id, rating=rating))
+        index.record(book_id, user_id, rating)
+
+    existing = sorted(ratings)
+    for book_id, user_id in rng.sample(existing, 10):
+        rate(book_id, user_id, rng.randint(1, 5))
+    for book_id, user_id in rng.sample(existing, 5):
+        rate(book_id, user_id, None)
+        ratings.pop((book_id, user_id))
+    # A book and a user the index has never seen
+    new_book = make_book(author_id=db.get(Book, book_ids[0]).author_id)
+    new_user = db.execute(insert(User).values(username="new", email="new@example.com", password_hash="x",
+                                              role="user").returning(User.id)).scalar_one()
+    for user_id in rng.sample(user_ids, 6):
+        rate(new_book, user_id, rng.randint(1, 5))
+    for book_id in rng.sample(book_ids, 4):
+        rate(book_id, new_user, rng.randint(1, 5))
+    # A deleted book takes its reviews with it
+    gone = book_ids[3]
+    db.execute(delete(Review).where(Review.book_id == gone))
+    db.execute(delete(Book).where(Book.id == gone))
+    index.forget_books([gone])
+    db.commit()
+
+    assert index.apply_pending() > 0
+    rebuilt = RecommendationIndex(k=K)
+    rebuilt.build(db)
+
+    assert similar_map(index, gone) == {}
+    assert_same_neighbours(index, rebuilt, book_ids + [new_book])
+
+
+def test_apply_without_changes_keeps_snapshot(db, catalog):
+    index = RecommendationIndex(k=K)
+    index.build(db)
+    snapshot = index._snapshot
+    assert index.apply_pending() == 0
+    assert index._snapshot is snapshot
+
+
+def test_writes_before_first_build_are_not_queued(db, catalog):
+    _, book_ids, user_ids, _ = catalog
+    index = RecommendationIndex(k=K)
+    index.record(book_ids[0], user_ids[0], 5)
+    index.forget_books([book_ids[1]])
+    assert index._pending == {} and index._dropped == set()
+
+
+def test_review_api_feeds_the_index(client, db, make_book):
+    first, second = make_book(), make_book()
+    users = [client.post("/users/", json={"username": f"reader{i}", "email": f"r{i}@example.com",
+                                          "password": "secret1"}).json()["id"] for i in range(2)]
+    client.post("/reviews/", json={"book_id": first, "user_id": users[0], "rating": 5})
+    assert client.get(f"/books/{first}/similar").json() == []
+
+    # Built by the request above; later reviews are folded in by apply_pending
+    client.post("/reviews/", json={"book_id": second, "user_id": users[0], "rating": 4})
+    recommendations.index.apply_pending()
+    similar = client.get(f"/books/{first}/similar").json()
+    assert [book["id"] for book in similar] == [second]
+    assert similar[0]["score"] == pytest.approx(1.0)
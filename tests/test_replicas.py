@@ -0,0 +1,120 @@
+import asyncio
+import time
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import NullPool
+
+from app import database
+from app.core import replicas
+from app.core.replicas import STICKY_HEADER, ReplicaSet, pinned_until, sticky_marker
+from app.database import Base
+
+
+@pytest.fixture
+def replica(tmp_path, monkeypatch):
+    """An empty copy of the schema standing in for a replica that has not seen any writes."""
+    path = tmp_path / "replica.db"
+    schema = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(schema)
+    schema.dispose()
+    replica_set = ReplicaSet([create_async_engine(f"sqlite+aiosqlite:///{path}", poolclass=NullPool)])
+    monkeypatch.setattr(database, "replicas", replica_set)
+    return replica_set
+
+
+def listed(client, **kwargs):
+    return [book["id"] for book in client.get("/books/", **kwargs).json()["items"]]
+
+
+def test_reads_follow_a_write_to_the_primary(client, make_book, replica):
+    book_id = make_book()
+    assert listed(client) == []
+
+    response = client.post("/authors/", json={"name": "Ann", "bio": "b"})
+    marker = response.headers[STICKY_HEADER]
+    # The cookie pins browsers, the echoed header pins API clients
+    assert listed(client) == [book_id]
+    client.cookies.clear()
+    assert listed(client, headers={STICKY_HEADER: marker}) == [book_id]
+    assert listed(client) == []
+
+
+@pytest.mark.parametrize("marker", [
+    f"{time.time() + 3600:.3f}",   # further ahead than any write pins
+    f"{time.time() - 1:.3f}",      # expired
+    "soon",
+])
+def test_forged_or_stale_markers_read_from_the_replica(client, make_book, replica, marker):
+    make_book()
+    assert listed(client, headers={STICKY_HEADER: marker}) == []
+
+
+def test_signed_markers():
+    until = time.time() + 5
+    marker = sticky_marker(until, key="secret")
+    assert pinned_until(marker, key="secret") == pytest.approx(until, abs=0.001)
+    assert pinned_until(marker, key="other") is None
+    value, _, signature = marker.partition(":")
+    assert pinned_until(f"{float(value) + 1:.3f}:{signature}", key="secret") is None
+    assert pinned_until(value, key="secret") is None
+    assert pinned_until(value, key="") == float(value)
+
+
+class _Result:
+    def __init__(self, lag):
+        self.lag = lag
+
+    def scalar(self):
+        return self.lag
+
+
+class _Connection:
+    def __init__(self, lag):
+        self.lag = lag
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def execute(self, statement):
+        return _Result(self.lag)
+
+
+class _PostgresReplica:
+    """Reports a fixed replay lag, as PG_REPLICATION_LAG would, or refuses connections when "down"."""
+
+    def __init__(self, lag):
+        self.lag = lag
+        self.dialect = type("Dialect", (), {"name": "postgresql"})()
+        self.url = type("URL", (), {"render_as_string": lambda self: "postgresql://replica"})()
+
+    def connect(self):
+        if self.lag == "down":
+            raise OSError("connection refused")
+        return _Connection(self.lag)
+
+
+def test_lagging_replicas_leave_the_rotation(monkeypatch):
+    monkeypatch.setattr(replicas, "REPLICA_MAX_LAG", 5)
+    caught_up, quiet, behind = _PostgresReplica(0), _PostgresReplica(None), _PostgresReplica(30.0)
+    replica_set = ReplicaSet([caught_up, behind, quiet])
+    asyncio.run(replica_set.check())
+    assert replica_set.healthy == [caught_up, quiet]
+    assert {replica_set.pick() for _ in range(4)} == {caught_up, quiet}
+
+    behind.lag = 1.0
+    asyncio.run(replica_set.check())
+    assert replica_set.healthy == [caught_up, behind, quiet]
+
+
+def test_reads_fall_back_to_the_primary_without_a_healthy_replica(client, make_book, monkeypatch):
+    book_id = make_book()
+    unreachable = ReplicaSet([_PostgresReplica("down")])
+    monkeypatch.setattr(database, "replicas", unreachable)
+    asyncio.run(unreachable.check())
+    assert unreachable.healthy == [] and unreachable.pick() is None
+    assert listed(client) == [book_id]
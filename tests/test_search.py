@@ -0,0 +1,59 @@
+import threading
+
+from app.core import search
+from app.core.search import InMemorySearchBackend, memory_backend
+
+
+def search_ids(client, **params):
+    return [book["id"] for book in client.get("/books/search", params=params).json()["items"]]
+
+
+def test_first_search_builds_and_writes_keep_it_current(client, make_book):
+    dune = make_book(title="Dune Messiah")
+    assert not memory_backend.built
+    assert search_ids(client, title="dune") == [dune]
+    assert memory_backend.built
+
+    author_id = client.get(f"/books/{dune}").json()["author_id"]
+    created = client.post("/books/", json={"title": "Children of Dune", "author_id": author_id,
+                                           "isbn": "9781000000001", "price": 9, "stock": 1}).json()["id"]
+    assert sorted(search_ids(client, title="dune")) == sorted([dune, created])
+    client.delete(f"/books/{dune}")
+    assert search_ids(client, title="dune") == [created]
+
+
+def test_rebuild_replays_writes_committed_during_the_build(db, make_book, monkeypatch):
+    make_book(title="Old Title")
+    index = InMemorySearchBackend()
+    index.build(db)
+
+    class Staging(InMemorySearchBackend):
+        def _put_book(self, *args):
+            # A write commits while the rebuild is still reading the tables
+            if not index._replay:
+                index.apply([(999, "Late Arrival", "978999", 1)], [], set(), set())
+            super()._put_book(*args)
+
+    monkeypatch.setattr(search, "InMemorySearchBackend", Staging)
+    index.build(db)
+
+    assert 999 in index.books
+    assert not index.building
+    assert {"old", "title", "late", "arrival"} <= set(index.title_postings)
+
+
+def test_concurrent_first_searches_build_once(db, make_book, monkeypatch):
+    make_book(title="Dune")
+    index = InMemorySearchBackend()
+    builds = []
+    real_build = InMemorySearchBackend.build
+    monkeypatch.setattr(InMemorySearchBackend, "build",
+                        lambda self, session: builds.append(1) or real_build(self, session))
+
+    threads = [threading.Thread(target=index.ensure_built) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert builds == [1]
+    assert index.built and index.title_postings["dune"]
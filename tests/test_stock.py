@@ -0,0 +1,119 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import update
+
+from app.core import stock
+from app.database import AsyncSessionLocal
+from app.models.book import Book
+from app.models.reservation import StockReservation
+
+
+def stock_of(db, book_id):
+    db.expire_all()
+    return db.get(Book, book_id).stock
+
+
+def reserve(client, items, **body):
+    return client.post("/reservations/", json={"items": [{"book_id": b, "quantity": q} for b, q in items], **body})
+
+
+def test_reserve_holds_stock(client, db, make_book):
+    book_id = make_book(stock=5)
+    response = client.post(f"/books/{book_id}/stock/reserve", json={"quantity": 2})
+    assert response.status_code == 201
+    assert response.json()["status"] == "held"
+    assert stock_of(db, book_id) == 3
+
+
+def test_reserve_more_than_stock_is_rejected(client, db, make_book):
+    book_id = make_book(stock=1)
+    response = client.post(f"/books/{book_id}/stock/reserve", json={"quantity": 2})
+    assert response.status_code == 409
+    assert stock_of(db, book_id) == 1
+
+
+def test_reserve_unknown_book(client):
+    assert client.post("/books/999/stock/reserve", json={"quantity": 1}).status_code == 404
+
+
+def test_multi_book_reservation_is_all_or_nothing(client, db, make_book):
+    plenty = make_book(stock=5)
+    scarce = make_book(stock=1)
+    response = reserve(client, [(plenty, 2), (scarce, 3)])
+    assert response.status_code == 409
+    assert stock_of(db, plenty) == 5
+    assert stock_of(db, scarce) == 1
+
+
+def test_repeated_items_are_summed(client, db, make_book):
+    book_id = make_book(stock=5)
+    response = reserve(client, [(book_id, 1), (book_id, 2)])
+    assert response.status_code == 201
+    assert response.json()["items"] == [{"book_id": book_id, "quantity": 3}]
+    assert stock_of(db, book_id) == 2
+
+
+def test_release_returns_stock_once(client, db, make_book):
+    book_id = make_book(stock=5)
+    reservation_id = reserve(client, [(book_id, 2)]).json()["id"]
+    assert client.post(f"/reservations/{reservation_id}/release").status_code == 204
+    assert stock_of(db, book_id) == 5
+    assert client.post(f"/reservations/{reservation_id}/release").status_code == 409
+    assert stock_of(db, book_id) == 5
+
+
+def test_commit_keeps_stock_taken(client, db, make_book):
+    book_id = make_book(stock=5)
+    reservation_id = reserve(client, [(book_id, 2)]).json()["id"]
+    assert client.post(f"/reservations/{reservation_id}/commit").status_code == 204
+    assert client.get(f"/reservations/{reservation_id}").json()["status"] == "committed"
+    assert client.post(f"/reservations/{reservation_id}/release").status_code == 409
+    assert stock_of(db, book_id) == 3
+
+
+def test_reservation_updates_cached_book(client, make_book):
+    book_id = make_book(stock=5)
+    assert client.get(f"/books/{book_id}").json()["stock"] == 5
+    reserve(client, [(book_id, 2)])
+    assert client.get(f"/books/{book_id}").json()["stock"] == 3
+
+
+def expire(db, reservation_id):
+    db.execute(
+        update(StockReservation)
+        .where(StockReservation.id == reservation_id)
+        .values(expires_at=datetime.now(timezone.utc) - timedelta(seconds=1))
+    )
+    db.commit()
+
+
+def sweep():
+    async def run():
+        async with AsyncSessionLocal() as session:
+            return await stock.expire_due(session)
+    return asyncio.run(run())
+
+
+def test_sweeper_restocks_lapsed_reservations(client, db, make_book):
+    book_id = make_book(stock=5)
+    lapsed = reserve(client, [(book_id, 2)]).json()["id"]
+    live = reserve(client, [(book_id, 1)]).json()["id"]
+    expire(db, lapsed)
+
+    assert sweep() == 1
+    assert stock_of(db, book_id) == 4
+    assert client.get(f"/reservations/{lapsed}").json()["status"] == "expired"
+    assert client.get(f"/reservations/{live}").json()["status"] == "held"
+    # Already expired, so a second sweep has nothing to return
+    assert sweep() == 0
+    assert stock_of(db, book_id) == 4
+
+
+def test_lapsed_reservation_cannot_be_committed(client, db, make_book):
+    book_id = make_book(stock=5)
+    reservation_id = reserve(client, [(book_id, 2)]).json()["id"]
+    expire(db, reservation_id)
+    response = client.post(f"/reservations/{reservation_id}/commit")
+    assert response.status_code == 409
+    assert response.json()["detail"] == "Reservation is already expired"
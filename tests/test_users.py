@@ -0,0 +1,36 @@
+import pytest
+
+
+@pytest.fixture
+def user_id(client):
+    response = client.post("/users/", json={"username": "alice", "email": "a@example.com", "password": "secret1"})
+    assert response.status_code == 201
+    return response.json()["id"]
+
+
+def login(client, password):
+    return client.post("/users/login", json={"username": "alice", "password": password}).status_code
+
+
+def test_patch_password_rehashes(client, user_id):
+    assert client.patch(f"/users/{user_id}", json={"password": "secret2"}).status_code == 200
+    assert login(client, "secret2") == 200
+    assert login(client, "secret1") == 401
+
+
+@pytest.mark.parametrize("field", ["password", "username", "email", "role"])
+def test_patch_rejects_null(client, user_id, field):
+    response = client.patch(f"/users/{user_id}", json={field: None})
+    assert response.status_code == 422
+    assert login(client, "secret1") == 200
+
+
+def test_patch_password_follows_signup_rules(client, user_id):
+    assert client.patch(f"/users/{user_id}", json={"password": "abc"}).status_code == 422
+
+
+def test_patch_leaves_omitted_fields(client, user_id):
+    response = client.patch(f"/users/{user_id}", json={"email": "alice@example.com"})
+    assert response.status_code == 200
+    assert response.json()["username"] == "alice"
+    assert login(client, "secret1") == 200